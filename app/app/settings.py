@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'core',
     'rest_framework',
     'rest_framework.authtoken',
@@ -47,15 +48,25 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'core.middleware.CsrfViewMiddleware',
+    'core.middleware.AuthenticationMiddleware',
+    'core.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Paths skipping the session, CSRF, authentication and message middleware
+# above. The API authenticates with tokens, the admin keeps them all.
+SESSIONLESS_PATH_PREFIXES = tuple(
+    prefix for prefix in os.environ.get(
+        'SESSIONLESS_PATH_PREFIXES', '/api/recipe/,/api/user/'
+    ).split(',') if prefix
+)
+
 ROOT_URLCONF = 'app.urls'
 
 TEMPLATES = [
@@ -80,16 +91,82 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# core.db.postgresql adds CONN_HEALTH_CHECKS and POOL to the PostgreSQL
+# backend. With a pool, connections go back to it after each request
+# instead of staying open for CONN_MAX_AGE seconds in every thread.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 0))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': os.environ.get('DB_ENGINE', 'core.db.postgresql'),
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': 0 if DB_POOL_SIZE else int(
+            os.environ.get('DB_CONN_MAX_AGE', 60)
+        ),
+        'CONN_HEALTH_CHECKS': os.environ.get(
+            'DB_CONN_HEALTH_CHECKS', '1'
+        ) == '1',
+        'POOL': {
+            'MAX_SIZE': DB_POOL_SIZE,
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        },
     }
 }
 
+# Read replicas of the default database, one per host of DB_REPLICA_HOSTS.
+# With SQLite every replica opens the default file, a local stand-in.
+DATABASE_REPLICAS = {
+    'ALIASES': [],
+    # Users read their own writes from the primary for this long.
+    'STICKY_SECONDS': int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5)),
+    'MAX_LAG_SECONDS': float(os.environ.get('DB_REPLICA_MAX_LAG', 2)),
+    'CHECK_INTERVAL': float(os.environ.get('DB_REPLICA_CHECK_INTERVAL', 5)),
+    # Shared by the server processes unless API_CACHE_BACKEND is locmem.
+    'CACHE': 'api',
+}
+
+for index, host in enumerate(
+    filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))
+):
+    DATABASES[f'replica{index}'] = dict(
+        DATABASES['default'],
+        HOST=host.strip(),
+        TEST={'MIRROR': 'default'},
+    )
+    DATABASE_REPLICAS['ALIASES'].append(f'replica{index}')
+
+DATABASE_ROUTERS = ['core.db.routers.ReplicaRouter']
+
+
+
+# Caches
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+# API_CACHE_BACKEND is one of these names or the dotted path of any Django
+# cache backend, e.g. a Redis backend. locmem is the local stand-in.
+API_CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'dummy': 'django.core.cache.backends.dummy.DummyCache',
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'api': {
+        'BACKEND': API_CACHE_BACKENDS.get(
+            os.environ.get('API_CACHE_BACKEND', 'locmem'),
+            os.environ.get('API_CACHE_BACKEND'),
+        ),
+        'LOCATION': os.environ.get('API_CACHE_LOCATION', 'api'),
+        'TIMEOUT': int(os.environ.get('API_CACHE_TIMEOUT', 300)),
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -109,6 +186,38 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# The first hasher hashes new passwords, hashes made by the others are
+# upgraded on the next login. PASSWORD_HASHER picks the first one.
+PASSWORD_HASHER_ALGORITHMS = {
+    'scrypt': 'core.hashing.ScryptPasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+
+PASSWORD_HASHERS = list(dict.fromkeys([
+    PASSWORD_HASHER_ALGORITHMS[os.environ.get('PASSWORD_HASHER', 'scrypt')],
+    'core.hashing.ScryptPasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]))
+
+# Hashes run on a pool of WORKERS processes per server process, or in the
+# request thread with 0. Every server process starts its own pool, so keep
+# WORKERS times the server processes at about the number of CPUs, e.g. 1-2
+# under a threaded or async server with few processes. Requests beyond
+# MAX_PENDING queued hashes get 429 with RETRY_AFTER seconds.
+PASSWORD_HASHING = {
+    'WORKERS': int(os.environ.get('PASSWORD_HASHING_WORKERS', 0)),
+    'MAX_PENDING': int(os.environ.get('PASSWORD_HASHING_MAX_PENDING', 32)),
+    'RETRY_AFTER': int(os.environ.get('PASSWORD_HASHING_RETRY_AFTER', 1)),
+    'SCRYPT': {
+        'N': int(os.environ.get('PASSWORD_SCRYPT_N', 2 ** 14)),
+        'R': int(os.environ.get('PASSWORD_SCRYPT_R', 8)),
+        'P': int(os.environ.get('PASSWORD_SCRYPT_P', 1)),
+    },
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
@@ -138,4 +247,84 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_PAGINATION_CLASS': 'recipe.pagination.KeysetPagination',
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', 100)),
+}
+
+# Responses of at least MIN_SIZE bytes are compressed with brotli when it
+# is installed and accepted, else with gzip. Streaming responses such as
+# the recipe export are compressed chunk by chunk whatever their size.
+COMPRESSION = {
+    'ENABLED': os.environ.get('COMPRESSION', '1') == '1',
+    'MIN_SIZE': int(os.environ.get('COMPRESSION_MIN_SIZE', 1024)),
+    'GZIP_LEVEL': int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6)),
+    'BROTLI_QUALITY': int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5)),
+}
+
+# The OpenAPI schema is rendered once per process, or read from the files
+# `manage.py generate_schema` writes to DIRECTORY at build time.
+API_SCHEMA = {
+    'DIRECTORY': os.environ.get('API_SCHEMA_DIR') or None,
+    'MAX_AGE': int(os.environ.get('API_SCHEMA_MAX_AGE', 300)),
+}
+
+# List pages of recipes and tags serialized from `.values()` rows, and
+# written with orjson when it is installed.
+API_FAST_SERIALIZERS = os.environ.get('API_FAST_SERIALIZERS', '1') == '1'
+
+# Token -> user lookups cached by user.authentication. SHARED_CACHE names
+# an entry of CACHES used as a second tier shared between workers, and
+# REVOCATION_CACHE the entry holding the generation of each cached token
+# checked on every hit. With more than one worker it must be a cache the
+# workers share (e.g. API_CACHE_BACKEND=file or memcached), otherwise
+# deactivations and revoked tokens only reach the other workers' local
+# tiers after TTL seconds.
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': int(os.environ.get('TOKEN_AUTH_CACHE_SIZE', 10000)),
+    'TTL': int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 60)),
+    'SHARED_CACHE': os.environ.get('TOKEN_AUTH_SHARED_CACHE') or None,
+    'REVOCATION_CACHE': os.environ.get(
+        'TOKEN_AUTH_REVOCATION_CACHE', 'api'
+    ),
+}
+
+# Serialized list/detail responses cached per user and collection version.
+API_RESPONSE_CACHE = {
+    'ENABLED': os.environ.get('API_RESPONSE_CACHE', '1') == '1',
+    'CACHE': 'api',
+}
+
+# Rows per transaction and per cursor fetch for recipe import and export.
+RECIPE_BULK_CHUNK_SIZE = int(os.environ.get('RECIPE_BULK_CHUNK_SIZE', 500))
+
+# Most recipes a batch update or delete may change in one request.
+RECIPE_BATCH_MAX_SIZE = int(os.environ.get('RECIPE_BATCH_MAX_SIZE', 10000))
+
+# Days tombstones of deleted recipes and tags stay in the change log read
+# by sync clients, dropped by `manage.py compact_change_log`. Clients not
+# synced for longer must download everything again.
+SYNC_TOMBSTONE_DAYS = int(os.environ.get('SYNC_TOMBSTONE_DAYS', 30))
+
+# Serve safe API requests from async views, enabled by default in app.asgi.
+API_ASYNC_VIEWS = os.environ.get('API_ASYNC_VIEWS', '0') == '1'
+
+# Run ORM calls of async views in the single thread sensitive thread
+# instead of the executor pool.
+ASYNC_DB_THREAD_SENSITIVE = (
+    os.environ.get('ASYNC_DB_THREAD_SENSITIVE', '0') == '1'
+)
+
+# Per request metrics exposed at /api/metrics/ to scrapers sending TOKEN
+# as a bearer token (not found without one), requests slower than
+# SLOW_REQUEST_SECONDS are logged with up to CAPTURED_QUERIES queries.
+METRICS = {
+    'ENABLED': os.environ.get('METRICS', '1') == '1',
+    'SLOW_REQUEST_SECONDS': float(
+        os.environ.get('SLOW_REQUEST_SECONDS', 1.0)
+    ),
+    'CAPTURED_QUERIES': int(os.environ.get('METRICS_CAPTURED_QUERIES', 50)),
+    'TOKEN': os.environ.get('METRICS_TOKEN') or None,
 }
+
+# Upper bound for the `page_size` query parameter on list endpoints.
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 1000))
@@ -0,0 +1,89 @@
+"""
+Benchmark bytes on the wire and CPU per response with compression.
+
+Recipe list pages of each size, and a recipe detail, are requested
+without compression and with each coding the middleware supports. The
+response cache stays off so every request renders its response.
+
+Usage: python -m benchmarks.compression [--page-sizes N ...] [--requests N]
+"""
+import argparse
+import time
+
+from benchmarks import harness
+
+
+def cpu_per_call(func, iterations):
+    """Return the mean CPU milliseconds of calling `func`."""
+    start = time.process_time()
+    for _ in range(iterations):
+        func()
+    return round((time.process_time() - start) / iterations * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--page-sizes', type=int, nargs='+', default=[10, 100, 1000]
+    )
+    parser.add_argument('--requests', type=int, default=20)
+    args = parser.parse_args()
+
+    harness.setup()
+    from django.conf import settings
+    from django.test.utils import override_settings
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    from core.middleware import CompressionMiddleware, brotli
+
+    codings = ['identity', 'gzip'] + (['br'] if brotli else [])
+    middleware = CompressionMiddleware(lambda request: None)
+    results = {'codings': codings}
+    with harness.test_database(), override_settings(
+        API_RESPONSE_CACHE=dict(settings.API_RESPONSE_CACHE, ENABLED=False),
+        API_MAX_PAGE_SIZE=max(args.page_sizes),
+    ):
+        [(user, token)] = harness.seed(
+            recipes=max(args.page_sizes), tags=20, tags_per_recipe=3
+        )
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        recipe_id = user.recipe_set.values_list('id', flat=True).first()
+
+        pages = [
+            (f'list_{size}', reverse('recipe:recipe-list'),
+             {'page_size': size})
+            for size in args.page_sizes
+        ]
+        pages.append(
+            ('detail', reverse('recipe:recipe-detail', args=[recipe_id]), {})
+        )
+        for label, url, params in pages:
+            result = results[label] = {}
+            plain = client.get(url, params).content
+            for coding in codings:
+
+                def request():
+                    return client.get(
+                        url, params, HTTP_ACCEPT_ENCODING=coding
+                    )
+
+                size = len(request().content)
+                result[coding] = {
+                    'bytes': size,
+                    'ratio': round(size / len(plain), 3),
+                    'cpu_ms': cpu_per_call(request, args.requests),
+                    'compress_cpu_ms': 0.0 if coding == 'identity' else (
+                        cpu_per_call(
+                            lambda: middleware.compress(coding, plain),
+                            args.requests,
+                        )
+                    ),
+                }
+
+    harness.report(results)
+
+
+if __name__ == '__main__':
+    main()
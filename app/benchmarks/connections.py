@@ -0,0 +1,126 @@
+"""
+Benchmark requests with new, persistent and pooled database connections.
+
+Every client thread sends light requests whose time is dominated by
+connecting to the database when connections are not reused. The pool is
+only measured against PostgreSQL with the core.db.postgresql backend,
+where `connections_opened` counts the connections lent by the pool and
+`pool` the ones it really opened.
+
+Usage: python -m benchmarks.connections [--concurrency N] [--requests N]
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import harness
+
+
+def configurations(args, pooled):
+    """Return the DATABASES options to compare by name."""
+    configs = {
+        'per_request': {'CONN_MAX_AGE': 0, 'POOL': {}},
+        'persistent': {
+            'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True, 'POOL': {},
+        },
+        'persistent_unchecked': {
+            'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': False, 'POOL': {},
+        },
+    }
+    if pooled:
+        configs['pooled'] = {
+            'CONN_MAX_AGE': 0,
+            'CONN_HEALTH_CHECKS': True,
+            'POOL': {'MAX_SIZE': args.pool_size, 'TIMEOUT': 10},
+        }
+    return configs
+
+
+def run(url, token, args):
+    """Send requests from parallel clients, return latencies and connects."""
+    from django.db import close_old_connections, connection
+    from django.db.backends.signals import connection_created
+    from rest_framework.test import APIClient
+
+    latencies = []
+    connects = []
+    lock = threading.Lock()
+
+    def count_connect(sender, **kwargs):
+        with lock:
+            connects.append(None)
+
+    def client_loop(_number):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        try:
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                # The test client leaves this to the server's signals.
+                close_old_connections()
+                client.get(url)
+                close_old_connections()
+                latency = time.perf_counter() - start
+                with lock:
+                    latencies.append(latency)
+        finally:
+            connection.close()
+
+    connection_created.connect(count_connect)
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as executor:
+            list(executor.map(client_loop, range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+    finally:
+        connection_created.disconnect(count_connect)
+
+    result = harness.summarize(latencies, elapsed)
+    result['connections_opened'] = len(connects)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200,
+                        help='Requests per client.')
+    parser.add_argument('--pool-size', type=int, default=2)
+    args = parser.parse_args()
+
+    harness.setup()
+    from django.db import connection
+    from django.urls import reverse
+
+    from core.db.postgresql.base import DatabaseWrapper
+
+    pooled = isinstance(connection, DatabaseWrapper)
+    results = {
+        'database': connection.vendor,
+        'concurrency': args.concurrency,
+        'requests_per_client': args.requests,
+    }
+    # Client threads open their own connections to the test database.
+    with harness.test_database(shared=True):
+        [(_user, token)] = harness.seed(recipes=10)
+        url = reverse('recipe:tag-list')
+        # Threads create their wrappers with this same settings dict.
+        original = dict(connection.settings_dict)
+        connection.close()
+        try:
+            for name, options in configurations(args, pooled).items():
+                connection.settings_dict.update(options)
+                results[name] = run(url, token, args)
+                pool = connection.pool if pooled else None
+                if pool is not None:
+                    results[name]['pool'] = pool.stats()
+                    pool.close()
+        finally:
+            connection.settings_dict.update(original)
+
+    harness.report(results)
+
+
+if __name__ == '__main__':
+    main()
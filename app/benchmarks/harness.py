@@ -0,0 +1,158 @@
+"""
+Helpers shared by the benchmarks.
+
+Benchmarks run in-process against a throwaway test database created from
+the configured DATABASES, the same way the test runner does. Point
+DB_ENGINE/DB_NAME at SQLite to run them without PostgreSQL.
+"""
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+
+PASSWORD = 'benchpass123'
+
+
+def setup():
+    """Configure Django for a benchmark run."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database(shared=False):
+    """Create a test database for the duration of the block.
+
+    With `shared` an SQLite test database is kept in a file instead of in
+    memory so that server processes started by the benchmark can use it.
+    Yields the settings other processes need to connect to it.
+    """
+    from django.db import connection
+    from django.test.utils import (
+        setup_test_environment,
+        teardown_test_environment,
+    )
+
+    if shared and connection.vendor == 'sqlite':
+        connection.settings_dict['TEST']['NAME'] = os.path.join(
+            tempfile.gettempdir(), f'benchmark-{os.getpid()}.sqlite3'
+        )
+
+    setup_test_environment(debug=False)
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        yield {
+            'DB_ENGINE': connection.settings_dict['ENGINE'],
+            'DB_NAME': connection.settings_dict['NAME'],
+        }
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def seed(users=1, recipes=100, tags=10, tags_per_recipe=2):
+    """Create users with recipes and tags, return `(user, token)` pairs."""
+    from django.contrib.auth import get_user_model
+    from rest_framework.authtoken.models import Token
+
+    from core.models import (
+        ChangeLog,
+        CollectionVersion,
+        Recipe,
+        RecipeStats,
+        Tag,
+        TagStats,
+    )
+
+    seeded = []
+    for index in range(users):
+        user = get_user_model().objects.create_user(
+            email=f'bench{index}@example.com',
+            password=PASSWORD,
+            name=f'Bench {index}',
+        )
+        user_tags = Tag.objects.get_or_create_many(
+            user, [f'tag {number}' for number in range(tags)]
+        )
+        user_tags = list(user_tags.values())
+        Recipe.objects.bulk_create([
+            Recipe(
+                user=user,
+                title=f'Recipe {number}',
+                description='Benchmark recipe description. ' * 10,
+                price=Decimal(number % 100) + Decimal('0.99'),
+                time_minutes=number % 120,
+                link=f'https://example.com/{number}.pdf',
+            )
+            for number in range(recipes)
+        ], batch_size=1000)
+        if user_tags:
+            RecipeTag = Recipe.tags.through
+            RecipeTag.objects.bulk_create([
+                RecipeTag(recipe_id=recipe_id, tag_id=user_tags[
+                    (recipe_id + offset) % len(user_tags)
+                ].id)
+                for recipe_id in Recipe.objects.filter(
+                    user=user
+                ).values_list('id', flat=True)
+                for offset in range(min(tags_per_recipe, len(user_tags)))
+            ], batch_size=1000, ignore_conflicts=True)
+        # Bulk inserts send no signals, so bump the versions here.
+        CollectionVersion.objects.bump(
+            user.pk, CollectionVersion.RECIPES, CollectionVersion.TAGS
+        )
+        ChangeLog.objects.record(
+            user.pk,
+            CollectionVersion.RECIPES,
+            Recipe.objects.filter(user=user).values_list('id', flat=True),
+            created=True,
+        )
+        RecipeStats.objects.rebuild(user.pk)
+        TagStats.objects.rebuild(user.pk)
+        seeded.append((user, Token.objects.create(user=user)))
+
+    return seeded
+
+
+def timed(func, iterations):
+    """Call `func` repeatedly, return the latency of each call in seconds."""
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def summarize(latencies, elapsed=None):
+    """Return throughput and latency percentiles of calls.
+
+    Calls are sequential unless the wall clock `elapsed` time is given.
+    """
+    ordered = sorted(latencies)
+    if not ordered:
+        return {'requests': 0}
+
+    def percentile(fraction):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    return {
+        'requests': len(ordered),
+        'throughput': round(len(ordered) / (elapsed or sum(ordered)), 2),
+        'mean_ms': round(statistics.mean(ordered) * 1000, 3),
+        'p50_ms': round(percentile(0.50) * 1000, 3),
+        'p95_ms': round(percentile(0.95) * 1000, 3),
+        'p99_ms': round(percentile(0.99) * 1000, 3),
+    }
+
+
+def report(results):
+    """Print the results as JSON."""
+    json.dump(results, sys.stdout, indent=2, default=str)
+    sys.stdout.write('\n')
@@ -0,0 +1,207 @@
+"""
+Load test the main API endpoints at a fixed concurrency.
+
+Seeds users with recipes and tags, then drives every endpoint with
+`--concurrency` client threads and reports throughput, latency
+percentiles and queries per request as JSON. Runs against the configured
+PostgreSQL, or SQLite with DB_ENGINE=django.db.backends.sqlite3. Warm
+up requests fill the response cache, set API_RESPONSE_CACHE=0 to measure
+uncached responses.
+
+Save a run with `--output` and pass it as `--baseline` to a later one to
+exit with status 1 when an endpoint got slower than `--tolerance` allows
+or runs more queries.
+
+Usage: python -m benchmarks.load [--users N] [--recipes N] [--tags N]
+       [--concurrency N] [--requests N] [--output FILE] [--baseline FILE]
+"""
+import argparse
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import harness
+
+
+ENDPOINTS = {
+    'recipes': ('get', 'recipe:recipe-list'),
+    'tags': ('get', 'recipe:tag-list'),
+    'token': ('post', 'user:token'),
+    'me': ('get', 'user:me'),
+}
+
+
+def git_commit():
+    """Return the checked out commit, if any."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def drive(endpoint, seeded, args):
+    """Send `args.requests` requests to `endpoint` from parallel clients."""
+    from django.db import connection
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    method, name = ENDPOINTS[endpoint]
+    url = reverse(name)
+    remaining = itertools.count(args.requests, -1)
+    lock = threading.Lock()
+    latencies, queries, errors = [], [], []
+
+    def client_loop(number):
+        user, token = seeded[number % len(seeded)]
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        data = {'email': user.email, 'password': harness.PASSWORD}
+        send = getattr(client, method)
+        counted = []
+
+        def count_query(execute, *query):
+            counted.append(None)
+            return execute(*query)
+
+        try:
+            with connection.execute_wrapper(count_query):
+                for _ in range(args.warmup):
+                    send(url, data if method == 'post' else None)
+                while True:
+                    with lock:
+                        if next(remaining) <= 0:
+                            break
+                    counted.clear()
+                    start = time.perf_counter()
+                    response = send(url, data if method == 'post' else None)
+                    latency = time.perf_counter() - start
+                    with lock:
+                        latencies.append(latency)
+                        queries.append(len(counted))
+                        if response.status_code >= 400:
+                            errors.append(response.status_code)
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        list(executor.map(client_loop, range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    result = harness.summarize(latencies, elapsed)
+    result['queries_per_request'] = round(
+        sum(queries) / max(len(queries), 1), 2
+    )
+    result['errors'] = len(errors)
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Return the regressions of `results` against a `baseline` run."""
+    regressions = []
+    for endpoint, current in results['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(endpoint)
+        if previous is None:
+            continue
+        if current['queries_per_request'] > previous['queries_per_request']:
+            regressions.append(
+                f'{endpoint}: {previous["queries_per_request"]} -> '
+                f'{current["queries_per_request"]} queries per request'
+            )
+        if current['errors'] > previous['errors']:
+            regressions.append(
+                f'{endpoint}: {previous["errors"]} -> '
+                f'{current["errors"]} failed requests'
+            )
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(
+                f'{endpoint}: p95 {previous["p95_ms"]} -> '
+                f'{current["p95_ms"]} ms'
+            )
+        if current['throughput'] < previous['throughput'] * (1 - tolerance):
+            regressions.append(
+                f'{endpoint}: {previous["throughput"]} -> '
+                f'{current["throughput"]} requests per second'
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--recipes', type=int, default=200,
+                        help='Recipes per user.')
+    parser.add_argument('--tags', type=int, default=20,
+                        help='Tags per user.')
+    parser.add_argument('--tags-per-recipe', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=500,
+                        help='Requests per endpoint.')
+    parser.add_argument('--warmup', type=int, default=2,
+                        help='Unmeasured requests per client and endpoint.')
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS,
+                        default=list(ENDPOINTS))
+    parser.add_argument('--output', help='Also write the results to FILE.')
+    parser.add_argument('--baseline',
+                        help='Results of an earlier run to compare with.')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed fraction of slowdown, default 0.25.')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as stream:
+            baseline = json.load(stream)
+
+    harness.setup()
+    from django.db import connection
+
+    results = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'database': connection.vendor,
+        'config': {
+            name: getattr(args, name) for name in [
+                'users', 'recipes', 'tags', 'tags_per_recipe',
+                'concurrency', 'requests', 'warmup',
+            ]
+        },
+        'endpoints': {},
+    }
+    # Client threads open their own connections to the test database.
+    with harness.test_database(shared=True):
+        seeded = harness.seed(
+            users=args.users,
+            recipes=args.recipes,
+            tags=args.tags,
+            tags_per_recipe=args.tags_per_recipe,
+        )
+        for endpoint in args.endpoints:
+            results['endpoints'][endpoint] = drive(endpoint, seeded, args)
+
+    harness.report(results)
+    if args.output:
+        with open(args.output, 'w') as stream:
+            json.dump(results, stream, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            sys.stderr.write(f'Regression: {regression}\n')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
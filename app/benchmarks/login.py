@@ -0,0 +1,110 @@
+"""
+Benchmark login throughput per hashing worker process.
+
+Concurrent threads authenticate users whose passwords were hashed with
+each hasher, once per pool size. Throughput per worker approximates the
+logins a core sustains.
+
+Usage: python -m benchmarks.login [--hashers pbkdf2 scrypt] [--threads N]
+"""
+import argparse
+import os
+import threading
+import time
+
+from benchmarks import harness
+
+
+def login_load(email, threads, duration):
+    """Authenticate from `threads` threads, return latencies and refusals."""
+    from django.contrib.auth import authenticate
+    from django.db import connection
+
+    from core.hashing import HashingBusy
+
+    latencies = []
+    busy = []
+    deadline = time.monotonic() + duration
+
+    def worker():
+        try:
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    user = authenticate(
+                        username=email, password=harness.PASSWORD
+                    )
+                except HashingBusy:
+                    busy.append(1)
+                    continue
+                assert user is not None
+                latencies.append(time.perf_counter() - start)
+        finally:
+            connection.close()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return latencies, len(busy), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--hashers', nargs='+', default=['pbkdf2', 'scrypt'])
+    parser.add_argument(
+        '--workers', type=int, nargs='+',
+        default=sorted({1, max(1, (os.cpu_count() or 1) // 2),
+                        os.cpu_count() or 1}),
+    )
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+
+    harness.setup()
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.test.utils import override_settings
+
+    from core.hashing import hashing_pool
+
+    results = {'threads': args.threads, 'cpu_count': os.cpu_count()}
+    with harness.test_database(shared=True):
+        for name in args.hashers:
+            hasher = settings.PASSWORD_HASHER_ALGORITHMS[name]
+            hashers = [hasher] + [
+                path for path in settings.PASSWORD_HASHERS if path != hasher
+            ]
+            with override_settings(PASSWORD_HASHERS=hashers):
+                email = f'{name}@example.com'
+                get_user_model().objects.create_user(
+                    email=email, password=harness.PASSWORD
+                )
+                results[name] = {}
+                for workers in args.workers:
+                    options = dict(
+                        settings.PASSWORD_HASHING,
+                        WORKERS=workers,
+                        MAX_PENDING=args.threads,
+                    )
+                    with override_settings(PASSWORD_HASHING=options):
+                        # Start the workers before measuring.
+                        login_load(email, workers, 0.5)
+                        latencies, busy, elapsed = login_load(
+                            email, args.threads, args.duration
+                        )
+                    summary = harness.summarize(latencies, elapsed)
+                    summary['per_worker'] = round(
+                        summary.get('throughput', 0) / workers, 2
+                    )
+                    summary['refused'] = busy
+                    results[name][workers] = summary
+                hashing_pool.shutdown()
+
+    harness.report(results)
+
+
+if __name__ == '__main__':
+    main()
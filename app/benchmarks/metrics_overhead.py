@@ -0,0 +1,104 @@
+"""
+Benchmark the overhead of the metrics middleware on the recipe list.
+
+Rounds with metrics disabled and enabled alternate to even out noise.
+As end to end timings are noisy next to the few microseconds the
+middleware adds, its cost is also measured alone around a stub view.
+
+Usage: python -m benchmarks.metrics_overhead [--requests N] [--rounds N]
+"""
+import argparse
+
+from benchmarks import harness
+
+
+def middleware_cost(url, iterations=50000, queries=4):
+    """Return the microseconds the middleware adds to a request."""
+    import time
+
+    from django.test import RequestFactory
+    from django.urls import resolve
+    from rest_framework.response import Response
+
+    from core import metrics
+    from core.middleware import MetricsMiddleware
+
+    request = RequestFactory().get(url)
+    request.resolver_match = resolve(url)
+    response = Response({})
+
+    def view(request):
+        for _ in range(queries):
+            metrics.query_wrapper(
+                lambda *args: None, 'SELECT 1', (), False, {}
+            )
+        return response
+
+    middleware = MetricsMiddleware(view)
+    timings = []
+    for handler in (view, middleware):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            handler(request)
+        timings.append(time.perf_counter() - start)
+
+    return round((timings[1] - timings[0]) / iterations * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recipes', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument(
+        '--response-cache',
+        action='store_true',
+        help='Keep the response cache on, so requests are cheaper.',
+    )
+    args = parser.parse_args()
+
+    harness.setup()
+    from django.conf import settings
+    from django.test.utils import override_settings
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    latencies = {False: [], True: []}
+    cache = dict(settings.API_RESPONSE_CACHE, ENABLED=args.response_cache)
+    with harness.test_database(), override_settings(
+        API_RESPONSE_CACHE=cache
+    ):
+        [(_user, token)] = harness.seed(recipes=args.recipes)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        url = reverse('recipe:recipe-list')
+        params = {'page_size': args.page_size}
+        client.get(url, params)
+
+        for _round in range(args.rounds):
+            for enabled in (False, True):
+                metrics = dict(settings.METRICS, ENABLED=enabled)
+                with override_settings(METRICS=metrics):
+                    latencies[enabled] += harness.timed(
+                        lambda: client.get(url, params), args.requests
+                    )
+
+    results = {
+        'recipes': args.recipes,
+        'response_cache': args.response_cache,
+        'disabled': harness.summarize(latencies[False]),
+        'enabled': harness.summarize(latencies[True]),
+    }
+    results['overhead_percent'] = round(
+        100 * (sum(latencies[True]) / sum(latencies[False]) - 1), 2
+    )
+    results['middleware_us'] = middleware_cost(url)
+    results['middleware_percent'] = round(
+        results['middleware_us'] / 10 / results['disabled']['mean_ms'], 2
+    )
+    harness.report(results)
+
+
+if __name__ == '__main__':
+    main()
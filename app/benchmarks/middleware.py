@@ -0,0 +1,121 @@
+"""
+Benchmark the per-request overhead of the middleware on API paths.
+
+The stock Django session, CSRF, authentication and message middleware
+("before") are compared with the subclasses that skip them on
+SESSIONLESS_PATH_PREFIXES ("after"). Requests to a cheap token
+authenticated endpoint go through the whole stack in alternating rounds,
+and the stacks are also timed alone around a stub view.
+
+Usage: python -m benchmarks.middleware [--requests N] [--rounds N]
+"""
+import argparse
+
+from benchmarks import harness
+
+
+STOCK = {
+    'core.middleware.SessionMiddleware':
+        'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.CsrfViewMiddleware':
+        'django.middleware.csrf.CsrfViewMiddleware',
+    'core.middleware.AuthenticationMiddleware':
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.MessageMiddleware':
+        'django.contrib.messages.middleware.MessageMiddleware',
+}
+
+
+def stacks():
+    """Return the before and after MIDDLEWARE settings."""
+    from django.conf import settings
+
+    return {
+        'before': [STOCK.get(path, path) for path in settings.MIDDLEWARE],
+        'after': list(settings.MIDDLEWARE),
+    }
+
+
+def stack_cost(path, middleware, iterations=20000):
+    """Return the microseconds a middleware stack adds around a stub view,
+    without the `process_view` hooks."""
+    import time
+
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+    from django.utils.module_loading import import_string
+
+    response = HttpResponse()
+
+    def view(request):
+        # Touch the user like a view of the admin would.
+        getattr(request, 'user', None)
+        return response
+
+    handler = view
+    for name in reversed(middleware):
+        if name != 'core.middleware.MetricsMiddleware':
+            handler = import_string(name)(handler)
+
+    factory = RequestFactory()
+    timings = []
+    for func in (view, handler):
+        requests = [factory.get(path) for _ in range(iterations)]
+        start = time.perf_counter()
+        for request in requests:
+            func(request)
+        timings.append(time.perf_counter() - start)
+
+    return round((timings[1] - timings[0]) / iterations * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    harness.setup()
+    from django.test import Client
+    from django.test.utils import override_settings
+    from django.urls import reverse
+
+    configs = stacks()
+    latencies = {label: [] for label in configs}
+    with harness.test_database():
+        [(_user, token)] = harness.seed(recipes=0, tags=0)
+        url = reverse('user:me')
+        headers = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+
+        for _round in range(args.rounds):
+            for label, middleware in configs.items():
+                with override_settings(MIDDLEWARE=middleware):
+                    # The middleware chain is built per client.
+                    client = Client()
+                    client.get(url, **headers)
+                    latencies[label] += harness.timed(
+                        lambda: client.get(url, **headers), args.requests
+                    )
+
+        stack_us = {
+            path: {
+                label: stack_cost(path, middleware)
+                for label, middleware in configs.items()
+            }
+            for path in ['/api/recipe/recipes/', '/admin/']
+        }
+
+    results = {
+        label: harness.summarize(timings)
+        for label, timings in latencies.items()
+    }
+    results['saved_us_per_request'] = round(
+        (results['before']['mean_ms'] - results['after']['mean_ms']) * 1000,
+        2,
+    )
+    results['stack_us'] = stack_us
+    harness.report(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Benchmark the recipe list with and without the response cache.
+
+Usage: python -m benchmarks.response_cache [--recipes N] [--requests N]
+"""
+import argparse
+
+from benchmarks import harness
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recipes', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--page-size', type=int, default=100)
+    args = parser.parse_args()
+
+    harness.setup()
+    from django.conf import settings
+    from django.test.utils import override_settings
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    from recipe.cache import response_cache
+
+    results = {'recipes': args.recipes, 'page_size': args.page_size}
+    with harness.test_database():
+        [(_user, token)] = harness.seed(recipes=args.recipes)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        url = reverse('recipe:recipe-list')
+        params = {'page_size': args.page_size}
+
+        for enabled in (False, True):
+            options = dict(settings.API_RESPONSE_CACHE, ENABLED=enabled)
+            with override_settings(API_RESPONSE_CACHE=options):
+                response_cache.reset_stats()
+                client.get(url, params)
+                label = 'cached' if enabled else 'uncached'
+                results[label] = harness.summarize(harness.timed(
+                    lambda: client.get(url, params), args.requests
+                ))
+                results[label]['cache'] = response_cache.stats()
+
+    results['speedup'] = round(
+        results['cached']['throughput'] / results['uncached']['throughput'],
+        2,
+    )
+    harness.report(results)
+
+
+if __name__ == '__main__':
+    main()
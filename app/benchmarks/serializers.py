@@ -0,0 +1,69 @@
+"""
+Benchmark recipe and tag list pages with and without the fast list path.
+
+Pages of each size are requested with the response cache disabled, and
+the fast path is checked to render the same bytes.
+
+Usage: python -m benchmarks.serializers [--rows N ...] [--requests N]
+"""
+import argparse
+
+from benchmarks import harness
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--requests', type=int, default=10)
+    parser.add_argument('--tags-per-recipe', type=int, default=3)
+    args = parser.parse_args()
+
+    harness.setup()
+    from django.conf import settings
+    from django.test.utils import override_settings
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    try:
+        import orjson  # noqa
+        renderer = 'orjson'
+    except ImportError:
+        renderer = 'json'
+
+    rows = max(args.rows)
+    results = {'renderer': renderer}
+    with harness.test_database(), override_settings(
+        API_MAX_PAGE_SIZE=rows,
+        API_RESPONSE_CACHE=dict(settings.API_RESPONSE_CACHE, ENABLED=False),
+    ):
+        [(_user, token)] = harness.seed(
+            recipes=rows, tags=rows, tags_per_recipe=args.tags_per_recipe
+        )
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        for name in ['recipe', 'tag']:
+            url = reverse(f'recipe:{name}-list')
+            for size in args.rows:
+                params = {'page_size': size}
+                result = results[f'{name}s_{size}'] = {}
+                content = {}
+                for fast in (False, True):
+                    label = 'fast' if fast else 'regular'
+                    with override_settings(API_FAST_SERIALIZERS=fast):
+                        content[label] = client.get(url, params).content
+                        result[label] = harness.summarize(harness.timed(
+                            lambda: client.get(url, params), args.requests
+                        ))
+                result['identical'] = content['fast'] == content['regular']
+                result['speedup'] = round(
+                    result['fast']['throughput'] /
+                    result['regular']['throughput'],
+                    2,
+                )
+
+    harness.report(results)
+
+
+if __name__ == '__main__':
+    main()
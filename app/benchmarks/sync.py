@@ -0,0 +1,106 @@
+"""
+Benchmark syncing by changes against downloading the collections.
+
+A client holding every recipe and tag either downloads the full recipe
+and tag lists again ("full") or asks the sync endpoint for the changes
+since its token ("delta") after a few recipes were changed, for growing
+collection sizes. The response cache stays off so every request reads
+the database.
+
+Usage: python -m benchmarks.sync [--recipes N ...] [--changes N]
+"""
+import argparse
+
+from benchmarks import harness
+
+
+def download(client, url):
+    """Follow the pages of a list, return the bytes and queries read."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    size = queries = 0
+    while url:
+        with CaptureQueriesContext(connection) as captured:
+            res = client.get(url)
+        size += len(res.content)
+        queries += len(captured)
+        url = res.data['next']
+    return size, queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--recipes', type=int, nargs='+', default=[100, 1000, 10000]
+    )
+    parser.add_argument('--changes', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=20)
+    args = parser.parse_args()
+
+    harness.setup()
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext, override_settings
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    from core.models import Recipe
+
+    results = {}
+    with harness.test_database(), override_settings(
+        API_RESPONSE_CACHE=dict(settings.API_RESPONSE_CACHE, ENABLED=False),
+    ):
+        for count in args.recipes:
+            Recipe.objects.all().delete()
+            [(user, token)] = harness.seed(recipes=count, tags=20)
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+            lists = [
+                f'{reverse(name)}?page_size={settings.API_MAX_PAGE_SIZE}'
+                for name in ('recipe:recipe-list', 'recipe:tag-list')
+            ]
+            sync_url = reverse('recipe:sync')
+
+            # Bring the client up to date, then change a few recipes.
+            data = {'since': None, 'more': True}
+            while data['more']:
+                params = {'limit': settings.API_MAX_PAGE_SIZE}
+                if data['since']:
+                    params['since'] = data['since']
+                data = client.get(sync_url, params).data
+            since = data['since']
+            for recipe in Recipe.objects.filter(user=user)[:args.changes]:
+                recipe.title += ' changed'
+                recipe.save()
+
+            def full():
+                return [download(client, url) for url in lists]
+
+            def delta():
+                return client.get(sync_url, {'since': since})
+
+            with CaptureQueriesContext(connection) as captured:
+                res = delta()
+            delta_queries = len(captured)
+            full_bytes, full_queries = map(sum, zip(*full()))
+            results[f'recipes_{count}'] = {
+                'full': dict(
+                    harness.summarize(harness.timed(full, args.requests)),
+                    bytes=full_bytes,
+                    queries=full_queries,
+                ),
+                'delta': dict(
+                    harness.summarize(harness.timed(delta, args.requests)),
+                    bytes=len(res.content),
+                    queries=delta_queries,
+                    recipes=len(res.data['recipes']),
+                ),
+            }
+            user.delete()
+
+    harness.report(results)
+
+
+if __name__ == '__main__':
+    main()
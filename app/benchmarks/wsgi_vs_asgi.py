@@ -0,0 +1,217 @@
+"""
+Load test the API served by gunicorn (WSGI) and by uvicorn (ASGI).
+
+Every client keeps a connection open, trickles its requests and reads
+the responses slowly, like a phone on a poor mobile network. Both
+servers come from requirements.dev.txt.
+
+Usage: python -m benchmarks.wsgi_vs_asgi [--concurrency N] [--duration S]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from benchmarks import harness
+
+
+HOST = '127.0.0.1'
+
+SERVERS = {
+    'wsgi': [
+        '-m', 'gunicorn', 'app.wsgi:application',
+        '--worker-class', 'gthread',
+        '--workers', '{workers}',
+        '--threads', '{threads}',
+        '--bind', '{host}:{port}',
+        '--keep-alive', '75',
+        '--log-level', 'warning',
+    ],
+    'asgi': [
+        '-m', 'uvicorn', 'app.asgi:application',
+        '--workers', '{workers}',
+        '--host', '{host}',
+        '--port', '{port}',
+        '--no-access-log',
+        '--log-level', 'warning',
+    ],
+}
+
+PATHS = ['/api/recipe/recipes/', '/api/recipe/tags/', '/api/user/me/']
+
+
+def free_port():
+    """Return a TCP port nobody listens on."""
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def start_server(name, port, env, args):
+    """Start a server process and wait until it accepts connections."""
+    command = [sys.executable] + [
+        part.format(
+            workers=args.workers, threads=args.threads, host=HOST, port=port
+        )
+        for part in SERVERS[name]
+    ]
+    process = subprocess.Popen(
+        command,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env={**os.environ, **env},
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{name} server exited with {process.poll()}')
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+
+    process.terminate()
+    raise RuntimeError(f'{name} server did not start')
+
+
+async def read_body(reader, headers, args):
+    """Read a response body a little at a time."""
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                return
+            await asyncio.sleep(args.read_delay)
+
+    remaining = int(headers.get('content-length', 0))
+    while remaining:
+        chunk = await reader.readexactly(min(args.read_size, remaining))
+        remaining -= len(chunk)
+        await asyncio.sleep(args.read_delay)
+
+
+async def send_request(writer, request, args):
+    """Write a request in a few pieces with pauses in between."""
+    size = -(-len(request) // args.send_chunks)
+    for start in range(0, len(request), size):
+        writer.write(request[start:start + size])
+        await writer.drain()
+        await asyncio.sleep(args.send_delay)
+
+
+async def client(port, requests, deadline, latencies, errors, args):
+    """Send requests over one keep-alive connection until `deadline`."""
+    writer = None
+    for request in requests:
+        if time.monotonic() >= deadline:
+            break
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(HOST, port)
+            start = time.perf_counter()
+            await send_request(writer, request, args)
+            head = await reader.readuntil(b'\r\n\r\n')
+            status_line, *lines = head.decode('latin-1').split('\r\n')
+            headers = dict(
+                (key.lower(), value.strip()) for key, _sep, value in (
+                    line.partition(':') for line in lines if line
+                )
+            )
+            await read_body(reader, headers, args)
+            status = status_line.split()[1]
+            if status == '200':
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors[status] += 1
+            if headers.get('connection') == 'close':
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError, ValueError) as error:
+            errors[type(error).__name__] += 1
+            if writer is not None:
+                writer.close()
+            writer = None
+
+    if writer is not None:
+        writer.close()
+
+
+async def load(port, tokens, args):
+    """Run the concurrent clients, return the latencies and errors."""
+    latencies = []
+    errors = Counter()
+    deadline = time.monotonic() + args.duration
+    clients = []
+    for number in range(args.concurrency):
+        token = tokens[number % len(tokens)]
+        requests = itertools.cycle([
+            (
+                f'GET {path} HTTP/1.1\r\n'
+                f'Host: {HOST}:{port}\r\n'
+                f'Authorization: Token {token}\r\n'
+                'Accept: application/json\r\n'
+                '\r\n'
+            ).encode()
+            for path in PATHS
+        ])
+        clients.append(
+            client(port, requests, deadline, latencies, errors, args)
+        )
+
+    start = time.perf_counter()
+    await asyncio.gather(*clients)
+    return latencies, errors, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--servers', nargs='+', default=list(SERVERS))
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--recipes', type=int, default=50)
+    parser.add_argument('--send-chunks', type=int, default=3)
+    parser.add_argument('--send-delay', type=float, default=0.05)
+    parser.add_argument('--read-size', type=int, default=4096)
+    parser.add_argument('--read-delay', type=float, default=0.05)
+    args = parser.parse_args()
+
+    harness.setup()
+    results = {
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'workers': args.workers,
+        'threads': args.threads,
+    }
+    with harness.test_database(shared=True) as database:
+        tokens = [
+            token.key for _user, token in harness.seed(
+                users=args.users, recipes=args.recipes
+            )
+        ]
+        for name in args.servers:
+            port = free_port()
+            process = start_server(name, port, database, args)
+            try:
+                latencies, errors, elapsed = asyncio.run(
+                    load(port, tokens, args)
+                )
+            finally:
+                process.terminate()
+                process.wait()
+            results[name] = harness.summarize(latencies, elapsed)
+            results[name]['errors'] = dict(errors)
+
+    harness.report(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Helpers to serve API views natively from the event loop under ASGI.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern
+
+from rest_framework import exceptions
+from rest_framework.routers import DefaultRouter
+
+
+# Safe methods answered by the async path, others go to the sync view.
+ASYNC_METHODS = ('get', 'head')
+
+
+def database_sync_to_async(func):
+    """Return an awaitable version of `func` for code using the ORM.
+
+    Django 3.2 runs all thread sensitive code in a single shared thread,
+    so ORM code runs in the executor pool instead and closes the worker
+    thread's connections like the end of a request would. Tests enable
+    ASYNC_DB_THREAD_SENSITIVE to stay inside the test transaction.
+    """
+    if settings.ASYNC_DB_THREAD_SENSITIVE:
+        return sync_to_async(func, thread_sensitive=True)
+
+    @functools.wraps(func)
+    def inner(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(inner, thread_sensitive=False)
+
+
+def async_api_view(sync_view):
+    """Return an async view serving the safe methods of a DRF view.
+
+    `sync_view` is the result of `as_view()` of an APIView or a viewset.
+    Authentication, content negotiation, permission checks and rendering
+    happen on the event loop. A handler named `async_<action>` (or
+    `async_<method>` outside viewsets) is awaited directly, any other
+    handler runs in one `database_sync_to_async` call.
+    """
+    cls, initkwargs = sync_view.cls, sync_view.initkwargs
+    actions = getattr(sync_view, 'actions', None)
+    if actions is not None and 'get' in actions:
+        actions = {'head': actions['get'], **actions}
+
+    @functools.wraps(sync_view)
+    async def view(request, *args, **kwargs):
+        method = request.method.lower()
+        if method not in ASYNC_METHODS or (
+            actions is not None and method not in actions
+        ):
+            return await sync_to_async(sync_view, thread_sensitive=True)(
+                request, *args, **kwargs
+            )
+
+        self = cls(**initkwargs)
+        if actions is not None:
+            self.action_map = actions
+            for http_method, action in actions.items():
+                setattr(self, http_method, getattr(self, action))
+            name = actions[method]
+        else:
+            name = 'get' if method == 'head' else method
+
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await _initial(self, request, *args, **kwargs)
+            handler = getattr(self, f'async_{name}', None)
+            if handler is None:
+                handler = database_sync_to_async(getattr(self, name))
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(
+            request, response, *args, **kwargs
+        )
+        return self.response
+
+    return view
+
+
+async def _initial(view, request, *args, **kwargs):
+    """Run `APIView.initial` with an async authentication step."""
+    view.format_kwarg = view.get_format_suffix(**kwargs)
+
+    neg = view.perform_content_negotiation(request)
+    request.accepted_renderer, request.accepted_media_type = neg
+
+    version, scheme = view.determine_version(request, *args, **kwargs)
+    request.version, request.versioning_scheme = version, scheme
+
+    await _authenticate(request)
+    view.check_permissions(request)
+    view.check_throttles(request)
+
+
+async def _authenticate(request):
+    """Resolve `request.user` like `Request._authenticate` does.
+
+    Authenticators providing `authenticate_async` are awaited, others run
+    in the database thread pool.
+    """
+    for authenticator in request.authenticators:
+        authenticate = getattr(authenticator, 'authenticate_async', None)
+        if authenticate is None:
+            authenticate = database_sync_to_async(authenticator.authenticate)
+        try:
+            user_auth = await authenticate(request)
+        except exceptions.APIException:
+            request._not_authenticated()
+            raise
+
+        if user_auth is not None:
+            request._authenticator = authenticator
+            request.user, request.auth = user_auth
+            return
+
+    request._not_authenticated()
+
+
+class AsyncRouter(DefaultRouter):
+    """Router serving the registered viewsets with `async_api_view`."""
+
+    def get_urls(self):
+        viewsets = {viewset for _prefix, viewset, _basename in self.registry}
+        return [
+            URLPattern(
+                url.pattern,
+                async_api_view(url.callback),
+                url.default_args,
+                url.name,
+            )
+            if getattr(url.callback, 'cls', None) in viewsets else url
+            for url in super().get_urls()
+        ]
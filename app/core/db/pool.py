@@ -0,0 +1,101 @@
+"""
+Bounded pool of database connections shared by the threads of a process.
+"""
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    """No connection of the pool became free in time."""
+
+
+class ConnectionPool:
+    """Lend up to `max_size` open connections, waiting for a free one.
+
+    `reset(connection)` runs when a connection is returned and tells
+    whether it can be lent again. `check(connection)` runs before an idle
+    connection is lent and tells whether it still works. Connections that
+    fail either are closed and replaced.
+    """
+
+    def __init__(self, max_size, timeout, reset=None, check=None):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.reset = reset
+        self.check = check
+        self._idle = []
+        self._size = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, connect):
+        """Return `(connection, created)`, opening it with `connect()`.
+
+        Raises PoolTimeout when all connections stay in use for `timeout`
+        seconds.
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(
+                            f'All {self.max_size} database connections '
+                            f'stayed in use for {self.timeout} seconds.'
+                        )
+                    self._condition.wait(remaining)
+                if self._idle:
+                    connection = self._idle.pop()
+                else:
+                    connection = None
+                    self._size += 1
+
+            if connection is None:
+                try:
+                    return connect(), True
+                except BaseException:
+                    self._forget()
+                    raise
+            if self.check is None or self.check(connection):
+                return connection, False
+            self.discard(connection)
+
+    def release(self, connection):
+        """Take back a connection for the next thread."""
+        if self.reset is not None and not self.reset(connection):
+            self.discard(connection)
+            return
+        with self._condition:
+            # The most recently used connection is lent first.
+            self._idle.append(connection)
+            self._condition.notify()
+
+    def discard(self, connection):
+        """Close a lent connection and make room for a new one."""
+        try:
+            connection.close()
+        except Exception:
+            pass
+        self._forget()
+
+    def close(self):
+        """Close the idle connections."""
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for connection in idle:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def stats(self):
+        """Return the number of open and idle connections."""
+        with self._condition:
+            return {'size': self._size, 'idle': len(self._idle)}
+
+    def _forget(self):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
@@ -0,0 +1,142 @@
+"""
+PostgreSQL backend with connection health checks and a connection pool.
+"""
+import os
+import threading
+
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from core.db.pool import ConnectionPool, PoolTimeout
+from core.db.postgresql.creation import DatabaseCreation
+
+
+Database = base.Database
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def reset_connection(connection):
+    """Roll back what the last user left open, False if it is broken."""
+    if connection.closed:
+        return False
+    try:
+        if (connection.get_transaction_status() !=
+                extensions.TRANSACTION_STATUS_IDLE):
+            connection.rollback()
+        return (connection.get_transaction_status() ==
+                extensions.TRANSACTION_STATUS_IDLE)
+    except Database.Error:
+        return False
+
+
+def check_connection(connection):
+    """Tell whether an idle connection still answers."""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except Database.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL backend configured by two extra DATABASES keys.
+
+    With CONN_HEALTH_CHECKS, persistent connections run a query before
+    their first use in a request and reconnect when it fails, as in
+    Django 4.1. POOL['MAX_SIZE'] connections are shared by the threads of
+    the process, waiting up to POOL['TIMEOUT'] seconds for a free one.
+    """
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+
+    @property
+    def pool(self):
+        """Return the connection pool of this database, if enabled."""
+        options = self.settings_dict.get('POOL') or {}
+        if not options.get('MAX_SIZE') or self.alias == NO_DB_ALIAS:
+            return None
+
+        # Forked server workers must not share the connections.
+        key = (os.getpid(), self.alias, self.settings_dict['NAME'])
+        pool = _pools.get(key)
+        if pool is None:
+            with _pools_lock:
+                pool = _pools.get(key)
+                if pool is None:
+                    pool = _pools[key] = ConnectionPool(
+                        options['MAX_SIZE'],
+                        options.get('TIMEOUT', 10),
+                        reset=reset_connection,
+                        check=check_connection if self.health_checks
+                        else None,
+                    )
+        return pool
+
+    @property
+    def health_checks(self):
+        return bool(self.settings_dict.get('CONN_HEALTH_CHECKS'))
+
+    def close_pool(self):
+        """Close the idle connections of the pool."""
+        pool = self.pool
+        if pool is not None:
+            pool.close()
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+
+        try:
+            connection, created = pool.acquire(
+                lambda: super(DatabaseWrapper, self).get_new_connection(
+                    conn_params
+                )
+            )
+        except PoolTimeout as error:
+            raise Database.OperationalError(str(error))
+        if not created:
+            self.isolation_level = self.settings_dict['OPTIONS'].get(
+                'isolation_level', connection.isolation_level
+            )
+        return connection
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+
+        if self.in_atomic_block:
+            # The wrapper holds on to the connection until the block exits.
+            pool.discard(self.connection)
+        else:
+            pool.release(self.connection)
+
+    def close_if_unusable_or_obsolete(self):
+        if self.connection is not None:
+            self.health_check_done = False
+        super().close_if_unusable_or_obsolete()
+
+    def close_if_health_check_failed(self):
+        """Close a persistent connection that stopped working."""
+        if (self.connection is None or not self.health_checks or
+                self.health_check_done):
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
@@ -0,0 +1,140 @@
+"""
+Routing of safe API reads to read replicas of the default database.
+"""
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+
+# Follows the request into threads of sync_to_async calls.
+_replica = contextvars.ContextVar('replica', default=None)
+
+# Seconds behind the primary, zero when all received changes are replayed.
+# Both functions return NULL on a primary, which has no lag either.
+LAG_SQL = (
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() '
+    'THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) '
+    'END'
+)
+
+
+def get_replica():
+    """Return the replica reads are routed to, None for the primary."""
+    return _replica.get()
+
+
+class ReplicaLag:
+    """Replication lag of each replica, measured at most every
+    DATABASE_REPLICAS['CHECK_INTERVAL'] seconds per process."""
+
+    def __init__(self):
+        self._checked = {}
+
+    def get(self, alias):
+        """Return the lag of a replica in seconds, None if it is down."""
+        now = time.monotonic()
+        checked = self._checked.get(alias)
+        if checked is not None and (
+            now - checked[0] < settings.DATABASE_REPLICAS['CHECK_INTERVAL']
+        ):
+            return checked[1]
+
+        lag = self.measure(alias)
+        self._checked[alias] = (now, lag)
+        return lag
+
+    def measure(self, alias):
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            return 0.0
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(LAG_SQL)
+                [lag] = cursor.fetchone()
+        except DatabaseError:
+            return None
+        return float(lag or 0)
+
+    def reset(self):
+        self._checked.clear()
+
+
+replica_lag = ReplicaLag()
+
+
+def _pin_key(user):
+    return f'replica-pin:{user.pk}'
+
+
+def _pin_cache():
+    return caches[settings.DATABASE_REPLICAS['CACHE']]
+
+
+def pin_to_primary(user):
+    """Send the reads of a user who just wrote to the primary for a while."""
+    if user.is_authenticated and settings.DATABASE_REPLICAS['ALIASES']:
+        _pin_cache().set(
+            _pin_key(user),
+            True,
+            settings.DATABASE_REPLICAS['STICKY_SECONDS'],
+        )
+
+
+def choose_replica(user):
+    """Return a replica in sync enough for `user` to read from, or None."""
+    options = settings.DATABASE_REPLICAS
+    if not options['ALIASES']:
+        return None
+    if user.is_authenticated and _pin_cache().get(_pin_key(user)):
+        return None
+
+    aliases = []
+    for alias in options['ALIASES']:
+        lag = replica_lag.get(alias)
+        if lag is not None and lag <= options['MAX_LAG_SECONDS']:
+            aliases.append(alias)
+    return random.choice(aliases) if aliases else None
+
+
+@contextmanager
+def replica_reads(user):
+    """Route the reads of the block to a replica chosen for `user`.
+
+    Every read of the block goes to the same database, so that related
+    data such as collection versions stay consistent with each other.
+    """
+    token = _replica.set(choose_replica(user))
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+class ReplicaRouter:
+    """Send reads inside `replica_reads` to a replica, the rest to default.
+
+    Replicas are never migrated, they copy the schema from the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return get_replica()
+
+    def db_for_write(self, model, **hints):
+        # Instances read from a replica are still saved to the primary.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS['ALIASES']}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS['ALIASES']:
+            return False
+        return None
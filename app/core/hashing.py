@@ -0,0 +1,255 @@
+"""
+Password hashing on a bounded process pool.
+"""
+import base64
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.utils.crypto import constant_time_compare
+from django.utils.translation import gettext_lazy as _
+
+
+class HashingBusy(Exception):
+    """Too many hashes are queued, the caller should retry in `wait`
+    seconds."""
+
+    def __init__(self, wait):
+        super().__init__(f'Too many password hashes queued, retry in {wait}s.')
+        self.wait = wait
+
+
+class HashingPool:
+    """Process pool running password hashers off the request worker.
+
+    At most PASSWORD_HASHING['MAX_PENDING'] hashes may be queued or
+    running per server process, further ones raise HashingBusy. With no
+    WORKERS, hashes run in the calling thread under the same limit.
+    `workers` overrides the WORKERS setting.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers
+        self._executor = None
+        self._executor_key = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def options(self):
+        return settings.PASSWORD_HASHING
+
+    def run(self, func, *args):
+        """Return `func(*args)` computed on the pool."""
+        with self._lock:
+            if self._pending >= self.options['MAX_PENDING']:
+                raise HashingBusy(self.options['RETRY_AFTER'])
+            self._pending += 1
+            executor = self._get_executor()
+
+        try:
+            if executor is None:
+                return func(*args)
+            return executor.submit(func, *args).result()
+        except BrokenProcessPool:
+            self.shutdown()
+            raise
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def map(self, func, iterable, *args, chunksize=16):
+        """Return `func(item, *args)` for each item, using every worker.
+
+        Meant for batch jobs, which are not limited by MAX_PENDING.
+        """
+        with self._lock:
+            executor = self._get_executor()
+
+        if executor is None:
+            return [func(item, *args) for item in iterable]
+        try:
+            return list(executor.map(
+                func,
+                iterable,
+                *[repeat(arg) for arg in args],
+                chunksize=chunksize,
+            ))
+        except BrokenProcessPool:
+            self.shutdown()
+            raise
+
+    def shutdown(self):
+        """Stop the worker processes, they restart on the next hash."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _get_executor(self):
+        """Return the executor for the current process and settings."""
+        workers = self.workers
+        if workers is None:
+            workers = self.options['WORKERS']
+        key = (os.getpid(), workers)
+        if key != self._executor_key:
+            # Never reuse the pool of a parent process after a fork.
+            forked = self._executor_key and self._executor_key[0] != key[0]
+            if self._executor is not None and not forked:
+                self._executor.shutdown(wait=False)
+            self._executor = None
+            self._executor_key = key
+            if workers:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=django.setup,
+                )
+
+        return self._executor
+
+
+hashing_pool = HashingPool()
+
+
+def make_password(password):
+    """Return `django.contrib.auth.hashers.make_password` from the pool."""
+    if password is None:
+        return hashers.make_password(None)
+
+    return hashing_pool.run(
+        hashers.make_password, password, None, hashers.get_hasher()
+    )
+
+
+def make_passwords(passwords, pool=hashing_pool):
+    """Return the hashes of many passwords made in parallel by `pool`.
+
+    Passwords that are None get an unusable password.
+    """
+    return pool.map(
+        hashers.make_password, passwords, None, hashers.get_hasher()
+    )
+
+
+def check_password(password, encoded, setter=None):
+    """Verify like `django.contrib.auth.hashers.check_password` on the pool.
+
+    Hashes of another algorithm or outdated parameters are passed to
+    `setter` to be rehashed with the preferred hasher.
+    """
+    if password is None or not hashers.is_password_usable(encoded):
+        return False
+
+    preferred = hashers.get_hasher()
+    try:
+        hasher = hashers.identify_hasher(encoded)
+    except ValueError:
+        return False
+
+    hasher_changed = hasher.algorithm != preferred.algorithm
+    must_update = hasher_changed or preferred.must_update(encoded)
+    is_correct = hashing_pool.run(_verify, hasher, password, encoded)
+
+    # Take as long as a correct password would, see Django's version.
+    if not is_correct and not hasher_changed and must_update:
+        hashing_pool.run(_harden_runtime, hasher, password, encoded)
+
+    if setter and is_correct and must_update:
+        setter(password)
+    return is_correct
+
+
+def _verify(hasher, password, encoded):
+    return hasher.verify(password, encoded)
+
+
+def _harden_runtime(hasher, password, encoded):
+    hasher.harden_runtime(password, encoded)
+
+
+class ScryptPasswordHasher(hashers.BasePasswordHasher):
+    """Memory-hard scrypt hasher tuned by PASSWORD_HASHING['SCRYPT'].
+
+    Hashes made with other parameters are upgraded on the next login.
+    """
+    algorithm = 'scrypt'
+
+    def __init__(self):
+        # Instance attributes travel with the hasher to pool processes.
+        options = settings.PASSWORD_HASHING['SCRYPT']
+        self.work_factor = options['N']
+        self.block_size = options['R']
+        self.parallelism = options['P']
+
+    def encode(self, password, salt, n=None, r=None, p=None):
+        assert password is not None
+        assert salt and '$' not in salt
+        n = n or self.work_factor
+        r = r or self.block_size
+        p = p or self.parallelism
+        hash = hashlib.scrypt(
+            password.encode(),
+            salt=salt.encode(),
+            n=n,
+            r=r,
+            p=p,
+            maxmem=128 * r * (n + p + 2) + 1024 * 1024,
+            dklen=64,
+        )
+        hash = base64.b64encode(hash).decode('ascii').strip()
+        return f'{self.algorithm}${n}${salt}${r}${p}${hash}'
+
+    def decode(self, encoded):
+        algorithm, n, salt, r, p, hash = encoded.split('$', 5)
+        assert algorithm == self.algorithm
+        return {
+            'algorithm': algorithm,
+            'work_factor': int(n),
+            'salt': salt,
+            'block_size': int(r),
+            'parallelism': int(p),
+            'hash': hash,
+        }
+
+    def verify(self, password, encoded):
+        decoded = self.decode(encoded)
+        encoded_2 = self.encode(
+            password,
+            decoded['salt'],
+            decoded['work_factor'],
+            decoded['block_size'],
+            decoded['parallelism'],
+        )
+        return constant_time_compare(encoded, encoded_2)
+
+    def safe_summary(self, encoded):
+        decoded = self.decode(encoded)
+        return {
+            _('algorithm'): decoded['algorithm'],
+            _('work factor'): decoded['work_factor'],
+            _('block size'): decoded['block_size'],
+            _('parallelism'): decoded['parallelism'],
+            _('salt'): hashers.mask_hash(decoded['salt']),
+            _('hash'): hashers.mask_hash(decoded['hash']),
+        }
+
+    def must_update(self, encoded):
+        decoded = self.decode(encoded)
+        return (
+            decoded['work_factor'] != self.work_factor or
+            decoded['block_size'] != self.block_size or
+            decoded['parallelism'] != self.parallelism or
+            hashers.must_update_salt(decoded['salt'], self.salt_entropy)
+        )
+
+    def harden_runtime(self, password, encoded):
+        # The cost only depends on the parameters checked by must_update.
+        pass
@@ -0,0 +1,37 @@
+"""
+Django command to drop old tombstones from the change logs of users.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.models import ChangeLog
+
+
+class Command(BaseCommand):
+    """Django command to compact the change logs read by sync clients."""
+    help = (
+        'Drop the tombstones of recipes and tags deleted more than --days '
+        'ago. Schedule it to keep syncing proportional to the changes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.SYNC_TOMBSTONE_DAYS,
+            help='Age of the tombstones to drop, defaults to '
+                 'SYNC_TOMBSTONE_DAYS.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options['days'] < 0:
+            raise CommandError('--days must not be negative.')
+
+        dropped = ChangeLog.objects.compact(
+            timezone.now() - timedelta(days=options['days'])
+        )
+        self.stdout.write(self.style.SUCCESS(f'Dropped {dropped} tombstones.'))
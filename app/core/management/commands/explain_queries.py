@@ -0,0 +1,67 @@
+"""
+Django command to print the query plans of the API viewsets.
+"""
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from rest_framework.settings import api_settings
+
+from recipe.views import RecipeViewSet, TagViewSet
+
+
+class Command(BaseCommand):
+    """Django command to explain viewset querysets."""
+    help = 'Print EXPLAIN plans for the list and detail queries of the API.'
+
+    viewsets = [RecipeViewSet, TagViewSet]
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Email of the user to plan for, defaults to the first user.',
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Execute the queries with EXPLAIN ANALYZE (PostgreSQL).',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        users = get_user_model().objects.order_by('id')
+        if options['user']:
+            users = users.filter(email=options['user'])
+        user = users.first()
+        if user is None:
+            raise CommandError('No user to plan the queries for.')
+
+        explain_options = {'analyze': True} if options['analyze'] else {}
+        for viewset in self.viewsets:
+            for label, queryset in self.get_querysets(viewset, user):
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f'{viewset.__name__} {label}'
+                ))
+                self.stdout.write(str(queryset.query))
+                try:
+                    self.stdout.write(queryset.explain(**explain_options))
+                except ValueError as error:
+                    raise CommandError(error)
+                self.stdout.write('')
+
+    def get_querysets(self, viewset, user):
+        """Yield `(label, queryset)` for the queries a viewset runs."""
+        request = SimpleNamespace(user=user, query_params=QueryDict())
+        view = viewset(request=request, action='list', format_kwarg=None)
+        queryset = view.get_queryset()
+
+        paginator = view.paginator
+        page_size = api_settings.PAGE_SIZE
+        if paginator is not None and hasattr(paginator, 'ordering'):
+            queryset = queryset.order_by(*paginator.ordering)
+        yield 'list', queryset[:page_size + 1]
+
+        pk = queryset.values_list('pk', flat=True).first() or 0
+        yield 'detail', view.get_queryset().filter(pk=pk)
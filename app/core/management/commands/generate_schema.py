@@ -0,0 +1,46 @@
+"""
+Django command to pre-generate the OpenAPI schema served by the API.
+"""
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import schema
+
+
+class Command(BaseCommand):
+    """Django command to write the schema files."""
+    help = (
+        'Render the OpenAPI schema as YAML and JSON, with gzipped copies, '
+        'for the schema view to serve without generating it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--directory',
+            default=settings.API_SCHEMA['DIRECTORY'],
+            help='Directory to write to, defaults to API_SCHEMA_DIR.',
+        )
+        parser.add_argument(
+            '--lang',
+            action='append',
+            default=[],
+            help='Also render the schema in this language, repeatable.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        directory = options['directory']
+        if not directory:
+            raise CommandError('Pass --directory or set API_SCHEMA_DIR.')
+        languages = dict(settings.LANGUAGES)
+        for lang in options['lang']:
+            if lang not in languages:
+                raise CommandError(f'Unknown language {lang}.')
+
+        os.makedirs(directory, exist_ok=True)
+        for lang in [None, *options['lang']]:
+            for file_format in schema.RENDERERS:
+                path = schema.write_schema(directory, file_format, lang)
+                self.stdout.write(f'Wrote {path}')
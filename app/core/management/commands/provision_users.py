@@ -0,0 +1,270 @@
+"""
+Django command to create users in bulk from a CSV or NDJSON file.
+"""
+import csv
+import json
+import os
+import sys
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+
+from rest_framework.authtoken.models import Token
+
+from core.hashing import HashingPool, make_passwords
+from user.serializers import UserSerializer
+
+
+class ProvisionUserSerializer(UserSerializer):
+    """Validate a user record, leaving duplicates to one query per batch."""
+
+    class Meta(UserSerializer.Meta):
+        extra_kwargs = {
+            'email': {'validators': []},
+            'password': {
+                **UserSerializer.Meta.extra_kwargs['password'],
+                'required': False,
+            },
+        }
+
+
+def read_rows(stream, file_format):
+    """Yield `(line, data)` for each record of a binary stream.
+
+    `data` is None for a record that could not be decoded.
+    """
+    malformed = set()
+    lines = decode_lines(stream, malformed)
+    if file_format == 'csv':
+        reader = csv.DictReader(lines)
+        if reader.fieldnames is None:
+            return
+        last = reader.line_num
+        for row in reader:
+            first, last = last + 1, reader.line_num
+            if malformed.intersection(range(first, last + 1)):
+                yield last, None
+                continue
+            # Empty cells are missing values, not blank ones.
+            yield last, {
+                key: value for key, value in row.items()
+                if key is not None and value not in ('', None)
+            }
+        return
+
+    for number, line in enumerate(lines, start=1):
+        if number in malformed:
+            yield number, None
+            continue
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            data = None
+        yield number, data if isinstance(data, dict) else None
+
+
+def decode_lines(stream, malformed):
+    """Yield the lines of a binary stream decoded from UTF-8.
+
+    Lines are decoded one by one so that a bad byte only loses its own
+    record: its number is added to `malformed` and it is yielded with
+    replacement characters, keeping a CSV reader in step.
+    """
+    for number, line in enumerate(stream, start=1):
+        try:
+            yield line.decode('utf-8')
+        except UnicodeDecodeError:
+            malformed.add(number)
+            yield line.decode('utf-8', 'replace')
+
+
+class Command(BaseCommand):
+    """Django command to provision users in bulk."""
+    help = (
+        'Create users and their auth tokens from a CSV or NDJSON file, '
+        'resuming from the checkpoint of an interrupted run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='CSV or NDJSON file with email, name and password, '
+                 '"-" for stdin.',
+        )
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'ndjson'],
+            help='Format of the file, guessed from its extension.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Users hashed and inserted per transaction.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Password hashing processes, defaults to the number of '
+                 'CPUs.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Progress file, defaults to PATH.checkpoint.',
+        )
+        parser.add_argument(
+            '--tokens-out',
+            help='CSV file to append the email and token of new users to.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.lower().endswith('.csv') else 'ndjson'
+        )
+        checkpoint = options['checkpoint']
+        if checkpoint is None and path != '-':
+            checkpoint = f'{path}.checkpoint'
+
+        progress = self.load_checkpoint(checkpoint)
+        if progress['records']:
+            self.stdout.write(
+                f'Resuming after {progress["records"]} records.'
+            )
+
+        pool = HashingPool(workers=options['workers'])
+        try:
+            with self.open_input(path) as stream:
+                rows = islice(
+                    read_rows(stream, file_format), progress['records'], None
+                )
+                while True:
+                    batch = list(islice(rows, options['batch_size']))
+                    if not batch:
+                        break
+                    tokens = self.provision(batch, pool, progress)
+                    progress['records'] += len(batch)
+                    # Users of a batch written before a crash are skipped
+                    # on resume, so tokens go out before the checkpoint.
+                    self.write_tokens(options['tokens_out'], tokens)
+                    self.save_checkpoint(checkpoint, progress)
+                    if options['verbosity'] > 1:
+                        self.stdout.write(
+                            f'{progress["records"]} records processed.'
+                        )
+        finally:
+            pool.shutdown()
+
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {progress["created"]} users, '
+            f'skipped {progress["skipped"]} existing, '
+            f'rejected {progress["failed"]} invalid.'
+        ))
+
+    def provision(self, batch, pool, progress):
+        """Create the users of a batch, return their `(email, token)`."""
+        User = get_user_model()
+        records = {}
+        for line, data in batch:
+            if data is None:
+                self.reject(
+                    progress, line, {'non_field_errors': ['Malformed record.']}
+                )
+                continue
+            serializer = ProvisionUserSerializer(data=data)
+            if not serializer.is_valid():
+                self.reject(progress, line, serializer.errors)
+                continue
+            data = serializer.validated_data
+            email = User.objects.normalize_email(data['email'])
+            if email in records:
+                progress['skipped'] += 1
+                continue
+            records[email] = data
+
+        existing = set(User.objects.filter(
+            email__in=records
+        ).values_list('email', flat=True))
+        progress['skipped'] += len(existing)
+        records = {
+            email: data for email, data in records.items()
+            if email not in existing
+        }
+        if not records:
+            return []
+
+        passwords = make_passwords(
+            [data.get('password') for data in records.values()], pool
+        )
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create([
+                    User(email=email, name=data.get('name', ''), password=hash)
+                    for (email, data), hash in zip(records.items(), passwords)
+                ])
+                # Not every backend returns the ids from bulk_create.
+                user_ids = list(User.objects.filter(
+                    email__in=records
+                ).values_list('email', 'id'))
+                tokens = [
+                    Token(user_id=user_id, key=Token.generate_key())
+                    for _email, user_id in user_ids
+                ]
+                Token.objects.bulk_create(tokens)
+        except DatabaseError as error:
+            raise CommandError(
+                f'Batch after record {progress["records"]} failed: {error}. '
+                'Run the command again to resume from the checkpoint.'
+            )
+
+        progress['created'] += len(tokens)
+        emails = {user_id: email for email, user_id in user_ids}
+        return [(emails[token.user_id], token.key) for token in tokens]
+
+    def reject(self, progress, line, errors):
+        progress['failed'] += 1
+        self.stderr.write(f'Line {line}: {json.dumps(errors)}')
+
+    @contextmanager
+    def open_input(self, path):
+        """Open the input file, or stdin for "-", in binary mode."""
+        if path == '-':
+            yield sys.stdin.buffer
+            return
+        try:
+            stream = open(path, 'rb')
+        except OSError as error:
+            raise CommandError(error)
+        with stream:
+            yield stream
+
+    def load_checkpoint(self, checkpoint):
+        """Return the progress saved by an interrupted run."""
+        progress = {'records': 0, 'created': 0, 'skipped': 0, 'failed': 0}
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as stream:
+                progress.update(json.load(stream))
+        return progress
+
+    def save_checkpoint(self, checkpoint, progress):
+        """Save the progress atomically after a committed batch."""
+        if not checkpoint:
+            return
+        with open(f'{checkpoint}.tmp', 'w') as stream:
+            json.dump(progress, stream)
+        os.replace(f'{checkpoint}.tmp', checkpoint)
+
+    def write_tokens(self, tokens_out, tokens):
+        if not tokens_out or not tokens:
+            return
+        with open(tokens_out, 'a', newline='') as stream:
+            csv.writer(stream).writerows(tokens)
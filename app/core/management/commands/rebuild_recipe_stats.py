@@ -0,0 +1,135 @@
+"""
+Django command to rebuild or verify the recipe stats of users and tags.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from core.models import Recipe, RecipeStats, Tag, TagStats
+
+
+USER_FIELDS = ['recipe_count', 'price_total', 'time_minutes_total']
+NO_RECIPES = (0, Decimal('0'), 0)
+
+
+def differences(expected, stored, empty):
+    """Return `{key: (stored, expected)}` for the values which differ,
+    missing values counting as `empty`."""
+    return {
+        key: (stored.get(key, empty), expected.get(key, empty))
+        for key in expected.keys() | stored.keys()
+        if stored.get(key, empty) != expected.get(key, empty)
+    }
+
+
+class Command(BaseCommand):
+    """Django command to recompute the recipe stats from the recipes."""
+    help = (
+        'Recompute the recipe stats of users and tags from their recipes '
+        'and fix the rows which drifted, or only report them with --verify.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Email of the only user to check, defaults to all users.',
+        )
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Report stats which differ without fixing them, and fail '
+                 'when there are any.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        recipes = Recipe.objects.all()
+        tags = Tag.objects.all()
+        user_stats = RecipeStats.objects.all()
+        tag_stats = TagStats.objects.all()
+        if options['user']:
+            user = get_user_model().objects.filter(
+                email=options['user']
+            ).first()
+            if user is None:
+                raise CommandError(f'No user {options["user"]}.')
+            recipes = recipes.filter(user=user)
+            tags = tags.filter(user=user)
+            user_stats = user_stats.filter(user=user)
+            tag_stats = tag_stats.filter(user=user)
+
+        # Fix all the rows or none of them.
+        with transaction.atomic():
+            users = differences(
+                self.user_totals(recipes),
+                {
+                    user_id: tuple(totals) for user_id, *totals in
+                    user_stats.values_list('user_id', *USER_FIELDS)
+                },
+                NO_RECIPES,
+            )
+            tags = differences(
+                dict(tags.annotate(
+                    count=Count('recipe')
+                ).order_by().values_list('id', 'count')),
+                dict(tag_stats.values_list('tag_id', 'recipe_count')),
+                0,
+            )
+            for label, changed in (('user', users), ('tag', tags)):
+                for key, (stored, expected) in sorted(changed.items()):
+                    self.stdout.write(
+                        f'{label} {key}: stored {stored}, '
+                        f'expected {expected}',
+                        self.style.WARNING,
+                    )
+
+            if options['verify']:
+                if users or tags:
+                    raise CommandError(
+                        f'Recipe stats differ for {len(users)} users and '
+                        f'{len(tags)} tags.'
+                    )
+                self.stdout.write(self.style.SUCCESS('Recipe stats are OK.'))
+                return
+
+            self.fix_users(users)
+            self.fix_tags(tags)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt the stats of {len(users)} users and {len(tags)} tags.'
+        ))
+
+    def user_totals(self, recipes):
+        """Return the totals of the users with recipes, by user id."""
+        return {
+            user_id: (count, price_total, time_minutes_total)
+            for user_id, count, price_total, time_minutes_total in
+            recipes.values('user_id').annotate(
+                recipe_count=Count('id'),
+                price_total=Sum('price'),
+                time_minutes_total=Sum('time_minutes'),
+            ).order_by().values_list('user_id', *USER_FIELDS)
+        }
+
+    def fix_users(self, users):
+        """Store the expected totals of users."""
+        for user_id, (_stored, expected) in users.items():
+            RecipeStats.objects.update_or_create(
+                user_id=user_id,
+                defaults=dict(zip(USER_FIELDS, expected)),
+            )
+
+    def fix_tags(self, tags):
+        """Store the expected recipe counts of tags."""
+        TagStats.objects.filter(tag_id__in=tags).delete()
+        TagStats.objects.bulk_create([
+            TagStats(
+                tag_id=tag_id, user_id=user_id, recipe_count=tags[tag_id][1]
+            )
+            for tag_id, user_id in Tag.objects.filter(
+                id__in=tags
+            ).values_list('id', 'user_id')
+        ], batch_size=1000)
@@ -0,0 +1,175 @@
+"""
+In-process request metrics rendered in the Prometheus text format.
+
+Every server process keeps its own histograms, scrapes report the process
+that answered them.
+"""
+import bisect
+import contextvars
+import math
+import threading
+import time
+
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Cumulative histogram of observations per set of label values."""
+
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        """Record `value` for the given label values."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [
+                    [0] * (len(self.buckets) + 1), 0.0
+                ]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        """Yield the lines of the histogram in the text format."""
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            values = sorted(
+                (labels, list(counts), total)
+                for labels, (counts, total) in self._values.items()
+            )
+
+        for labels, counts, total in values:
+            pairs = [
+                f'{name}="{_escape(value)}"'
+                for name, value in zip(self.labels, labels)
+            ]
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = '+Inf' if bound == math.inf else repr(float(bound))
+                label_text = ','.join(pairs + [f'le="{le}"'])
+                yield f'{self.name}_bucket{{{label_text}}} {cumulative}'
+            label_text = ','.join(pairs)
+            yield f'{self.name}_sum{{{label_text}}} {total}'
+            yield f'{self.name}_count{{{label_text}}} {cumulative}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace(
+        '\n', '\\n'
+    )
+
+
+class Registry:
+    """Set of metrics rendered together."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def histogram(self, name, documentation, labels, buckets):
+        histogram = Histogram(name, documentation, labels, buckets)
+        self.metrics.append(histogram)
+        return histogram
+
+    def render(self):
+        """Return all metrics in the Prometheus text format."""
+        return ''.join(
+            f'{line}\n' for metric in self.metrics for line in metric.render()
+        )
+
+    def reset(self):
+        for metric in self.metrics:
+            metric.reset()
+
+
+registry = Registry()
+
+REQUEST_LABELS = ['view', 'action']
+
+REQUEST_DURATION = registry.histogram(
+    'api_request_duration_seconds',
+    'Time to answer a request.',
+    REQUEST_LABELS,
+    DURATION_BUCKETS,
+)
+REQUEST_QUERIES = registry.histogram(
+    'api_request_queries',
+    'SQL queries run to answer a request.',
+    REQUEST_LABELS,
+    QUERY_BUCKETS,
+)
+REQUEST_DB_DURATION = registry.histogram(
+    'api_request_db_seconds',
+    'Time spent in SQL queries to answer a request.',
+    REQUEST_LABELS,
+    DURATION_BUCKETS,
+)
+REQUEST_SERIALIZE_DURATION = registry.histogram(
+    'api_request_serialize_seconds',
+    'Time spent rendering the response body.',
+    REQUEST_LABELS,
+    DURATION_BUCKETS,
+)
+
+
+class RequestStats:
+    """Queries and timings collected while answering one request."""
+
+    def __init__(self, max_captured):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.max_captured = max_captured
+        self.captured = []
+
+    def record(self, labels, duration):
+        """Add the request to the histograms."""
+        REQUEST_DURATION.observe(duration, *labels)
+        REQUEST_QUERIES.observe(self.queries, *labels)
+        REQUEST_DB_DURATION.observe(self.db_seconds, *labels)
+        REQUEST_SERIALIZE_DURATION.observe(self.serialize_seconds, *labels)
+
+
+# Follows the request into threads of sync_to_async calls.
+current_stats = contextvars.ContextVar('current_stats', default=None)
+
+
+def query_wrapper(execute, sql, params, many, context):
+    """Database execute wrapper counting the queries of the request."""
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        stats.queries += 1
+        stats.db_seconds += duration
+        # Parameters are left out, they may hold credentials.
+        if len(stats.captured) < stats.max_captured:
+            stats.captured.append((duration, sql))
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    """Add `query_wrapper` to a new database connection."""
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_wrapper)
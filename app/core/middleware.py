@@ -0,0 +1,271 @@
+"""
+Middleware for the API.
+"""
+import asyncio
+import gzip
+import logging
+import time
+import zlib
+
+from django.conf import settings
+from django.contrib.auth import middleware as auth_middleware
+from django.contrib.messages import middleware as messages_middleware
+from django.contrib.sessions import middleware as sessions_middleware
+from django.middleware import csrf
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from core import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """Record query counts and timings per URL name and action.
+
+    Place it first so that the total latency covers other middleware.
+    Requests slower than METRICS['SLOW_REQUEST_SECONDS'] are logged with
+    their SQL.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Mark the instance as a coroutine function like
+            # MiddlewareMixin does, and keep the hooks off the sync thread.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not settings.METRICS['ENABLED']:
+            return self.get_response(request)
+
+        stats, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current_stats.reset(token)
+        self.finish(request, response, stats)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.METRICS['ENABLED']:
+            return await self.get_response(request)
+
+        stats, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current_stats.reset(token)
+        self.finish(request, response, stats)
+        return response
+
+    def process_template_response(self, request, response):
+        return self.time_rendering(request, response)
+
+    async def aprocess_template_response(self, request, response):
+        return self.time_rendering(request, response)
+
+    def time_rendering(self, request, response):
+        """Time the rendering of DRF responses."""
+        stats = getattr(request, '_metrics_stats', None)
+        if stats is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                stats.serialize_seconds += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def start(self, request):
+        stats = metrics.RequestStats(settings.METRICS['CAPTURED_QUERIES'])
+        request._metrics_stats = stats
+        return stats, metrics.current_stats.set(stats)
+
+    def finish(self, request, response, stats):
+        duration = time.perf_counter() - stats.start
+        labels = self.get_labels(request)
+        stats.record(labels, duration)
+        if duration >= settings.METRICS['SLOW_REQUEST_SECONDS']:
+            logger.warning(
+                'Slow request %s %s (%s %s) %s in %.3fs: %d queries in '
+                '%.3fs, %.3fs serializing.%s',
+                request.method,
+                request.get_full_path(),
+                *labels,
+                response.status_code,
+                duration,
+                stats.queries,
+                stats.db_seconds,
+                stats.serialize_seconds,
+                ''.join(
+                    f'\n  {query_duration:.3f}s {sql}'
+                    for query_duration, sql in stats.captured
+                ),
+            )
+
+    def get_labels(self, request):
+        """Return the URL name and the viewset action of the request."""
+        method = request.method.lower()
+        match = request.resolver_match
+        if match is None:
+            return ('<unresolved>', method)
+
+        actions = getattr(match.func, 'actions', None) or {}
+        return (match.view_name, actions.get(method, method))
+
+
+class SessionlessPathMixin:
+    """Skip a middleware for paths under settings.SESSIONLESS_PATH_PREFIXES.
+
+    The token authenticated API needs no session, messages or CSRF
+    cookie, and DRF sets `request.user` itself, so these middleware only
+    cost time there.
+    """
+
+    def __call__(self, request):
+        if request.path_info.startswith(settings.SESSIONLESS_PATH_PREFIXES):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class SessionMiddleware(SessionlessPathMixin,
+                        sessions_middleware.SessionMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(SessionlessPathMixin, csrf.CsrfViewMiddleware):
+
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        # Without a session there is no cookie based login to protect.
+        if request.path_info.startswith(settings.SESSIONLESS_PATH_PREFIXES):
+            return None
+        return super().process_view(
+            request, callback, callback_args, callback_kwargs
+        )
+
+
+class AuthenticationMiddleware(SessionlessPathMixin,
+                               auth_middleware.AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(SessionlessPathMixin,
+                        messages_middleware.MessageMiddleware):
+    pass
+
+
+def accepted_encodings(header):
+    """Return the q-value of each coding of an Accept-Encoding header."""
+    encodings = {}
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        encodings[coding.strip().lower()] = quality
+    return encodings
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compress responses with brotli when it is installed, else gzip.
+
+    Unlike GZipMiddleware it weighs the q-values the client sends, leaves
+    responses under COMPRESSION['MIN_SIZE'] bytes alone and uses the
+    configured levels. Streaming responses are compressed chunk by chunk.
+    Place it above middleware that read or change the response body.
+    """
+
+    def process_response(self, request, response):
+        options = settings.COMPRESSION
+        if not options['ENABLED'] or response.has_header('Content-Encoding'):
+            return response
+        if not response.streaming and (
+            len(response.content) < options['MIN_SIZE']
+        ):
+            return response
+
+        patch_vary_headers(response, ['Accept-Encoding'])
+        coding = self.choose_coding(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if coding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = self.compress_stream(
+                coding, response.streaming_content
+            )
+            del response['Content-Length']
+        else:
+            compressed = self.compress(coding, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # The compressed body differs byte for byte, see GZipMiddleware.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = f'W/{etag}'
+        response['Content-Encoding'] = coding
+        return response
+
+    def choose_coding(self, header):
+        """Return the preferred coding the client accepts, or None."""
+        encodings = accepted_encodings(header)
+        codings = ['br', 'gzip'] if brotli is not None else ['gzip']
+        qualities = {
+            coding: encodings.get(coding, encodings.get('*', 0.0))
+            for coding in codings
+        }
+        best = max(codings, key=qualities.get)
+        return best if qualities[best] > 0 else None
+
+    def compress(self, coding, content):
+        options = settings.COMPRESSION
+        if coding == 'br':
+            return brotli.compress(content, quality=options['BROTLI_QUALITY'])
+        return gzip.compress(
+            content, compresslevel=options['GZIP_LEVEL'], mtime=0
+        )
+
+    def compress_stream(self, coding, chunks):
+        """Yield the compressed chunks, flushed as they come."""
+        options = settings.COMPRESSION
+        if coding == 'br':
+            compressor = brotli.Compressor(quality=options['BROTLI_QUALITY'])
+            flush, finish = compressor.flush, compressor.finish
+            process = compressor.process
+        else:
+            # Window bits of 16 + 15 write the gzip container.
+            compressor = zlib.compressobj(
+                options['GZIP_LEVEL'], zlib.DEFLATED, 16 + zlib.MAX_WBITS
+            )
+            process, finish = compressor.compress, compressor.flush
+
+            def flush():
+                return compressor.flush(zlib.Z_SYNC_FLUSH)
+
+        for chunk in chunks:
+            data = process(chunk) + flush()
+            if data:
+                yield data
+        yield finish()
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.25 on 2026-10-17 04:10
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_tags(apps, schema_editor):
+    """Fold tags sharing a name for the same user into the oldest one."""
+    Tag = apps.get_model('core', 'Tag')
+    RecipeTag = apps.get_model('core', 'Recipe').tags.through
+
+    duplicates = Tag.objects.values('user', 'name').annotate(
+        count=Count('id'), keep=Min('id'),
+    ).filter(count__gt=1)
+    for duplicate in duplicates:
+        others = Tag.objects.filter(
+            user=duplicate['user'], name=duplicate['name'],
+        ).exclude(id=duplicate['keep'])
+        tagged = set(RecipeTag.objects.filter(
+            tag_id=duplicate['keep'],
+        ).values_list('recipe_id', flat=True))
+        retag = set(RecipeTag.objects.filter(
+            tag__in=others,
+        ).values_list('recipe_id', flat=True)) - tagged
+        RecipeTag.objects.bulk_create([
+            RecipeTag(recipe_id=recipe_id, tag_id=duplicate['keep'])
+            for recipe_id in retag
+        ])
+        others.delete()
+
+
+class Migration(migrations.Migration):
+    # Commit the merge before adding the constraint: PostgreSQL refuses to
+    # ALTER a table with the deferred triggers of the deletes pending.
+    atomic = False
+
+    dependencies = [
+        ('core', '0003_auto_20240112_1008'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_tags, migrations.RunPython.noop, atomic=True
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', '-id'], include=('title', 'time_minutes', 'price', 'link'), name='recipe_user_id_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_tag_name_per_user'),
+        ),
+    ]
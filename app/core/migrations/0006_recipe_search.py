@@ -0,0 +1,87 @@
+# Generated by Django 3.2.25 on 2026-10-17 04:13
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+SEARCH_INDEXES = [
+    django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+    django.contrib.postgres.indexes.GinIndex(fields=['title'], name='recipe_title_trgm_idx', opclasses=['gin_trgm_ops']),
+]
+
+SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('pg_catalog.english', coalesce({row}title, '')), 'A') ||
+    setweight(to_tsvector('pg_catalog.english', coalesce({row}description, '')), 'B')
+"""
+
+CREATE_TRIGGER_SQL = """
+CREATE FUNCTION core_recipe_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := {vector};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_recipe_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description, search_vector
+    ON core_recipe
+    FOR EACH ROW EXECUTE FUNCTION core_recipe_search_vector_update();
+
+UPDATE core_recipe SET search_vector = {backfill};
+""".format(
+    vector=SEARCH_VECTOR_SQL.format(row='NEW.'),
+    backfill=SEARCH_VECTOR_SQL.format(row=''),
+)
+
+DROP_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS core_recipe_search_vector_trigger ON core_recipe;
+DROP FUNCTION IF EXISTS core_recipe_search_vector_update();
+"""
+
+
+def add_search_support(apps, schema_editor):
+    """Create the search trigger and GIN indexes on PostgreSQL."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('core', 'Recipe')
+    schema_editor.execute(CREATE_TRIGGER_SQL)
+    for index in SEARCH_INDEXES:
+        schema_editor.add_index(Recipe, index)
+
+
+def remove_search_support(apps, schema_editor):
+    """Drop the search trigger and GIN indexes on PostgreSQL."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('core', 'Recipe')
+    for index in SEARCH_INDEXES:
+        schema_editor.remove_index(Recipe, index)
+    schema_editor.execute(DROP_TRIGGER_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_recipe_filter_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # The trigger and GIN indexes only exist on PostgreSQL.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(add_search_support, remove_search_support),
+            ],
+            state_operations=[
+                migrations.AddIndex(model_name='recipe', index=index)
+                for index in SEARCH_INDEXES
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def seed_collection_versions(apps, schema_editor):
+    """Give users with existing data a version to cache and tag against."""
+    CollectionVersion = apps.get_model('core', 'CollectionVersion')
+    Recipe = apps.get_model('core', 'Recipe')
+    Tag = apps.get_model('core', 'Tag')
+
+    user_ids = set(
+        Recipe.objects.values_list('user_id', flat=True).distinct()
+    ) | set(Tag.objects.values_list('user_id', flat=True).distinct())
+    CollectionVersion.objects.bulk_create([
+        CollectionVersion(user_id=user_id, collection=collection)
+        for user_id in user_ids
+        for collection in ('recipes', 'tags')
+    ], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_collection_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            seed_collection_versions, migrations.RunPython.noop
+        ),
+    ]
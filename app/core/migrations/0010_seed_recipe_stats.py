@@ -0,0 +1,41 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def seed_recipe_stats(apps, schema_editor):
+    """Count the existing recipes into the stats of users and tags."""
+    RecipeStats = apps.get_model('core', 'RecipeStats')
+    TagStats = apps.get_model('core', 'TagStats')
+    Recipe = apps.get_model('core', 'Recipe')
+    Tag = apps.get_model('core', 'Tag')
+
+    RecipeStats.objects.bulk_create([
+        RecipeStats(
+            user_id=totals['user_id'],
+            recipe_count=totals['recipe_count'],
+            price_total=totals['price_total'],
+            time_minutes_total=totals['time_minutes_total'],
+        )
+        for totals in Recipe.objects.values('user_id').annotate(
+            recipe_count=Count('id'),
+            price_total=Sum('price'),
+            time_minutes_total=Sum('time_minutes'),
+        ).order_by()
+    ], batch_size=1000, ignore_conflicts=True)
+    TagStats.objects.bulk_create([
+        TagStats(tag_id=tag_id, user_id=user_id, recipe_count=count)
+        for tag_id, user_id, count in Tag.objects.annotate(
+            count=Count('recipe')
+        ).values_list('id', 'user_id', 'count').order_by()
+    ], batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipe_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_recipe_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+def seed_change_log(apps, schema_editor):
+    """Log the existing recipes and tags as the first change of users."""
+    ChangeLog = apps.get_model('core', 'ChangeLog')
+    Change = apps.get_model('core', 'Change')
+    Recipe = apps.get_model('core', 'Recipe')
+    Tag = apps.get_model('core', 'Tag')
+
+    for collection, model in (('recipes', Recipe), ('tags', Tag)):
+        Change.objects.bulk_create([
+            Change(
+                user_id=user_id,
+                collection=collection,
+                object_id=object_id,
+                seq=1,
+            )
+            for object_id, user_id in model.objects.values_list(
+                'id', 'user_id'
+            ).order_by()
+        ], batch_size=1000, ignore_conflicts=True)
+    ChangeLog.objects.bulk_create([
+        ChangeLog(user_id=user_id, seq=1)
+        for user_id in Change.objects.values_list(
+            'user_id', flat=True
+        ).order_by().distinct()
+    ], batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_change_log'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_change_log, migrations.RunPython.noop),
+    ]
@@ -1,14 +1,22 @@
 """
 Database models.
 """
+from decimal import Decimal
+
 from django.conf import settings
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Max, Subquery, Sum
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin,
 )
 
+from core import hashing
+
 
 class UserManager(BaseUserManager):
     """Manager for users."""
@@ -43,9 +51,64 @@ class User(AbstractBaseUser, PermissionsMixin):
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
+
+    def set_password(self, raw_password):
+        """Hash the password on the hashing pool."""
+        self.password = hashing.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """Verify the password on the hashing pool, upgrading old hashes."""
+        def setter(raw_password):
+            self.set_password(raw_password)
+            self._password = None
+            self.save(update_fields=['password'])
+
+        return hashing.check_password(raw_password, self.password, setter)
 # noqa    
 
 
+class TagManager(models.Manager):
+    """Manager for tags."""
+
+    def get_or_create_many(self, user, names):
+        """Return the user's tags by name, creating missing ones in bulk."""
+        names = list(dict.fromkeys(names))
+        if not names:
+            return {}
+
+        tags = {
+            tag.name: tag for tag in
+            self.filter(user=user, name__in=names).only('id', 'name')
+        }
+        missing = [name for name in names if name not in tags]
+        if missing:
+            # Ignore names a concurrent request created in the meantime.
+            self.bulk_create(
+                [self.model(user=user, name=name) for name in missing],
+                ignore_conflicts=True,
+            )
+            created = {
+                tag.name: tag for tag in self.filter(
+                    user=user, name__in=missing
+                ).only('id', 'name')
+            }
+            tags.update(created)
+            # Bulk inserts send no signals, so bump and log the new tags
+            # here.
+            CollectionVersion.objects.bump(
+                user.pk, CollectionVersion.TAGS, CollectionVersion.RECIPES
+            )
+            ChangeLog.objects.record(
+                user.pk,
+                CollectionVersion.TAGS,
+                [tag.id for tag in created.values()],
+                created=True,
+            )
+
+        return {name: tags[name] for name in names}
+
+
 class Recipe(models.Model):
     """Recipe object."""
     user = models.ForeignKey(
@@ -57,7 +120,59 @@ class Recipe(models.Model):
     time_minutes = models.IntegerField()
     link = models.CharField(max_length=255, blank=True)
     tags = models.ManyToManyField('Tag')
-    
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by a database trigger from title and description.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Serves the per-user list ordered newest first, and with the
+            # included columns the list serializer never reads the heap.
+            models.Index(
+                fields=['user', '-id'],
+                include=['title', 'time_minutes', 'price', 'link'],
+                name='recipe_user_id_idx',
+            ),
+            models.Index(
+                fields=['user', 'price'],
+                name='recipe_user_price_idx',
+            ),
+            models.Index(
+                fields=['user', 'time_minutes'],
+                name='recipe_user_time_idx',
+            ),
+            # Pattern ops let PostgreSQL use the index for LIKE 'prefix%'
+            # under any collation.
+            models.Index(
+                fields=['user', 'title'],
+                opclasses=['int8_ops', 'varchar_pattern_ops'],
+                name='recipe_user_title_idx',
+            ),
+            GinIndex(
+                fields=['search_vector'],
+                name='recipe_search_vector_idx',
+            ),
+            GinIndex(
+                fields=['title'],
+                opclasses=['gin_trgm_ops'],
+                name='recipe_title_trgm_idx',
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        recipe = super().from_db(db, field_names, values)
+        # Saved values as counted in RecipeStats, to count changes.
+        recipe._counted = recipe.stats_values()
+        return recipe
+
+    def stats_values(self):
+        """Return `(user_id, price, time_minutes)` counted in RecipeStats,
+        None when some of them were not loaded."""
+        if self.get_deferred_fields() & {'user_id', 'price', 'time_minutes'}:
+            return None
+        return self.user_id, Decimal(self.price), self.time_minutes
+
     def __str__(self):
         return self.title
     
@@ -66,6 +181,394 @@ class Tag(models.Model):
     """Tag for filtering recipe."""
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TagManager()
+
+    class Meta:
+        constraints = [
+            # Also the (user, name) index the tag list is ordered by.
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_tag_name_per_user',
+            ),
+        ]
     
     def __str__(self):
         return self.name
+
+
+class CollectionVersionManager(models.Manager):
+    """Manager for collection versions."""
+
+    def bump(self, user_id, *collections, create=True):
+        """Increment the versions of the user's collections.
+
+        Pass `create=False` from deletions: the user may be in the middle
+        of being deleted, and a collection without a version row never
+        handed out a version anyway.
+        """
+        updated = self.filter(
+            user_id=user_id, collection__in=collections
+        ).update(version=F('version') + 1, updated_at=timezone.now())
+        if updated == len(collections) or not create:
+            return
+
+        existing = set(self.filter(
+            user_id=user_id, collection__in=collections
+        ).values_list('collection', flat=True))
+        for collection in collections:
+            if collection in existing:
+                continue
+            try:
+                with transaction.atomic():
+                    self.create(user_id=user_id, collection=collection)
+            except IntegrityError:
+                # Created by a concurrent bump, which counts as a change.
+                pass
+
+    def get_version(self, user_id, collection):
+        """Return `(version, updated_at)` of a collection of the user, or
+        None when it was not changed since versions were introduced."""
+        return self.filter(
+            user_id=user_id, collection=collection
+        ).values_list('version', 'updated_at').first()
+
+
+class CollectionVersion(models.Model):
+    """Version of a user's collection, increased on every change to it."""
+    RECIPES = 'recipes'
+    TAGS = 'tags'
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE)
+    collection = models.CharField(max_length=32)
+    version = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    objects = CollectionVersionManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'collection'],
+                name='unique_collection_per_user',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.collection} v{self.version}'
+
+
+class RecipeStatsManager(models.Manager):
+    """Manager for per-user recipe stats."""
+
+    def add(self, user_id, count, price, time_minutes, create=True):
+        """Add to the recipe totals of a user.
+
+        Without a stats row the totals are computed from the recipes,
+        which already include the change. Pass `create=False` from
+        deletions, see CollectionVersionManager.bump.
+        """
+        updated = self.filter(user_id=user_id).update(
+            recipe_count=F('recipe_count') + count,
+            price_total=F('price_total') + price,
+            time_minutes_total=F('time_minutes_total') + time_minutes,
+            updated_at=timezone.now(),
+        )
+        if not updated and create:
+            self.rebuild(user_id)
+
+    def compute(self, user_id):
+        """Return the totals of the user's recipes from the recipes."""
+        totals = Recipe.objects.filter(user_id=user_id).aggregate(
+            recipe_count=Count('id'),
+            price_total=Sum('price'),
+            time_minutes_total=Sum('time_minutes'),
+        )
+        return {
+            'recipe_count': totals['recipe_count'],
+            'price_total': totals['price_total'] or Decimal('0'),
+            'time_minutes_total': totals['time_minutes_total'] or 0,
+        }
+
+    def rebuild(self, user_id):
+        """Compute and store the recipe totals of a user."""
+        try:
+            with transaction.atomic():
+                self.update_or_create(
+                    user_id=user_id,
+                    defaults=dict(
+                        self.compute(user_id), updated_at=timezone.now()
+                    ),
+                )
+        except IntegrityError:
+            # Created by a concurrent change, which computed it as well.
+            pass
+
+
+class RecipeStats(models.Model):
+    """Totals over the recipes of a user, kept up to date on changes."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='recipe_stats',
+    )
+    recipe_count = models.IntegerField(default=0)
+    price_total = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0
+    )
+    time_minutes_total = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    objects = RecipeStatsManager()
+
+    def __str__(self):
+        return f'{self.recipe_count} recipes'
+
+    @property
+    def average_price(self):
+        if not self.recipe_count:
+            return None
+        return self.price_total / self.recipe_count
+
+    @property
+    def average_time_minutes(self):
+        if not self.recipe_count:
+            return None
+        return round(self.time_minutes_total / self.recipe_count, 2)
+
+
+class TagStatsManager(models.Manager):
+    """Manager for per-tag recipe counts."""
+
+    def add(self, user_id, counts, create=True):
+        """Add `counts`, a mapping of tag ids to deltas, to the tags.
+
+        Tags without a stats row are counted from their recipes, which
+        already include the change.
+        """
+        counts = {tag_id: delta for tag_id, delta in counts.items() if delta}
+        if not counts:
+            return
+
+        by_delta = {}
+        for tag_id, delta in counts.items():
+            by_delta.setdefault(delta, []).append(tag_id)
+        updated = 0
+        for delta, tag_ids in by_delta.items():
+            updated += self.filter(tag_id__in=tag_ids).update(
+                recipe_count=F('recipe_count') + delta
+            )
+        if updated == len(counts) or not create:
+            return
+
+        missing = set(counts) - set(self.filter(
+            tag_id__in=counts
+        ).values_list('tag_id', flat=True))
+        self._create(user_id, missing)
+
+    def compute(self, tag_ids):
+        """Return the recipe count of each tag, counted from the links."""
+        counts = dict.fromkeys(tag_ids, 0)
+        counts.update(Recipe.tags.through.objects.filter(
+            tag_id__in=tag_ids
+        ).values('tag_id').annotate(
+            count=Count('id')
+        ).values_list('tag_id', 'count'))
+        return counts
+
+    def rebuild(self, user_id):
+        """Compute and store the counts of all tags of a user."""
+        tag_ids = list(
+            Tag.objects.filter(user_id=user_id).values_list('id', flat=True)
+        )
+        self.filter(user_id=user_id).delete()
+        self._create(user_id, tag_ids)
+
+    def _create(self, user_id, tag_ids):
+        if not tag_ids:
+            return
+        # Ignore rows a concurrent change created in the meantime.
+        self.bulk_create([
+            self.model(tag_id=tag_id, user_id=user_id, recipe_count=count)
+            for tag_id, count in self.compute(tag_ids).items()
+        ], ignore_conflicts=True)
+
+
+class TagStats(models.Model):
+    """Number of recipes of a tag, kept up to date on changes."""
+    tag = models.OneToOneField(
+        Tag,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    # Copied from the tag to read the counts of a user from this table.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    recipe_count = models.IntegerField(default=0)
+
+    objects = TagStatsManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-recipe_count'],
+                name='tagstats_user_count_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.tag_id}: {self.recipe_count} recipes'
+
+
+class ChangeLogManager(models.Manager):
+    """Manager for the per-user change logs read by sync clients."""
+
+    def record(self, user_id, collection, object_ids, created=False,
+               deleted=False, create=True):
+        """Log changes to objects of a collection of the user under the
+        next sequence number of the user.
+
+        Every object keeps a single entry, moved to the new number on each
+        change, so the log grows with the number of objects rather than of
+        changes. Pass `created` for new objects, which have no entry yet.
+        Deletions turn the entries into tombstones. Pass `create=False`
+        from deletions, see CollectionVersionManager.bump.
+        """
+        object_ids = list(dict.fromkeys(object_ids))
+        if not object_ids:
+            return
+
+        with transaction.atomic(savepoint=False):
+            if not self._advance(user_id, create):
+                return
+            seq = self.filter(user_id=user_id).values('seq')
+            updated = 0
+            if not created:
+                updated = Change.objects.filter(
+                    user_id=user_id,
+                    collection=collection,
+                    object_id__in=object_ids,
+                ).update(
+                    seq=Subquery(seq),
+                    deleted=deleted,
+                    changed_at=timezone.now(),
+                )
+            if updated < len(object_ids) and create:
+                seq = seq.get()['seq']
+                Change.objects.bulk_create([
+                    Change(
+                        user_id=user_id,
+                        collection=collection,
+                        object_id=object_id,
+                        seq=seq,
+                        deleted=deleted,
+                    )
+                    for object_id in object_ids
+                ], batch_size=1000, ignore_conflicts=True)
+
+    def _advance(self, user_id, create):
+        """Increment the sequence number of the user, return False without
+        a log when `create` is false.
+
+        The log row stays locked until the transaction ends, so the
+        changes of a user commit in the order of their numbers.
+        """
+        if self.filter(user_id=user_id).update(seq=F('seq') + 1):
+            return True
+        if not create:
+            return False
+
+        try:
+            with transaction.atomic():
+                self.create(user_id=user_id, seq=1)
+        except IntegrityError:
+            # Created by a concurrent change, which has committed.
+            self.filter(user_id=user_id).update(seq=F('seq') + 1)
+        return True
+
+    def compact(self, before):
+        """Drop the tombstones of deletions made before `before`, return
+        the number dropped.
+
+        The tombstones of the last old deletion of each user are kept and
+        its number becomes the horizon of the user: clients which synced
+        before it may have missed a deletion and must sync from scratch.
+        """
+        horizons = Change.objects.filter(
+            deleted=True, changed_at__lt=before
+        ).values('user_id').annotate(horizon=Max('seq')).order_by()
+
+        dropped = 0
+        for user_id, horizon in horizons.values_list('user_id', 'horizon'):
+            with transaction.atomic():
+                self.filter(user_id=user_id, horizon__lt=horizon).update(
+                    horizon=horizon
+                )
+                dropped += Change.objects.filter(
+                    user_id=user_id, deleted=True, seq__lt=horizon
+                ).delete()[0]
+        return dropped
+
+
+class ChangeLog(models.Model):
+    """Sequence of the changes to the recipes and tags of a user."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='change_log',
+    )
+    # Number of the last change.
+    seq = models.PositiveBigIntegerField(default=0)
+    # Tombstones numbered below it were dropped by compaction.
+    horizon = models.PositiveBigIntegerField(default=0)
+
+    objects = ChangeLogManager()
+
+    def __str__(self):
+        return f'{self.seq} changes'
+
+
+class Change(models.Model):
+    """Last change to a recipe or tag, a tombstone once deleted."""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    collection = models.CharField(max_length=32)
+    object_id = models.BigIntegerField()
+    seq = models.PositiveBigIntegerField()
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'collection', 'object_id'],
+                name='unique_change_per_object',
+            ),
+        ]
+        indexes = [
+            # Serves reading the changes of a user since a position.
+            models.Index(
+                fields=['user', 'seq', 'id'],
+                name='change_user_seq_idx',
+            ),
+            models.Index(
+                fields=['changed_at'],
+                condition=models.Q(deleted=True),
+                name='change_tombstone_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.collection} {self.object_id} at {self.seq}'
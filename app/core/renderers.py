@@ -0,0 +1,41 @@
+"""
+JSON renderer using orjson when it is installed.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer writing compact JSON with orjson.
+
+    The output is the same bytes as JSONRenderer for data made of strings,
+    integers, booleans, None, lists and dicts. Floats may be written
+    differently, so only use it for views that render no floats. Falls
+    back to JSONRenderer without orjson, for indented output and for data
+    orjson refuses.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(
+            accepted_media_type, renderer_context or {}
+        ) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                # Dates go through the encoder of JSONRenderer.
+                option=orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Escaped like JSONRenderer does, see there.
+        return ret.replace(
+            '\u2028'.encode(), b'\\u2028'
+        ).replace('\u2029'.encode(), b'\\u2029')
@@ -0,0 +1,149 @@
+"""
+OpenAPI schema rendered once per deploy and served from memory.
+"""
+import gzip
+import hashlib
+import os
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.middleware.gzip import re_accepts_gzip
+from django.utils import translation
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+
+
+RENDERERS = {
+    'yaml': OpenApiYamlRenderer,
+    'json': OpenApiJsonRenderer,
+}
+
+SchemaDocument = namedtuple('SchemaDocument', ['content', 'gzipped', 'etag'])
+
+_documents = {}
+_lock = threading.Lock()
+
+
+def render_schema(file_format, lang=None):
+    """Generate the public schema and render it as YAML or JSON."""
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    with translation.override(lang or settings.LANGUAGE_CODE):
+        schema = generator.get_schema(request=None, public=True)
+    return RENDERERS[file_format]().render(schema, renderer_context={})
+
+
+def make_document(content, gzipped=None):
+    """Return the document for rendered schema `content`."""
+    if gzipped is None:
+        # No timestamp, so every build compresses to the same bytes.
+        gzipped = gzip.compress(content, mtime=0)
+    digest = hashlib.sha256(content).hexdigest()
+    # Weak as both encodings share it, like GZipMiddleware does.
+    return SchemaDocument(content, gzipped, f'W/"{digest}"')
+
+
+def schema_path(directory, file_format, lang=None):
+    """Return the path of a pre-generated schema file."""
+    name = f'schema.{lang}.{file_format}' if lang else f'schema.{file_format}'
+    return os.path.join(directory, name)
+
+
+def write_schema(directory, file_format, lang=None):
+    """Render the schema to a file and a gzipped copy, return the path."""
+    document = make_document(render_schema(file_format, lang))
+    path = schema_path(directory, file_format, lang)
+    for name, data in [(path, document.content),
+                       (f'{path}.gz', document.gzipped)]:
+        with open(name, 'wb') as output:
+            output.write(data)
+    return path
+
+
+def _load(file_format, lang):
+    """Return the document pre-generated in API_SCHEMA['DIRECTORY']."""
+    directory = settings.API_SCHEMA['DIRECTORY']
+    if not directory:
+        return None
+
+    path = schema_path(directory, file_format, lang)
+    try:
+        with open(path, 'rb') as schema_file:
+            content = schema_file.read()
+    except FileNotFoundError:
+        return None
+    try:
+        with open(f'{path}.gz', 'rb') as gzipped_file:
+            gzipped = gzipped_file.read()
+    except FileNotFoundError:
+        gzipped = None
+    return make_document(content, gzipped)
+
+
+def get_document(file_format, lang=None):
+    """Return the schema document, generated on first use unless it was
+    pre-generated, and kept for the life of the process."""
+    key = (file_format, lang)
+    document = _documents.get(key)
+    if document is None:
+        with _lock:
+            document = _documents.get(key)
+            if document is None:
+                document = _load(file_format, lang) or make_document(
+                    render_schema(file_format, lang)
+                )
+                _documents[key] = document
+    return document
+
+
+def clear():
+    """Forget the documents, so the next request generates them again."""
+    _documents.clear()
+
+
+class CachedSchemaView(SpectacularAPIView):
+    """SpectacularAPIView serving the schema rendered once per process.
+
+    Responses are gzipped when the client accepts it and carry an ETag
+    for conditional requests. Run `manage.py generate_schema` at build
+    time to skip generating on the first request.
+    """
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        lang = request.GET.get('lang')
+        # Only known languages, to keep the number of documents bounded.
+        if not settings.USE_I18N or lang not in dict(settings.LANGUAGES):
+            lang = None
+        document = get_document(renderer.format, lang)
+
+        response = get_conditional_response(request, etag=document.etag)
+        if response is None:
+            use_gzip = re_accepts_gzip.search(
+                request.META.get('HTTP_ACCEPT_ENCODING', '')
+            )
+            response = HttpResponse(
+                document.gzipped if use_gzip else document.content,
+                content_type=(
+                    f'{renderer.media_type}; charset={renderer.charset}'
+                    if renderer.charset else renderer.media_type
+                ),
+            )
+            if use_gzip:
+                response['Content-Encoding'] = 'gzip'
+        response['ETag'] = document.etag
+        patch_vary_headers(response, ['Accept', 'Accept-Encoding'])
+        patch_cache_control(
+            response, public=True, max_age=settings.API_SCHEMA['MAX_AGE']
+        )
+        return response
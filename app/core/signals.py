@@ -0,0 +1,211 @@
+"""
+Signal handlers keeping collection metadata, stats and change logs in step
+with the data.
+"""
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import (
+    ChangeLog,
+    CollectionVersion,
+    Recipe,
+    RecipeStats,
+    Tag,
+    TagStats,
+)
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def recipe_changed(sender, instance, signal, **kwargs):
+    """Bump the recipe collection of the owner."""
+    CollectionVersion.objects.bump(
+        instance.user_id,
+        CollectionVersion.RECIPES,
+        create=signal is post_save,
+    )
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def tag_changed(sender, instance, signal, **kwargs):
+    """Bump the tag collection, and the recipes which nest tags."""
+    CollectionVersion.objects.bump(
+        instance.user_id,
+        CollectionVersion.TAGS,
+        CollectionVersion.RECIPES,
+        create=signal is post_save,
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Touch and log the recipes whose tag set changed."""
+    if reverse:
+        if action == 'pre_clear':
+            recipe_ids = list(Recipe.objects.filter(
+                tags=instance
+            ).values_list('pk', flat=True))
+        elif action in ('post_add', 'post_remove'):
+            recipe_ids = pk_set
+        else:
+            return
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        recipe_ids = [instance.pk]
+    else:
+        return
+
+    Recipe.objects.filter(pk__in=recipe_ids).update(updated_at=timezone.now())
+    CollectionVersion.objects.bump(
+        instance.user_id, CollectionVersion.RECIPES
+    )
+    ChangeLog.objects.record(
+        instance.user_id, CollectionVersion.RECIPES, recipe_ids
+    )
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def recipe_logged(sender, instance, signal, created=False, **kwargs):
+    """Log a saved recipe, or its deletion, for sync clients."""
+    deleted = signal is post_delete
+    ChangeLog.objects.record(
+        instance.user_id,
+        CollectionVersion.RECIPES,
+        [instance.pk],
+        created=created,
+        deleted=deleted,
+        create=not deleted,
+    )
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleting(sender, instance, **kwargs):
+    """Remember the recipes of a tag, whose links go without signals."""
+    instance._deleted_recipe_ids = list(Recipe.tags.through.objects.filter(
+        tag_id=instance.pk
+    ).values_list('recipe_id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def tag_logged(sender, instance, signal, created=False, **kwargs):
+    """Log a saved or deleted tag, and the recipes nesting a renamed or
+    deleted tag."""
+    deleted = signal is post_delete
+    ChangeLog.objects.record(
+        instance.user_id,
+        CollectionVersion.TAGS,
+        [instance.pk],
+        created=created,
+        deleted=deleted,
+        create=not deleted,
+    )
+    if created:
+        return
+
+    if deleted:
+        recipe_ids = getattr(instance, '_deleted_recipe_ids', [])
+    else:
+        recipe_ids = Recipe.tags.through.objects.filter(
+            tag_id=instance.pk
+        ).values_list('recipe_id', flat=True)
+    ChangeLog.objects.record(
+        instance.user_id,
+        CollectionVersion.RECIPES,
+        recipe_ids,
+        create=not deleted,
+    )
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_saving(sender, instance, raw, **kwargs):
+    """Remember the saved values of a recipe not loaded with them."""
+    if raw or instance._state.adding or getattr(
+        instance, '_counted', None
+    ) is not None:
+        return
+    instance._counted = Recipe.objects.filter(pk=instance.pk).values_list(
+        'user_id', 'price', 'time_minutes'
+    ).first()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, raw, **kwargs):
+    """Count a new or changed recipe in the stats of its owner."""
+    if raw:
+        return
+    old = None if created else getattr(instance, '_counted', None)
+    new = instance.stats_values()
+    instance._counted = new
+    if old == new:
+        return
+
+    if old is not None and old[0] != new[0]:
+        RecipeStats.objects.add(old[0], -1, -old[1], -old[2])
+        old = None
+    if old is None:
+        RecipeStats.objects.add(new[0], 1, new[1], new[2])
+    else:
+        RecipeStats.objects.add(new[0], 0, new[1] - old[1], new[2] - old[2])
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    """Remember the tags of a recipe, whose links go without signals."""
+    instance._deleted_tag_ids = list(Recipe.tags.through.objects.filter(
+        recipe_id=instance.pk
+    ).values_list('tag_id', flat=True))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    """Uncount a deleted recipe from the stats of its owner."""
+    user_id, price, time_minutes = (
+        getattr(instance, '_counted', None) or instance.stats_values()
+    )
+    RecipeStats.objects.add(
+        user_id, -1, -price, -time_minutes, create=False
+    )
+    TagStats.objects.add(
+        user_id,
+        dict.fromkeys(getattr(instance, '_deleted_tag_ids', []), -1),
+        create=False,
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_counted(sender, instance, action, reverse, pk_set, **kwargs):
+    """Count the recipes of tags added to or removed from recipes.
+
+    Removals only count the links that existed, so they are looked up
+    before the links are deleted.
+    """
+    RecipeTag = Recipe.tags.through
+    column, other = ('tag_id', 'recipe_id') if reverse else (
+        'recipe_id', 'tag_id'
+    )
+    if action in ('pre_remove', 'pre_clear'):
+        links = RecipeTag.objects.filter(**{column: instance.pk})
+        if action == 'pre_remove':
+            links = links.filter(**{f'{other}__in': pk_set})
+        instance._removed_links = list(links.values_list(other, flat=True))
+        return
+
+    if action == 'post_add':
+        linked, delta = pk_set, 1
+    elif action in ('post_remove', 'post_clear'):
+        linked, delta = instance.__dict__.pop('_removed_links', []), -1
+    else:
+        return
+    if not linked:
+        return
+
+    if reverse:
+        counts = {instance.pk: delta * len(linked)}
+    else:
+        counts = dict.fromkeys(linked, delta)
+    TagStats.objects.add(instance.user_id, counts)
@@ -0,0 +1,188 @@
+"""
+Tests for the async API views.
+"""
+import json
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import include, path
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from core.asynchronous import AsyncRouter, async_api_view
+from core.metrics import registry
+from core.models import Recipe, Tag
+from recipe.views import RecipeViewSet, TagViewSet
+from user.authentication import token_cache
+from user.views import ManageUserView
+
+
+router = AsyncRouter()
+router.register('recipes', RecipeViewSet)
+router.register('tags', TagViewSet)
+
+urlpatterns = [
+    path('api/recipe/', include((router.urls, 'recipe'))),
+    path(
+        'api/user/me/',
+        async_api_view(ManageUserView.as_view()),
+        name='user-me',
+    ),
+]
+
+RECIPES_URL = '/api/recipe/recipes/'
+TAGS_URL = '/api/recipe/tags/'
+ME_URL = '/api/user/me/'
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return f'{RECIPES_URL}{recipe_id}/'
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe title',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+@override_settings(
+    ROOT_URLCONF=__name__,
+    ASYNC_DB_THREAD_SENSITIVE=True,
+)
+class AsyncApiTests(TestCase):
+    """Test the API served by async views."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+            name='Test Name',
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    def request(self, method, url, data=None, token=True, **headers):
+        """Make a request with the async client, return the response."""
+        if token:
+            headers['authorization'] = f'Token {self.token.key}'
+        return async_to_sync(getattr(self.async_client, method))(
+            url, data, **headers
+        )
+
+    def test_auth_required(self):
+        """Test unauthenticated requests are rejected."""
+        res = self.request('get', RECIPES_URL, token=False)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_token_rejected(self):
+        """Test an unknown token is rejected."""
+        res = self.request(
+            'get', RECIPES_URL, token=False, authorization='Token invalid'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_list_recipes(self):
+        """Test listing and filtering recipes of the user only."""
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        create_recipe(other)
+        create_recipe(self.user)
+        recipe = create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+
+        res = self.request('get', f'{RECIPES_URL}?tags={tag.id}')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results = res.json()['results']
+        self.assertEqual([item['id'] for item in results], [recipe.id])
+        self.assertEqual(results[0]['tags'][0]['name'], 'Vegan')
+
+    def test_retrieve_recipe(self):
+        """Test getting a recipe detail and a 404 for other users."""
+        recipe = create_recipe(self.user, description='Details')
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+
+        res = self.request('get', detail_url(recipe.id))
+        missing = self.request('get', detail_url(create_recipe(other).id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['description'], 'Details')
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_conditional_list(self):
+        """Test the async list answers conditional requests."""
+        create_recipe(self.user)
+        res = self.request('get', RECIPES_URL)
+
+        res = self.request(
+            'get', RECIPES_URL, **{'if-none-match': res['ETag']}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_tags(self):
+        """Test listing tags."""
+        Tag.objects.create(user=self.user, name='Dessert')
+
+        res = self.request('get', TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['results'][0]['name'], 'Dessert')
+
+    def test_writes_use_sync_views(self):
+        """Test unsafe methods are served by the sync views."""
+        payload = {'title': 'Sample', 'time_minutes': 5, 'price': '1.00'}
+
+        res = self.request(
+            'post',
+            RECIPES_URL,
+            json.dumps(payload),
+            content_type='application/json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Recipe.objects.filter(user=self.user).exists())
+
+    def test_me_served_from_token_cache(self):
+        """Test `me` runs no queries once the token is cached."""
+        self.request('get', ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.request('get', ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['email'], self.user.email)
+
+    def test_queries_measured(self):
+        """Test queries run in the database threads reach the metrics."""
+        registry.reset()
+
+        self.request('get', RECIPES_URL)
+
+        prefix = (
+            'api_request_queries_sum'
+            '{view="recipe:recipe-list",action="list"} '
+        )
+        [line] = [
+            line for line in registry.render().splitlines()
+            if line.startswith(prefix)
+        ]
+        self.assertGreater(float(line[len(prefix):]), 0)
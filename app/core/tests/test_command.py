@@ -1,13 +1,25 @@
 """
 Test custom Django management commands.
 """
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2OpError
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
+
+from rest_framework.authtoken.models import Token
+
+from core.models import RecipeStats, TagStats
+from core.tests.utils import seed_recipes
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -32,3 +44,189 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+class ExplainQueriesCommandTests(TestCase):
+    """Test the explain_queries command."""
+
+    def test_explain_prints_viewset_plans(self):
+        """Test a plan is printed for each viewset query."""
+        get_user_model().objects.create_user('test@example.com', 'pass123')
+        out = StringIO()
+
+        call_command('explain_queries', stdout=out)
+
+        output = out.getvalue()
+        for label in ['RecipeViewSet list', 'RecipeViewSet detail',
+                      'TagViewSet list', 'TagViewSet detail']:
+            self.assertIn(label, output)
+
+    def test_explain_without_users_fails(self):
+        """Test the command errors when there is no user."""
+        with self.assertRaises(CommandError):
+            call_command('explain_queries', stdout=StringIO())
+
+
+class ProvisionUsersCommandTests(TestCase):
+    """Test the provision_users command."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write_file(self, name, content):
+        """Write a file in the temporary directory, return its path."""
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as stream:
+            stream.write(content)
+        return path
+
+    def provision(self, *args, **options):
+        """Run the command, return its stdout and stderr."""
+        out, err = StringIO(), StringIO()
+        call_command(
+            'provision_users', *args, stdout=out, stderr=err, **options
+        )
+        return out.getvalue(), err.getvalue()
+
+    def test_provision_csv(self):
+        """Test users are created with hashed passwords and tokens."""
+        path = self.write_file('users.csv', (
+            'email,name,password\n'
+            'one@example.com,One,testpass123\n'
+            'not-an-email,Bad,testpass123\n'
+            'two@example.com,Two,\n'
+            'one@example.com,Again,testpass123\n'
+        ))
+        tokens_out = os.path.join(self.directory.name, 'tokens.csv')
+
+        out, err = self.provision(path, batch_size=2, tokens_out=tokens_out)
+
+        users = get_user_model().objects.order_by('email')
+        self.assertEqual(
+            [user.email for user in users],
+            ['one@example.com', 'two@example.com'],
+        )
+        self.assertTrue(users[0].check_password('testpass123'))
+        self.assertFalse(users[1].has_usable_password())
+        self.assertEqual(Token.objects.count(), 2)
+        self.assertIn('Line 3', err)
+        self.assertIn('Created 2 users, skipped 1 existing', out)
+        with open(tokens_out) as stream:
+            self.assertEqual(len(stream.read().splitlines()), 2)
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+    def test_provision_ndjson_skips_existing(self):
+        """Test records of existing users are skipped."""
+        get_user_model().objects.create_user('one@example.com', 'pass123')
+        path = self.write_file('users.ndjson', '\n'.join(
+            json.dumps({'email': f'{name}@example.com', 'name': name})
+            for name in ['one', 'two']
+        ))
+
+        self.provision(path, workers=0)
+
+        self.assertEqual(get_user_model().objects.count(), 2)
+        self.assertEqual(Token.objects.count(), 1)
+
+    def test_invalid_utf8_rejected(self):
+        """Test lines that are not UTF-8 are rejected one by one."""
+        uploads = [
+            ('users.ndjson', 1, b'\xff\xfe\n' + json.dumps(
+                {'email': 'one@example.com', 'name': 'One'}
+            ).encode() + b'\n'),
+            ('users.csv', 2,
+             b'email,name\n\xff\xfe,Bad\none@example.com,One\n'),
+        ]
+        for name, line, content in uploads:
+            with self.subTest(name=name):
+                get_user_model().objects.all().delete()
+                path = os.path.join(self.directory.name, name)
+                with open(path, 'wb') as stream:
+                    stream.write(content)
+
+                out, err = self.provision(path)
+
+                self.assertEqual(
+                    err,
+                    f'Line {line}: '
+                    '{"non_field_errors": ["Malformed record."]}\n',
+                )
+                self.assertIn('Created 1 users', out)
+                self.assertIn('rejected 1 invalid', out)
+
+    def test_resume_from_checkpoint(self):
+        """Test records before the checkpoint are not provisioned again."""
+        path = self.write_file('users.ndjson', '\n'.join(
+            json.dumps({'email': f'{name}@example.com', 'name': name})
+            for name in ['one', 'two', 'three']
+        ))
+        self.write_file('users.ndjson.checkpoint', json.dumps({
+            'records': 2, 'created': 2, 'skipped': 0, 'failed': 0,
+        }))
+
+        out, _err = self.provision(path)
+
+        emails = get_user_model().objects.values_list('email', flat=True)
+        self.assertEqual(list(emails), ['three@example.com'])
+        self.assertIn('Resuming after 2 records', out)
+        self.assertIn('Created 3 users', out)
+
+
+class RebuildRecipeStatsCommandTests(TestCase):
+    """Test rebuilding and verifying the recipe stats."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        self.recipes = seed_recipes(self.user, 3, tags_per_recipe=2)
+        RecipeStats.objects.filter(user=self.user).update(recipe_count=7)
+        TagStats.objects.filter(user=self.user).delete()
+
+    def test_verify_reports_drift(self):
+        """Test --verify fails on stats which differ from the recipes."""
+        out = StringIO()
+
+        with self.assertRaisesMessage(CommandError, '1 users and 2 tags'):
+            call_command('rebuild_recipe_stats', verify=True, stdout=out)
+
+        self.assertIn(f'user {self.user.pk}: stored (7,', out.getvalue())
+        self.assertEqual(
+            RecipeStats.objects.get(user=self.user).recipe_count, 7
+        )
+
+    def test_rebuild_fixes_drift(self):
+        """Test the stats are rebuilt from the recipes."""
+        out = StringIO()
+
+        call_command('rebuild_recipe_stats', stdout=out)
+        call_command('rebuild_recipe_stats', verify=True, stdout=out)
+
+        self.assertIn(
+            'Rebuilt the stats of 1 users and 2 tags', out.getvalue()
+        )
+        stats = RecipeStats.objects.get(user=self.user)
+        self.assertEqual(stats.recipe_count, 3)
+        self.assertEqual(stats.price_total, Decimal('7.50'))
+        self.assertEqual(
+            list(TagStats.objects.values_list('recipe_count', flat=True)),
+            [3, 3],
+        )
+
+    def test_rebuild_one_user(self):
+        """Test --user only touches the stats of that user."""
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'testpass123'
+        )
+        seed_recipes(other, 1)
+        RecipeStats.objects.filter(user=other).update(recipe_count=5)
+
+        call_command(
+            'rebuild_recipe_stats', user='user@example.com', stdout=StringIO()
+        )
+
+        self.assertEqual(RecipeStats.objects.get(user=other).recipe_count, 5)
+        self.assertEqual(
+            RecipeStats.objects.get(user=self.user).recipe_count, 3
+        )
@@ -0,0 +1,172 @@
+"""
+Tests for the connection pool and PostgreSQL backend.
+"""
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+from psycopg2 import extensions
+
+from core.db.pool import ConnectionPool, PoolTimeout
+from core.db.postgresql.base import DatabaseWrapper
+
+
+class FakeConnection:
+    """Stand-in for a psycopg2 connection."""
+    isolation_level = None
+
+    def __init__(self):
+        self.closed = 0
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+    def rollback(self):
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def get_transaction_status(self):
+        return self.status
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test lending connections from the pool."""
+
+    def test_released_connection_reused(self):
+        """Test a returned connection is lent again."""
+        pool = ConnectionPool(max_size=2, timeout=1)
+        first, created = pool.acquire(FakeConnection)
+        pool.release(first)
+
+        second, reused = pool.acquire(FakeConnection)
+
+        self.assertTrue(created)
+        self.assertFalse(reused)
+        self.assertIs(first, second)
+
+    def test_size_bounded(self):
+        """Test acquiring waits for a free connection, then times out."""
+        pool = ConnectionPool(max_size=1, timeout=0.05)
+        pool.acquire(FakeConnection)
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(FakeConnection)
+
+    def test_waiting_thread_gets_released_connection(self):
+        """Test a released connection goes to a waiting thread."""
+        pool = ConnectionPool(max_size=1, timeout=5)
+        lent, _created = pool.acquire(FakeConnection)
+        acquired = []
+        waiter = threading.Thread(
+            target=lambda: acquired.append(pool.acquire(FakeConnection))
+        )
+        waiter.start()
+
+        pool.release(lent)
+        waiter.join()
+
+        self.assertEqual(acquired, [(lent, False)])
+
+    def test_failed_connections_replaced(self):
+        """Test connections failing the reset or check are closed."""
+        pool = ConnectionPool(
+            max_size=1,
+            timeout=1,
+            reset=lambda conn: conn.status == 'ok',
+            check=lambda conn: not conn.closed,
+        )
+        broken, _created = pool.acquire(FakeConnection)
+        broken.status = 'broken'
+        pool.release(broken)
+
+        replacement, created = pool.acquire(FakeConnection)
+
+        self.assertTrue(broken.closed)
+        self.assertTrue(created)
+        self.assertIsNot(replacement, broken)
+
+    def test_close(self):
+        """Test closing the pool closes the idle connections."""
+        pool = ConnectionPool(max_size=2, timeout=1)
+        idle, _created = pool.acquire(FakeConnection)
+        lent, _created = pool.acquire(FakeConnection)
+        pool.release(idle)
+
+        pool.close()
+
+        self.assertTrue(idle.closed)
+        self.assertFalse(lent.closed)
+        self.assertEqual(pool.stats(), {'size': 1, 'idle': 0})
+
+
+class PooledDatabaseWrapperTests(SimpleTestCase):
+    """Test the backend lends its connections from the pool."""
+
+    def setUp(self):
+        self.wrapper = DatabaseWrapper({
+            'NAME': 'pooled',
+            'OPTIONS': {},
+            'POOL': {'MAX_SIZE': 2, 'TIMEOUT': 1},
+        }, alias=f'pooled-{self.id()}')
+        self.addCleanup(self.wrapper.close_pool)
+
+    def test_pool_shared_by_wrappers(self):
+        """Test wrappers of the same database in other threads share it."""
+        other = DatabaseWrapper(self.wrapper.settings_dict, self.wrapper.alias)
+
+        self.assertIs(self.wrapper.pool, other.pool)
+
+    def test_closed_connection_returned_to_pool(self):
+        """Test closing the wrapper gives the connection to the pool."""
+        fake = FakeConnection()
+        fake.status = extensions.TRANSACTION_STATUS_INTRANS
+        self.wrapper.pool.acquire(lambda: fake)
+        self.wrapper.connection = fake
+
+        self.wrapper.close()
+
+        self.assertFalse(fake.closed)
+        self.assertEqual(fake.status, extensions.TRANSACTION_STATUS_IDLE)
+        self.assertIs(self.wrapper.get_new_connection({}), fake)
+
+    def test_pool_disabled(self):
+        """Test no pool is made without a size."""
+        wrapper = DatabaseWrapper({'NAME': 'unpooled', 'POOL': {}})
+
+        self.assertIsNone(wrapper.pool)
+
+
+class HealthCheckTests(SimpleTestCase):
+    """Test persistent connections are checked once per request."""
+
+    def setUp(self):
+        self.wrapper = DatabaseWrapper({
+            'NAME': 'checked',
+            'OPTIONS': {},
+            'AUTOCOMMIT': True,
+            'CONN_HEALTH_CHECKS': True,
+        })
+        self.wrapper.connection = FakeConnection()
+        self.wrapper.autocommit = True
+
+    def test_checked_on_first_use_in_request(self):
+        """Test the connection is checked once after each request."""
+        with mock.patch.object(
+            self.wrapper, 'is_usable', return_value=True
+        ) as is_usable:
+            self.wrapper.close_if_unusable_or_obsolete()
+            self.wrapper.close_if_health_check_failed()
+            self.wrapper.close_if_health_check_failed()
+
+        is_usable.assert_called_once_with()
+        self.assertIsNotNone(self.wrapper.connection)
+
+    def test_broken_connection_closed(self):
+        """Test a connection failing the check is replaced."""
+        broken = self.wrapper.connection
+        with mock.patch.object(self.wrapper, 'is_usable', return_value=False):
+            self.wrapper.close_if_unusable_or_obsolete()
+            self.wrapper.close_if_health_check_failed()
+
+        self.assertTrue(broken.closed)
+        self.assertIsNone(self.wrapper.connection)
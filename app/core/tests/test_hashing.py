@@ -0,0 +1,85 @@
+"""
+Tests for password hashing on the process pool.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase, override_settings
+
+from core.hashing import HashingBusy, ScryptPasswordHasher, hashing_pool
+
+
+def scrypt_options(**options):
+    """Return PASSWORD_HASHING with the scrypt parameters changed."""
+    return dict(
+        settings.PASSWORD_HASHING,
+        SCRYPT=dict(settings.PASSWORD_HASHING['SCRYPT'], **options),
+    )
+
+
+class ScryptPasswordHasherTests(TestCase):
+    """Test the scrypt hasher."""
+
+    def test_encode_and_verify(self):
+        """Test a hash verifies the right password only."""
+        hasher = ScryptPasswordHasher()
+        encoded = hasher.encode('secret', hasher.salt())
+
+        self.assertTrue(encoded.startswith('scrypt$'))
+        self.assertTrue(hasher.verify('secret', encoded))
+        self.assertFalse(hasher.verify('wrong', encoded))
+
+    def test_must_update_on_new_parameters(self):
+        """Test hashes made with other parameters need an update."""
+        encoded = ScryptPasswordHasher().encode('secret', 'salt' * 6)
+
+        with override_settings(PASSWORD_HASHING=scrypt_options(N=2 ** 12)):
+            hasher = ScryptPasswordHasher()
+
+        self.assertTrue(hasher.must_update(encoded))
+        self.assertTrue(hasher.verify('secret', encoded))
+
+
+class HashingPoolTests(TestCase):
+    """Test users hash and check passwords on the pool."""
+
+    def test_check_password_on_pool(self):
+        """Test passwords set and checked by worker processes."""
+        options = dict(settings.PASSWORD_HASHING, WORKERS=1)
+
+        with override_settings(PASSWORD_HASHING=options):
+            user = get_user_model()(email='test@example.com')
+            user.set_password('testpass123')
+
+            self.assertTrue(user.check_password('testpass123'))
+            self.assertFalse(user.check_password('wrong'))
+
+    def test_rehash_on_login(self):
+        """Test a password of an old hasher is upgraded on login."""
+        user = get_user_model().objects.create_user(
+            email='test@example.com',
+        )
+        user.password = make_password('testpass123', hasher='pbkdf2_sha256')
+        user.save()
+
+        self.assertTrue(user.check_password('testpass123'))
+
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('scrypt$'))
+        self.assertTrue(user.check_password('testpass123'))
+
+    def test_wrong_password_not_rehashed(self):
+        """Test a failed login leaves the old hash in place."""
+        user = get_user_model()(email='test@example.com')
+        user.password = make_password('testpass123', hasher='pbkdf2_sha256')
+
+        self.assertFalse(user.check_password('wrong'))
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+
+    def test_backpressure(self):
+        """Test hashing beyond the queue limit is refused."""
+        options = dict(settings.PASSWORD_HASHING, MAX_PENDING=0)
+
+        with override_settings(PASSWORD_HASHING=options):
+            with self.assertRaises(HashingBusy):
+                hashing_pool.run(len, 'password')
@@ -0,0 +1,110 @@
+"""
+Tests for the request metrics.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.metrics import Histogram, registry
+
+
+METRICS_URL = reverse('metrics')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def metrics_options(**options):
+    """Return METRICS with `options` changed."""
+    return dict(settings.METRICS, **options)
+
+
+class HistogramTests(SimpleTestCase):
+    """Test the histogram text format."""
+
+    def test_render(self):
+        """Test buckets are cumulative and labels escaped."""
+        histogram = Histogram('test_seconds', 'Test.', ['view'], [0.1, 1])
+        histogram.observe(0.05, 'a"b')
+        histogram.observe(0.5, 'a"b')
+
+        lines = list(histogram.render())
+
+        self.assertEqual(lines[:2], [
+            '# HELP test_seconds Test.',
+            '# TYPE test_seconds histogram',
+        ])
+        self.assertEqual(lines[2:], [
+            'test_seconds_bucket{view="a\\"b",le="0.1"} 1',
+            'test_seconds_bucket{view="a\\"b",le="1.0"} 2',
+            'test_seconds_bucket{view="a\\"b",le="+Inf"} 2',
+            'test_seconds_sum{view="a\\"b"} 0.55',
+            'test_seconds_count{view="a\\"b"} 2',
+        ])
+
+
+class MetricsMiddlewareTests(TestCase):
+    """Test requests are measured."""
+
+    def setUp(self):
+        registry.reset()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_request_recorded_per_view_and_action(self):
+        """Test the histograms are labelled with URL name and action."""
+        self.client.get(RECIPES_URL)
+
+        with override_settings(METRICS=metrics_options(TOKEN='secret')):
+            res = self.client.get(
+                METRICS_URL, HTTP_AUTHORIZATION='Bearer secret'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        text = res.content.decode()
+        labels = 'view="recipe:recipe-list",action="list"'
+        for name in ['duration_seconds', 'queries', 'db_seconds',
+                     'serialize_seconds']:
+            self.assertIn(f'api_request_{name}_count{{{labels}}} 1', text)
+
+    def test_slow_request_logged_with_sql(self):
+        """Test slow requests are logged with their queries."""
+        with override_settings(METRICS=metrics_options(
+            SLOW_REQUEST_SECONDS=0,
+        )):
+            with self.assertLogs('core.middleware', 'WARNING') as logs:
+                self.client.get(RECIPES_URL)
+
+        self.assertIn('recipe:recipe-list', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    def test_disabled(self):
+        """Test nothing is recorded when metrics are disabled."""
+        with override_settings(METRICS=metrics_options(ENABLED=False)):
+            self.client.get(RECIPES_URL)
+
+        self.assertNotIn('recipe-list', registry.render())
+
+    def test_metrics_token_required(self):
+        """Test the endpoint checks the bearer token when configured."""
+        with override_settings(METRICS=metrics_options(TOKEN='secret')):
+            denied = self.client.get(METRICS_URL)
+            allowed = self.client.get(
+                METRICS_URL, HTTP_AUTHORIZATION='Bearer secret'
+            )
+
+        self.assertEqual(denied.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(allowed.status_code, status.HTTP_200_OK)
+
+    def test_metrics_not_found_without_token(self):
+        """Test the endpoint is not served without a configured token."""
+        with override_settings(METRICS=metrics_options(TOKEN=None)):
+            res = APIClient().get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,258 @@
+"""
+Tests for the API middleware.
+"""
+import gzip
+import json
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from core.middleware import (
+    AuthenticationMiddleware,
+    CompressionMiddleware,
+    CsrfViewMiddleware,
+    MessageMiddleware,
+    SessionMiddleware,
+    accepted_encodings,
+    brotli,
+)
+from core.tests.utils import seed_recipes
+
+
+ME_URL = reverse('user:me')
+
+
+def apply_middleware(path, method='get'):
+    """Run a request through the session middleware, return the request."""
+    def view(request):
+        return HttpResponse()
+
+    request = getattr(RequestFactory(), method)(path)
+    handler = view
+    for middleware in [MessageMiddleware, AuthenticationMiddleware,
+                       CsrfViewMiddleware, SessionMiddleware]:
+        handler = middleware(handler)
+    handler(request)
+    return request
+
+
+class SessionlessPathTests(SimpleTestCase):
+    """Test which paths skip the session middleware."""
+
+    def test_api_paths_skipped(self):
+        """Test API requests get no session, user or messages."""
+        for path in ['/api/recipe/recipes/', '/api/user/me/']:
+            request = apply_middleware(path)
+
+            self.assertFalse(hasattr(request, 'session'))
+            self.assertFalse(hasattr(request, 'user'))
+            self.assertFalse(hasattr(request, '_messages'))
+
+    def test_other_paths_kept(self):
+        """Test the admin and other paths keep the session middleware."""
+        for path in ['/admin/', '/api/docs/']:
+            request = apply_middleware(path)
+
+            self.assertTrue(hasattr(request, 'session'))
+            self.assertTrue(hasattr(request, 'user'))
+            self.assertTrue(hasattr(request, '_messages'))
+
+    @override_settings(SESSIONLESS_PATH_PREFIXES=())
+    def test_no_prefixes(self):
+        """Test an empty prefix list keeps the middleware everywhere."""
+        request = apply_middleware('/api/recipe/recipes/')
+
+        self.assertTrue(hasattr(request, 'session'))
+
+    def test_csrf_view_check_skipped(self):
+        """Test the CSRF view check is skipped on API paths only."""
+        middleware = CsrfViewMiddleware(lambda request: HttpResponse())
+
+        def check(path):
+            request = RequestFactory().post(path)
+            return middleware.process_view(request, lambda r: None, (), {})
+
+        self.assertIsNone(check('/api/recipe/recipes/'))
+        self.assertEqual(check('/admin/').status_code, 403)
+
+
+class SessionlessAPITests(TestCase):
+    """Test the API through the full middleware stack."""
+
+    def test_token_authentication(self):
+        """Test token requests work and set no cookies."""
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        token = Token.objects.create(user=user)
+
+        res = self.client.get(
+            ME_URL, HTTP_AUTHORIZATION=f'Token {token.key}'
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data['email'], user.email)
+        self.assertFalse(res.cookies)
+        self.assertNotIn('Cookie', res.get('Vary', ''))
+
+    def test_post_without_csrf_token(self):
+        """Test API posts need no CSRF token with enforced checks."""
+        self.client = self.client_class(enforce_csrf_checks=True)
+
+        res = self.client.post(reverse('user:create'), {
+            'email': 'new@example.com',
+            'password': 'testpass123',
+            'name': 'New',
+        })
+
+        self.assertEqual(res.status_code, 201)
+
+
+def compressed(response, accept_encoding='gzip'):
+    """Return `response` after CompressionMiddleware."""
+    request = RequestFactory().get(
+        '/api/recipe/recipes/', HTTP_ACCEPT_ENCODING=accept_encoding
+    )
+    return CompressionMiddleware(lambda request: response)(request)
+
+
+@override_settings(COMPRESSION={
+    'ENABLED': True, 'MIN_SIZE': 100, 'GZIP_LEVEL': 6, 'BROTLI_QUALITY': 5,
+})
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Test compressing responses."""
+
+    body = json.dumps([{'title': 'Recipe', 'price': '5.30'}] * 20).encode()
+
+    def test_accepted_encodings(self):
+        """Test parsing q-values of Accept-Encoding."""
+        self.assertEqual(
+            accepted_encodings('gzip;q=0.5, br , identity; q=0, *;q=x'),
+            {'gzip': 0.5, 'br': 1.0, 'identity': 0.0, '*': 0.0},
+        )
+
+    @skipUnless(brotli is None, 'Brotli is preferred when installed.')
+    def test_gzip(self):
+        """Test large responses are gzipped."""
+        res = compressed(HttpResponse(self.body), 'gzip, deflate, br')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content), self.body)
+        self.assertEqual(res['Content-Length'], str(len(res.content)))
+        self.assertEqual(res['Vary'], 'Accept-Encoding')
+
+    @skipUnless(brotli, 'Brotli is not installed.')
+    def test_brotli_preferred(self):
+        """Test brotli is used when installed and accepted."""
+        res = compressed(HttpResponse(self.body), 'gzip, br')
+
+        self.assertEqual(res['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(res.content), self.body)
+
+    def test_refused_codings(self):
+        """Test nothing is compressed without an accepted coding."""
+        for header in ['', 'identity', 'gzip;q=0, br;q=0', 'deflate']:
+            res = compressed(HttpResponse(self.body), header)
+
+            self.assertFalse(res.has_header('Content-Encoding'))
+            self.assertEqual(res.content, self.body)
+            self.assertEqual(res['Vary'], 'Accept-Encoding')
+
+    def test_wildcard(self):
+        """Test a wildcard accepts compression."""
+        res = compressed(HttpResponse(self.body), '*')
+
+        self.assertIn(res['Content-Encoding'], ['br', 'gzip'])
+
+    def test_small_response_untouched(self):
+        """Test responses under MIN_SIZE are sent as they are."""
+        res = compressed(HttpResponse(b'{"id": 1}'))
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertFalse(res.has_header('Vary'))
+
+    def test_encoded_response_untouched(self):
+        """Test responses with a Content-Encoding are left alone."""
+        response = HttpResponse(self.body)
+        response['Content-Encoding'] = 'br'
+
+        res = compressed(response)
+
+        self.assertEqual(res.content, self.body)
+
+    def test_etag_weakened(self):
+        """Test the ETag of a compressed response becomes weak."""
+        response = HttpResponse(self.body)
+        response['ETag'] = '"abc"'
+
+        res = compressed(response, 'gzip')
+
+        self.assertEqual(res['ETag'], 'W/"abc"')
+
+    def test_streaming(self):
+        """Test streaming responses are compressed chunk by chunk."""
+        chunks = [self.body[:50], b'', self.body[50:]]
+        response = StreamingHttpResponse(iter(chunks))
+
+        res = compressed(response, 'gzip')
+        parts = list(res.streaming_content)
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertGreater(len(parts), 1)
+        self.assertEqual(gzip.decompress(b''.join(parts)), self.body)
+
+    def test_disabled(self):
+        """Test nothing is compressed when COMPRESSION is disabled."""
+        with self.settings(COMPRESSION={'ENABLED': False}):
+            res = compressed(HttpResponse(self.body))
+
+        self.assertEqual(res.content, self.body)
+
+
+class CompressedAPITests(TestCase):
+    """Test compressed API responses."""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        seed_recipes(user, 50)
+        self.token = Token.objects.create(user=user)
+
+    def test_recipe_list_gzipped(self):
+        """Test a large recipe page is sent gzipped."""
+        res = self.client.get(
+            reverse('recipe:recipe-list'),
+            HTTP_AUTHORIZATION=f'Token {self.token.key}',
+            HTTP_ACCEPT_ENCODING='gzip',
+        )
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        data = json.loads(gzip.decompress(res.content))
+        self.assertEqual(len(data['results']), 50)
+
+    def test_recipe_export_gzipped(self):
+        """Test the streamed recipe export is sent gzipped."""
+        for file_format in ['ndjson', 'csv']:
+            with self.subTest(file_format=file_format):
+                res = self.client.get(
+                    reverse('recipe:recipe-export'),
+                    {'file_format': file_format},
+                    HTTP_AUTHORIZATION=f'Token {self.token.key}',
+                    HTTP_ACCEPT_ENCODING='gzip',
+                )
+                body = gzip.decompress(b''.join(res.streaming_content))
+
+                self.assertEqual(res['Content-Encoding'], 'gzip')
+                self.assertNotIn('Content-Length', res)
+                self.assertGreaterEqual(len(body.splitlines()), 50)
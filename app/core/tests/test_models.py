@@ -2,6 +2,7 @@
 """
 from decimal import Decimal 
 
+from django.db import IntegrityError
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
@@ -75,4 +76,44 @@ class ModelTests(TestCase):
         """Test creating tags."""
         user = create_user()
         tag = models.Tag.objects.create(user=user, name='Tag1')
-        self.assertEqual(str(tag), tag.name)
\ No newline at end of file
+        self.assertEqual(str(tag), tag.name)
+
+    def test_tag_name_unique_per_user(self):
+        """Test a user cannot have two tags with the same name."""
+        user = create_user()
+        other_user = create_user(email='other@example.com')
+        models.Tag.objects.create(user=user, name='Vegan')
+        models.Tag.objects.create(user=other_user, name='Vegan')
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name='Vegan')
+
+    def test_recipe_changes_bump_collection_version(self):
+        """Test saving a recipe bumps the owner's recipe version."""
+        user = create_user()
+        recipe = models.Recipe.objects.create(
+            user=user, title='Soup', time_minutes=5, price=Decimal('1.00')
+        )
+        first, _updated_at = models.CollectionVersion.objects.get_version(
+            user.pk, models.CollectionVersion.RECIPES
+        )
+
+        recipe.title = 'Stew'
+        recipe.save()
+
+        second, _updated_at = models.CollectionVersion.objects.get_version(
+            user.pk, models.CollectionVersion.RECIPES
+        )
+        self.assertEqual(second, first + 1)
+
+    def test_delete_user_with_recipes(self):
+        """Test deleting a user also deletes the user's versions."""
+        user = create_user()
+        recipe = models.Recipe.objects.create(
+            user=user, title='Soup', time_minutes=5, price=Decimal('1.00')
+        )
+        recipe.tags.add(models.Tag.objects.create(user=user, name='Vegan'))
+
+        user.delete()
+
+        self.assertFalse(models.CollectionVersion.objects.exists())
@@ -0,0 +1,145 @@
+"""
+Tests for routing reads to replicas.
+"""
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection, router
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.db.routers import get_replica, replica_lag, replica_reads
+from core.models import Recipe
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def replica_options(**options):
+    """Return DATABASE_REPLICAS with `options` changed."""
+    return dict(settings.DATABASE_REPLICAS, **options)
+
+
+class ReplicaTestCase(TestCase):
+    """Set up a user and a fresh lag and pin state."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        replica_lag.reset()
+        self.addCleanup(replica_lag.reset)
+        self.addCleanup(caches[settings.DATABASE_REPLICAS['CACHE']].clear)
+
+
+@override_settings(DATABASE_REPLICAS=replica_options(ALIASES=['replica']))
+class ReplicaRouterTests(ReplicaTestCase):
+    """Test the choice of database for reads and writes."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(replica_lag, 'measure', return_value=0.5)
+        self.measure = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_routed_inside_block(self):
+        """Test reads use the replica only inside `replica_reads`."""
+        with replica_reads(self.user):
+            inside = router.db_for_read(Recipe)
+            write = router.db_for_write(Recipe)
+
+        self.assertEqual(inside, 'replica')
+        self.assertEqual(write, 'default')
+        self.assertEqual(router.db_for_read(Recipe), 'default')
+
+    def test_lagging_replica_skipped(self):
+        """Test reads fall back to the primary when replicas lag."""
+        self.measure.return_value = 10
+
+        with replica_reads(self.user):
+            self.assertIsNone(get_replica())
+
+    def test_unavailable_replica_skipped(self):
+        """Test reads fall back to the primary when replicas are down."""
+        self.measure.return_value = None
+
+        with replica_reads(self.user):
+            self.assertIsNone(get_replica())
+
+    def test_lag_checked_once_per_interval(self):
+        """Test the lag of a replica is cached between checks."""
+        for _ in range(3):
+            with replica_reads(self.user):
+                pass
+
+        self.measure.assert_called_once_with('replica')
+
+    def test_replicas_not_migrated(self):
+        """Test migrations only run on the primary."""
+        self.assertFalse(router.allow_migrate('replica', 'core'))
+        self.assertTrue(router.allow_migrate('default', 'core'))
+
+
+# The default database stands in for a replica to run real queries.
+@override_settings(DATABASE_REPLICAS=replica_options(ALIASES=['default']))
+class ReplicaReadViewTests(ReplicaTestCase):
+    """Test the recipe API reads from replicas."""
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def routed_reads(self, method, *args, **kwargs):
+        """Return the response and whether each query used a replica."""
+        routed = []
+
+        def record(execute, *query):
+            routed.append(get_replica() is not None)
+            return execute(*query)
+
+        with connection.execute_wrapper(record):
+            response = getattr(self.client, method)(*args, **kwargs)
+        return response, routed
+
+    def test_list_read_from_replica(self):
+        """Test every query of a list request uses the replica."""
+        _res, routed = self.routed_reads('get', RECIPES_URL)
+
+        self.assertTrue(routed)
+        self.assertTrue(all(routed))
+
+    def test_reads_stick_to_primary_after_write(self):
+        """Test a user reads from the primary right after writing."""
+        res, routed_write = self.routed_reads('post', RECIPES_URL, {
+            'title': 'Soup',
+            'time_minutes': 10,
+            'price': '2.50',
+        })
+        _res, routed_read = self.routed_reads('get', RECIPES_URL)
+
+        self.assertEqual(res.status_code, 201)
+        self.assertFalse(any(routed_write))
+        self.assertFalse(any(routed_read))
+
+    def test_other_users_keep_reading_from_replica(self):
+        """Test the pin after a write only applies to the writer."""
+        self.client.post(RECIPES_URL, {
+            'title': 'Soup',
+            'time_minutes': 10,
+            'price': '2.50',
+        })
+        self.user = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+        _res, routed = self.routed_reads('get', RECIPES_URL)
+
+        self.assertTrue(all(routed))
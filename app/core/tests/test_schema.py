@@ -0,0 +1,107 @@
+"""
+Tests for serving the cached OpenAPI schema.
+"""
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from drf_spectacular.views import SpectacularAPIView
+
+from core import schema
+
+
+SCHEMA_URL = reverse('api-schema')
+
+
+class CachedSchemaViewTests(SimpleTestCase):
+    """Test the schema view serves documents rendered once."""
+
+    def setUp(self):
+        schema.clear()
+        self.addCleanup(schema.clear)
+
+    def test_same_as_generated_per_request(self):
+        """Test the cached schema matches the schema of drf-spectacular."""
+        request = RequestFactory().get(SCHEMA_URL)
+        expected = SpectacularAPIView.as_view()(request).render()
+
+        res = self.client.get(SCHEMA_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.content, expected.content)
+        self.assertEqual(res['Content-Type'], expected['Content-Type'])
+
+    def test_json_format(self):
+        """Test the schema can be requested as JSON."""
+        res = self.client.get(
+            SCHEMA_URL, HTTP_ACCEPT='application/vnd.oai.openapi+json'
+        )
+
+        self.assertEqual(
+            res['Content-Type'], 'application/vnd.oai.openapi+json'
+        )
+        self.assertIn('/api/recipe/recipes/', json.loads(res.content)['paths'])
+
+    def test_gzipped_when_accepted(self):
+        """Test the schema is sent gzipped to clients accepting it."""
+        plain = self.client.get(SCHEMA_URL)
+
+        res = self.client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content), plain.content)
+        self.assertEqual(res['ETag'], plain['ETag'])
+        self.assertIn('Accept-Encoding', res['Vary'])
+
+    def test_not_modified(self):
+        """Test a conditional request with the ETag gets no body."""
+        etag = self.client.get(SCHEMA_URL)['ETag']
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b'')
+
+    def test_rendered_once(self):
+        """Test the schema is generated once per format and language."""
+        with mock.patch.object(
+            schema, 'render_schema', wraps=schema.render_schema
+        ) as render:
+            for _ in range(2):
+                self.client.get(SCHEMA_URL)
+                self.client.get(SCHEMA_URL, {'lang': 'no-such-language'})
+            self.client.get(SCHEMA_URL, {'lang': 'de'})
+
+        self.assertEqual(render.call_args_list, [
+            mock.call('yaml', None), mock.call('yaml', 'de'),
+        ])
+
+    def test_served_from_generated_files(self):
+        """Test files of generate_schema are served without generating."""
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        directory = temp_dir.name
+        call_command('generate_schema', directory=directory, stdout=StringIO())
+        with open(os.path.join(directory, 'schema.yaml'), 'rb') as file:
+            content = file.read()
+        options = dict(settings.API_SCHEMA, DIRECTORY=directory)
+
+        with override_settings(API_SCHEMA=options), mock.patch.object(
+            schema, 'render_schema'
+        ) as render:
+            res = self.client.get(SCHEMA_URL)
+            gzipped = self.client.get(
+                SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip'
+            )
+
+        render.assert_not_called()
+        self.assertEqual(res.content, content)
+        self.assertEqual(gzip.decompress(gzipped.content), content)
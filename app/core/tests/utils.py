@@ -0,0 +1,106 @@
+"""
+Helpers shared by the test suites.
+"""
+import difflib
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.models import (
+    ChangeLog,
+    CollectionVersion,
+    Recipe,
+    RecipeStats,
+    Tag,
+    TagStats,
+)
+
+
+def seed_tags(user, count):
+    """Make sure `user` has at least `count` tags, return them by name."""
+    return Tag.objects.get_or_create_many(
+        user, [f'Tag {number}' for number in range(count)]
+    )
+
+
+def seed_recipes(user, count, tags_per_recipe=2):
+    """Make sure `user` has at least `count` recipes, each with tags."""
+    recipes = Recipe.objects.filter(user=user)
+    existing = set(recipes.values_list('id', flat=True))
+    Recipe.objects.bulk_create([
+        Recipe(
+            user=user,
+            title=f'Recipe {number}',
+            description=f'Description of recipe {number}',
+            time_minutes=number % 60 + 1,
+            price=Decimal('1.50') + number,
+            link=f'https://example.com/{number}.pdf',
+        )
+        for number in range(len(existing), count)
+    ])
+
+    created = [
+        recipe_id for recipe_id in recipes.values_list('id', flat=True)
+        if recipe_id not in existing
+    ]
+    tags = list(seed_tags(user, tags_per_recipe).values())
+    RecipeTag = Recipe.tags.through
+    RecipeTag.objects.bulk_create([
+        RecipeTag(recipe_id=recipe_id, tag_id=tag.id)
+        for recipe_id in created
+        for tag in tags
+    ])
+    CollectionVersion.objects.bump(user.pk, CollectionVersion.RECIPES)
+    ChangeLog.objects.record(
+        user.pk, CollectionVersion.RECIPES, created, created=True
+    )
+    RecipeStats.objects.rebuild(user.pk)
+    TagStats.objects.rebuild(user.pk)
+    return recipes.order_by('id')
+
+
+class QueryBudgetMixin:
+    """Assertions on the number of queries a request runs."""
+
+    def assertConstantQueries(self, request, seed, sizes=(1, 10),
+                              budget=None):
+        """Assert `request()` runs as many queries whatever the data size.
+
+        `seed(size)` grows the data before each call of `request`, which
+        must return a successful response. `budget` caps the number of
+        queries. Failures show a diff of the captured SQL.
+        """
+        runs = []
+        for size in sizes:
+            seed(size)
+            with CaptureQueriesContext(connection) as context:
+                response = request()
+            self.assertLess(
+                response.status_code, 400, getattr(response, 'data', None)
+            )
+            runs.append(
+                (size, [query['sql'] for query in context.captured_queries])
+            )
+
+        first_size, first = runs[0]
+        for size, queries in runs[1:]:
+            if len(queries) != len(first):
+                self.fail(
+                    f'{len(first)} queries with {first_size} items but '
+                    f'{len(queries)} with {size}:\n' + '\n'.join(
+                        difflib.unified_diff(
+                            first,
+                            queries,
+                            f'{first_size} items',
+                            f'{size} items',
+                            lineterm='',
+                        )
+                    )
+                )
+
+        if budget is not None and len(first) > budget:
+            self.fail(
+                f'{len(first)} queries over the budget of {budget}:\n' +
+                '\n'.join(first)
+            )
@@ -0,0 +1,28 @@
+"""
+Views for operating the API.
+"""
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from core.metrics import registry
+
+
+def metrics(request):
+    """Expose the request metrics in the Prometheus text format.
+
+    Scrapers must send METRICS['TOKEN'] as a bearer token, the endpoint
+    is not found without one configured.
+    """
+    token = settings.METRICS['TOKEN']
+    if not token:
+        raise Http404
+    if not constant_time_compare(
+        request.headers.get('Authorization', ''), f'Bearer {token}'
+    ):
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
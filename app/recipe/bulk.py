@@ -0,0 +1,347 @@
+"""
+Bulk import and export of recipes as NDJSON or CSV, and batch changes.
+"""
+import csv
+import io
+import json
+from collections import Counter
+from decimal import Decimal
+from itertools import islice
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from core.models import (
+    ChangeLog,
+    CollectionVersion,
+    Recipe,
+    RecipeStats,
+    Tag,
+    TagStats,
+)
+
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+EXPORT_FIELDS = [
+    'id', 'title', 'time_minutes', 'price', 'link', 'tags', 'description',
+]
+
+# Keep the error report bounded whatever the size of the upload.
+MAX_REPORTED_ERRORS = 1000
+
+
+def read_rows(stream, file_format):
+    """Yield `(line, data)` for each record of an uploaded stream.
+
+    `data` is None for a record that could not be decoded.
+    """
+    if file_format == 'csv':
+        yield from _read_csv(stream)
+        return
+
+    for number, line in enumerate(stream, start=1):
+        try:
+            line = line.decode('utf-8')
+        except UnicodeDecodeError:
+            yield number, None
+            continue
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            data = None
+        yield number, data if isinstance(data, dict) else None
+
+
+def _read_csv(stream):
+    """Yield `(line, data)` for each CSV record, None if not UTF-8."""
+    malformed = set()
+
+    def lines():
+        # Keep the reader going past a bad line, its record is dropped.
+        for number, line in enumerate(stream, start=1):
+            try:
+                yield line.decode('utf-8')
+            except UnicodeDecodeError:
+                malformed.add(number)
+                yield line.decode('utf-8', 'replace')
+
+    reader = csv.DictReader(lines())
+    if reader.fieldnames is None:
+        return
+    last = reader.line_num
+    for row in reader:
+        first, last = last + 1, reader.line_num
+        if malformed.intersection(range(first, last + 1)):
+            yield last, None
+            continue
+        tags = row.pop('tags', '') or ''
+        row['tags'] = [
+            {'name': name.strip()} for name in tags.split(',')
+            if name.strip()
+        ]
+        yield last, row
+
+
+def import_recipes(user, rows, serializer_class, chunk_size):
+    """Validate and insert recipes in chunks, one transaction per chunk.
+
+    Returns a summary with the number of recipes created and the errors
+    of the rows that were rejected.
+    """
+    summary = {'created': 0, 'failed': 0, 'errors': []}
+
+    def reject(line, errors):
+        summary['failed'] += 1
+        if len(summary['errors']) < MAX_REPORTED_ERRORS:
+            summary['errors'].append({'line': line, 'errors': errors})
+
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        valid = []
+        for line, data in chunk:
+            if data is None:
+                reject(line, {'non_field_errors': ['Malformed record.']})
+                continue
+            serializer = serializer_class(data=data)
+            if serializer.is_valid():
+                valid.append((line, serializer.validated_data))
+            else:
+                reject(line, serializer.errors)
+
+        try:
+            _write_chunk(user, [data for _line, data in valid])
+        except DatabaseError as error:
+            for line, _data in valid:
+                reject(line, {'non_field_errors': [str(error)]})
+        else:
+            summary['created'] += len(valid)
+
+    return summary
+
+
+@transaction.atomic
+def _write_chunk(user, chunk):
+    """Insert validated recipes and their tags with bulk queries."""
+    if not chunk:
+        return
+
+    recipes = []
+    recipe_tags = []
+    for data in chunk:
+        data = dict(data)
+        recipe_tags.append([tag['name'] for tag in data.pop('tags', [])])
+        recipes.append(Recipe(user=user, **data))
+
+    if connection.features.can_return_rows_from_bulk_insert:
+        Recipe.objects.bulk_create(recipes)
+        # Bulk inserts send no signals, so count the recipes here.
+        RecipeStats.objects.add(
+            user.pk,
+            len(recipes),
+            sum(Decimal(recipe.price) for recipe in recipes),
+            sum(recipe.time_minutes for recipe in recipes),
+        )
+        ChangeLog.objects.record(
+            user.pk,
+            CollectionVersion.RECIPES,
+            [recipe.id for recipe in recipes],
+            created=True,
+        )
+    else:
+        # Without RETURNING there is no other way to learn the new ids.
+        for recipe in recipes:
+            recipe.save()
+
+    tags = Tag.objects.get_or_create_many(
+        user, [name for names in recipe_tags for name in names]
+    )
+    RecipeTag = Recipe.tags.through
+    links = RecipeTag.objects.bulk_create([
+        RecipeTag(recipe_id=recipe.id, tag_id=tags[name].id)
+        for recipe, names in zip(recipes, recipe_tags)
+        for name in dict.fromkeys(names)
+    ])
+    TagStats.objects.add(user.pk, Counter(link.tag_id for link in links))
+    # Bulk inserts send no signals, so bump the versions here.
+    CollectionVersion.objects.bump(
+        user.pk, CollectionVersion.RECIPES, CollectionVersion.TAGS
+    )
+
+
+def _totals(recipes):
+    """Return the count, price and time totals of `recipes`."""
+    totals = recipes.aggregate(
+        count=Count('id'), price=Sum('price'), time_minutes=Sum('time_minutes')
+    )
+    return (
+        totals['count'],
+        totals['price'] or Decimal('0'),
+        totals['time_minutes'] or 0,
+    )
+
+
+def _unlink(links):
+    """Delete tag links, return the number removed from each tag."""
+    removed = {
+        tag_id: -count for tag_id, count in links.values('tag_id').annotate(
+            count=Count('id')
+        ).order_by().values_list('tag_id', 'count')
+    }
+    if removed:
+        links.delete()
+    return removed
+
+
+def _link(recipe_ids, tag_ids):
+    """Link every recipe to every tag, return the number of new links of
+    each tag."""
+    RecipeTag = Recipe.tags.through
+    existing = set(RecipeTag.objects.filter(
+        recipe_id__in=recipe_ids, tag_id__in=tag_ids
+    ).values_list('recipe_id', 'tag_id'))
+    links = [
+        RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+        for recipe_id in recipe_ids
+        for tag_id in tag_ids
+        if (recipe_id, tag_id) not in existing
+    ]
+    RecipeTag.objects.bulk_create(
+        links, batch_size=1000, ignore_conflicts=True
+    )
+    return Counter(link.tag_id for link in links)
+
+
+@transaction.atomic
+def update_recipes(user, ids, changes=None, tags=None, add_tags=(),
+                   remove_tags=()):
+    """Set the same fields on the recipes `ids` of `user` and replace, add
+    or remove tags by name, with a fixed number of queries."""
+    recipes = Recipe.objects.filter(user=user, id__in=ids)
+    changes = dict(changes or {})
+    counted = changes.keys() & {'price', 'time_minutes'}
+    if counted:
+        _count, price, time_minutes = _totals(recipes)
+    # Also touches the recipes whose tags change.
+    recipes.update(**changes, updated_at=timezone.now())
+    if counted:
+        _count, new_price, new_time_minutes = _totals(recipes)
+        RecipeStats.objects.add(
+            user.pk, 0, new_price - price, new_time_minutes - time_minutes
+        )
+
+    RecipeTag = Recipe.tags.through
+    links = RecipeTag.objects.filter(recipe_id__in=ids)
+    counts = Counter()
+    if tags is not None:
+        tag_ids = [tag.id for tag in Tag.objects.get_or_create_many(
+            user, [tag['name'] for tag in tags]
+        ).values()]
+        counts.update(_unlink(links.exclude(tag_id__in=tag_ids)))
+        counts.update(_link(ids, tag_ids))
+    if remove_tags:
+        counts.update(_unlink(links.filter(
+            tag__user=user,
+            tag__name__in=[tag['name'] for tag in remove_tags],
+        )))
+    if add_tags:
+        counts.update(_link(ids, [
+            tag.id for tag in Tag.objects.get_or_create_many(
+                user, [tag['name'] for tag in add_tags]
+            ).values()
+        ]))
+    TagStats.objects.add(user.pk, counts)
+
+    # Bulk queries send no signals, so bump the versions here.
+    collections = [CollectionVersion.RECIPES]
+    if tags is not None or add_tags:
+        collections.append(CollectionVersion.TAGS)
+    CollectionVersion.objects.bump(user.pk, *collections)
+    ChangeLog.objects.record(user.pk, CollectionVersion.RECIPES, ids)
+
+
+@transaction.atomic
+def delete_recipes(user, ids):
+    """Delete the recipes `ids` of `user` with a fixed number of queries."""
+    recipes = Recipe.objects.filter(user=user, id__in=ids)
+    count, price, time_minutes = _totals(recipes)
+    counts = _unlink(Recipe.tags.through.objects.filter(recipe_id__in=ids))
+    # The links are gone and nothing else references recipes (see
+    # test_batch_delete_unlinks_every_relation), so skip the collector,
+    # which loads every recipe and sends signals for each.
+    recipes._raw_delete(recipes.db)
+
+    RecipeStats.objects.add(user.pk, -count, -price, -time_minutes)
+    TagStats.objects.add(user.pk, counts)
+    CollectionVersion.objects.bump(user.pk, CollectionVersion.RECIPES)
+    ChangeLog.objects.record(
+        user.pk,
+        CollectionVersion.RECIPES,
+        ids,
+        deleted=True,
+        create=False,
+    )
+
+
+def export_recipes(queryset, file_format, chunk_size):
+    """Yield the recipes of `queryset` encoded as NDJSON lines or CSV.
+
+    Rows are read through a server-side cursor and the tags of each chunk
+    are fetched with one query, so memory use does not grow with the
+    number of recipes.
+    """
+    fields = [field for field in EXPORT_FIELDS if field != 'tags']
+    rows = queryset.prefetch_related(None).order_by('-id').values(
+        *fields
+    ).iterator(chunk_size=chunk_size)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if file_format == 'csv':
+        writer.writerow(EXPORT_FIELDS)
+        yield _drain(buffer)
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        tags = {}
+        for recipe_id, tag_id, name in Recipe.tags.through.objects.filter(
+            recipe_id__in=[row['id'] for row in chunk]
+        ).order_by('tag__name').values_list(
+            'recipe_id', 'tag_id', 'tag__name'
+        ):
+            tags.setdefault(recipe_id, []).append(
+                {'id': tag_id, 'name': name}
+            )
+
+        for row in chunk:
+            row['price'] = str(row['price'])
+            row['tags'] = tags.get(row['id'], [])
+            if file_format == 'csv':
+                row['tags'] = ','.join(tag['name'] for tag in row['tags'])
+                writer.writerow([row[field] for field in EXPORT_FIELDS])
+            else:
+                record = {field: row[field] for field in EXPORT_FIELDS}
+                buffer.write(json.dumps(record, ensure_ascii=False))
+                buffer.write('\n')
+        yield _drain(buffer)
+
+
+def _drain(buffer):
+    """Return and clear the contents of a text buffer as bytes."""
+    data = buffer.getvalue().encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+    return data
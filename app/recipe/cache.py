@@ -0,0 +1,63 @@
+"""
+Per-user cache of serialized API responses.
+"""
+import hashlib
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class ResponseCache:
+    """Cache of serialized response data with hit and miss counters.
+
+    Keys embed the version of the user's collection, so writes never
+    delete anything: they bump the version and stale entries expire.
+    """
+
+    def __init__(self):
+        self.hits = Counter()
+        self.misses = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return settings.API_RESPONSE_CACHE['ENABLED']
+
+    @property
+    def cache(self):
+        return caches[settings.API_RESPONSE_CACHE['CACHE']]
+
+    def make_key(self, *parts):
+        """Return the cache key for the response identified by `parts`."""
+        digest = hashlib.sha1(
+            ':'.join(str(part) for part in parts).encode()
+        ).hexdigest()
+        return f'api-response:{digest}'
+
+    def get(self, key, label):
+        """Return the cached data for `key`, counting a hit or a miss."""
+        data = self.cache.get(key)
+        with self._lock:
+            (self.misses if data is None else self.hits)[label] += 1
+        return data
+
+    def set(self, key, data):
+        self.cache.set(key, data)
+
+    def stats(self):
+        """Return the hit and miss counts per label."""
+        with self._lock:
+            return {
+                label: {'hits': self.hits[label], 'misses': self.misses[label]}
+                for label in self.hits.keys() | self.misses.keys()
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits.clear()
+            self.misses.clear()
+
+
+response_cache = ResponseCache()
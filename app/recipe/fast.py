@@ -0,0 +1,139 @@
+"""
+Read-only serialization of list pages from `.values()` rows.
+"""
+import decimal
+import functools
+
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+
+# Fields whose to_representation returns database values unchanged.
+IDENTITY_REPRESENTATIONS = (
+    serializers.CharField.to_representation,
+    serializers.IntegerField.to_representation,
+    serializers.BooleanField.to_representation,
+)
+
+
+def compile_field(field):
+    """Return a converter doing `field.to_representation`, None if the
+    database value is already the representation."""
+    to_representation = type(field).to_representation
+    if to_representation in IDENTITY_REPRESENTATIONS:
+        return None
+
+    if (isinstance(field, serializers.DecimalField) and
+            to_representation is serializers.DecimalField.to_representation
+            and field.decimal_places is not None and not field.localize and
+            getattr(field, 'coerce_to_string',
+                    api_settings.COERCE_DECIMAL_TO_STRING)):
+        # DecimalField copies the context and builds the exponent per value.
+        exponent = decimal.Decimal('.1') ** field.decimal_places
+        context = decimal.getcontext().copy()
+        if field.max_digits is not None:
+            context.prec = field.max_digits
+        if field.rounding is not None:
+            context.rounding = field.rounding
+
+        def convert(value):
+            return format(value.quantize(exponent, context=context), 'f')
+
+        return convert
+
+    return field.to_representation
+
+
+class RowSerializer:
+    """Serialize `.values()` rows as a ModelSerializer does instances.
+
+    Fields are compiled once per serializer class. Nested many-to-many
+    ModelSerializers take one query per page, the same as the
+    `prefetch_related` of the instance path. `fields` limits the output
+    to those names and `keys` are model fields selected without being
+    serialized, such as the ordering of the pagination.
+    """
+
+    def __init__(self, serializer_class, fields=None, keys=()):
+        serializer = serializer_class()
+        self.model = serializer.Meta.model
+        self.pk = self.model._meta.pk.attname
+        self.names = []
+        self.columns = []
+        self.nested = []
+        for name, field in serializer.fields.items():
+            if field.write_only or (fields is not None and
+                                    name not in fields):
+                continue
+            self.names.append(name)
+            if isinstance(field, serializers.ListSerializer):
+                relation = self.model._meta.get_field(field.source)
+                if not relation.many_to_many or not isinstance(
+                    field.child, serializers.ModelSerializer
+                ):
+                    raise ValueError(f'Unsupported nested field {name}.')
+                self.nested.append((
+                    name, relation, RowSerializer(type(field.child))
+                ))
+            elif isinstance(field, (serializers.SerializerMethodField,
+                                    serializers.RelatedField)) or (
+                    '.' in field.source or field.source == '*'):
+                raise ValueError(f'Unsupported field {name}.')
+            else:
+                self.columns.append((name, field.source, compile_field(field)))
+
+        # The model fields to select.
+        self.sources = [source for _name, source, _convert in self.columns]
+        if self.nested and self.pk not in self.sources:
+            self.sources.append(self.pk)
+        self.sources += [key for key in keys if key not in self.sources]
+
+    def values(self, queryset):
+        """Return `queryset` selecting only the serialized fields."""
+        return queryset.prefetch_related(None).values(*self.sources)
+
+    def serialize(self, rows):
+        """Return the representation of each row."""
+        data = []
+        for row in rows:
+            # Keep the field order of the serializer, the nested fields
+            # are filled in below.
+            item = dict.fromkeys(self.names) if self.nested else {}
+            for name, source, convert in self.columns:
+                value = row[source]
+                if convert is not None and value is not None:
+                    value = convert(value)
+                item[name] = value
+            data.append(item)
+
+        ids = [row[self.pk] for row in rows] if self.nested else []
+        for name, relation, child in self.nested:
+            related = child.related_to(relation, ids)
+            for item, row in zip(data, rows):
+                item[name] = related.get(row[self.pk], [])
+        return data
+
+    def related_to(self, relation, ids):
+        """Return the representations of the rows related to `ids` by a
+        many-to-many `relation`, grouped by id."""
+        if not ids:
+            return {}
+        parent = relation.related_query_name()
+        rows = list(self.model._default_manager.filter(
+            **{f'{parent}__in': ids}
+        ).values_list(parent, *self.sources))
+
+        grouped = {}
+        data = self.serialize([
+            dict(zip(self.sources, values)) for _parent, *values in rows
+        ])
+        for (parent_id, *_values), item in zip(rows, data):
+            grouped.setdefault(parent_id, []).append(item)
+        return grouped
+
+
+@functools.lru_cache(maxsize=None)
+def row_serializer(serializer_class, fields=None, keys=()):
+    """Return the RowSerializer compiled for `serializer_class`, taking
+    `fields` and `keys` as tuples."""
+    return RowSerializer(serializer_class, fields, keys)
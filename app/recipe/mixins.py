@@ -0,0 +1,347 @@
+"""
+View mixins for the recipe APIs.
+"""
+import hashlib
+from functools import lru_cache, partial
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.utils.translation import gettext as _
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+
+from rest_framework import exceptions, serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from core.db.routers import pin_to_primary, replica_reads
+from core.models import CollectionVersion
+from core.renderers import FastJSONRenderer
+from recipe.cache import response_cache
+from recipe.fast import row_serializer
+
+
+class ReplicaReadMixin:
+    """Serve list and retrieve from a read replica when configured.
+
+    Users who wrote through the view read from the primary for
+    DATABASE_REPLICAS['STICKY_SECONDS'] to see their own changes. Put it
+    first among the bases so that version lookups use the replica too.
+    """
+
+    def list(self, request, *args, **kwargs):
+        with replica_reads(request.user):
+            return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        with replica_reads(request.user):
+            return super().retrieve(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class CollectionVersionMixin:
+    """Look up the user's collection versions once per request."""
+    collection = None
+
+    def get_collection_version(self, collection=None):
+        """Return `(version, updated_at)` of a collection of the user."""
+        collection = collection or self.collection
+        versions = self.__dict__.setdefault('_collection_versions', {})
+        if collection not in versions:
+            versions[collection] = CollectionVersion.objects.get_version(
+                self.request.user.pk, collection
+            )
+
+        return versions[collection]
+
+
+class ConditionalMixin(CollectionVersionMixin):
+    """Answer conditional GET requests without serializing.
+
+    ETags are derived from per-user collection versions and modification
+    timestamps, so a request that ends in 304 Not Modified never loads or
+    serializes the objects themselves.
+    """
+
+    def make_etag(self, *parts):
+        """Return an ETag for the current user, action and `parts`."""
+        key = ':'.join(str(part) for part in (
+            self.request.user.pk,
+            self.action,
+            self.request.accepted_renderer.format,
+            *parts,
+        ))
+        return quote_etag(hashlib.sha1(key.encode()).hexdigest())
+
+    def conditional_response(self, etag, last_modified, respond):
+        """Return 304 when the client holds `etag`, else call `respond`."""
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(
+            self.request, etag=etag, last_modified=timestamp
+        )
+        if response is None:
+            response = respond()
+            if response.status_code != 200:
+                return response
+
+        response['ETag'] = etag
+        if timestamp:
+            response['Last-Modified'] = http_date(timestamp)
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Accept', 'Authorization'])
+        return response
+
+
+class ConditionalListMixin(ConditionalMixin):
+    """Conditional list based on the version of the user's collection."""
+
+    def list(self, request, *args, **kwargs):
+        respond = partial(super().list, request, *args, **kwargs)
+        version = self.get_collection_version()
+        if version is None:
+            return respond()
+
+        number, updated_at = version
+        etag = self.make_etag(number, request.query_params.urlencode())
+        return self.conditional_response(etag, updated_at, respond)
+
+
+class ConditionalRetrieveMixin(ConditionalMixin):
+    """Conditional retrieve based on the object's `updated_at`."""
+    # Collections nested in the detail representation.
+    detail_collections = ()
+
+    def retrieve(self, request, *args, **kwargs):
+        respond = partial(super().retrieve, request, *args, **kwargs)
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        try:
+            updated_at = self.get_queryset().prefetch_related(None).filter(
+                **{self.lookup_field: kwargs[lookup]}
+            ).values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError, ValidationError):
+            updated_at = None
+        if updated_at is None:
+            return respond()
+
+        parts = [
+            kwargs[lookup],
+            updated_at.isoformat(),
+            request.query_params.urlencode(),
+        ]
+        for collection in self.detail_collections:
+            version = self.get_collection_version(collection)
+            if version is not None:
+                parts.append(version[0])
+                updated_at = max(updated_at, version[1])
+
+        etag = self.make_etag(*parts)
+        return self.conditional_response(etag, updated_at, respond)
+
+
+class CachedResponseMixin(CollectionVersionMixin):
+    """Serve responses from the per-user response cache."""
+
+    def cached_response(self, respond):
+        """Return the cached response for the request or call `respond`.
+
+        The key holds the full url, which covers the query parameters and
+        the host used in pagination links, and the collection version.
+        """
+        version = self.get_collection_version()
+        if not response_cache.enabled or version is None:
+            return respond()
+
+        key = response_cache.make_key(
+            self.request.user.pk,
+            self.basename,
+            self.action,
+            self.request.build_absolute_uri(),
+            *version,
+        )
+        data = response_cache.get(key, f'{self.basename}-{self.action}')
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = respond()
+        if response.status_code == 200:
+            response_cache.set(key, response.data)
+            response['X-Cache'] = 'MISS'
+        return response
+
+
+class CachedListMixin(CachedResponseMixin):
+    """Cached list of the user's collection."""
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            partial(super().list, request, *args, **kwargs)
+        )
+
+
+class CachedRetrieveMixin(CachedResponseMixin):
+    """Cached retrieve, invalidated with the user's collection."""
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            partial(super().retrieve, request, *args, **kwargs)
+        )
+
+
+class FastListMixin:
+    """Serve list pages from `.values()` rows when API_FAST_SERIALIZERS.
+
+    The rows are serialized by a RowSerializer compiled from the list
+    serializer and rendered by FastJSONRenderer, giving the same bytes as
+    the ModelSerializer and JSONRenderer.
+    """
+    # Actions rendered by FastJSONRenderer, their data must hold no floats.
+    fast_render_actions = ('list',)
+
+    def list(self, request, *args, **kwargs):
+        if not settings.API_FAST_SERIALIZERS:
+            return super().list(request, *args, **kwargs)
+
+        serializer = self.get_row_serializer()
+        queryset = serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(serializer.serialize(list(queryset)))
+        return self.get_paginated_response(serializer.serialize(page))
+
+    def get_row_serializer(self):
+        """Return the RowSerializer of the list serializer."""
+        return row_serializer(self.get_serializer_class())
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if (self.action not in self.fast_render_actions or
+                not settings.API_FAST_SERIALIZERS):
+            return renderers
+        return [
+            FastJSONRenderer() if type(renderer) is JSONRenderer else renderer
+            for renderer in renderers
+        ]
+
+
+@lru_cache(maxsize=None)
+def readable_fields(serializer_class):
+    """Return the names of the fields `serializer_class` outputs."""
+    return tuple(
+        name for name, field in serializer_class().fields.items()
+        if not field.write_only
+    )
+
+
+class SparseFieldsMixin:
+    """Limit the output to the `fields` and `omit` query parameters.
+
+    Both take comma separated field names. The queryset only selects the
+    columns of the kept fields, and skips prefetching nested fields that
+    are left out. Put it before FastListMixin among the bases.
+    """
+    sparse_fields_actions = ('list', 'retrieve')
+
+    def get_sparse_fields(self):
+        """Return the names of the fields to output, None for all."""
+        if '_sparse_fields' not in self.__dict__:
+            self._sparse_fields = self._parse_sparse_fields()
+        return self._sparse_fields
+
+    def _parse_sparse_fields(self):
+        if self.action not in self.sparse_fields_actions:
+            return None
+        params = self.request.query_params
+        selected = {
+            param: [
+                name.strip() for name in params[param].split(',')
+                if name.strip()
+            ]
+            for param in ('fields', 'omit') if params.get(param)
+        }
+        if not selected:
+            return None
+
+        available = readable_fields(self.get_serializer_class())
+        errors = {}
+        for param, names in selected.items():
+            unknown = [name for name in names if name not in available]
+            if unknown:
+                errors[param] = _('Unknown fields: %(fields)s.') % {
+                    'fields': ', '.join(unknown),
+                }
+        if errors:
+            raise exceptions.ValidationError(errors)
+
+        fields = tuple(
+            name for name in available
+            if name in selected.get('fields', available) and
+            name not in selected.get('omit', ())
+        )
+        if not fields:
+            raise exceptions.ValidationError(
+                {'fields': _('Select at least one field.')}
+            )
+        return fields
+
+    def get_ordering_keys(self):
+        """Return the model fields the pagination orders by."""
+        return tuple(
+            field.lstrip('-')
+            for field in getattr(self.paginator, 'ordering', ())
+        )
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return queryset
+
+        serializer = self.get_serializer_class()()
+        columns = list(self.get_ordering_keys())
+        nested = False
+        for name in fields:
+            field = serializer.fields[name]
+            if isinstance(field, serializers.ListSerializer):
+                nested = True
+                continue
+            try:
+                model_field = queryset.model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                # Annotations are selected whatever the fields.
+                continue
+            if model_field.concrete and not model_field.many_to_many:
+                columns.append(model_field.name)
+
+        queryset = queryset.only(*columns)
+        if not nested:
+            queryset = queryset.prefetch_related(None)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            child = getattr(serializer, 'child', serializer)
+            for name in list(child.fields):
+                if name not in fields:
+                    del child.fields[name]
+        return serializer
+
+    def get_row_serializer(self):
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return super().get_row_serializer()
+        return row_serializer(
+            self.get_serializer_class(), fields, self.get_ordering_keys()
+        )
@@ -0,0 +1,187 @@
+"""
+Pagination for the recipe APIs.
+"""
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Paginate by seeking past the ordering key of the previous page.
+
+    The cursor carries the complete ordering key of the boundary row, so
+    every page is a single range scan: no OFFSET and no COUNT(*).
+    The ordering must end in a unique column to keep cursors stable.
+    """
+    ordering = ('-id',)
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return a single page of results for the request."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        queryset = queryset.order_by(*self._order_by(reverse))
+        if position is not None:
+            queryset = queryset.filter(self._seek(position, reverse))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_previous = has_more
+            self.has_next = True
+        else:
+            self.has_previous = position is not None
+            self.has_next = has_more
+
+        return self.page
+
+    def get_page_size(self, request):
+        """Return the page size requested by the client, within the cap."""
+        default = api_settings.PAGE_SIZE
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return default
+        if size <= 0:
+            return default
+
+        return min(size, settings.API_MAX_PAGE_SIZE)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[-1]), False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[0]), True)
+
+    def encode_cursor(self, position, reverse):
+        """Return the url for the page next to `position`."""
+        payload = json.dumps({'p': position, 'r': int(reverse)})
+        token = urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, token
+        )
+
+    def decode_cursor(self, request, model):
+        """Return the `(position, reverse)` held by the request cursor."""
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+
+        try:
+            payload = json.loads(urlsafe_b64decode(token.encode()))
+            position, reverse = payload['p'], bool(payload['r'])
+            if len(position) != len(self.ordering):
+                raise ValueError(position)
+            position = [
+                model._meta.get_field(field).to_python(value)
+                for (field, _desc), value in zip(self._fields(), position)
+            ]
+        except (TypeError, ValueError, KeyError, ValidationError,
+                binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, reverse
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+    def _fields(self):
+        """Return `(field, descending)` pairs for the ordering."""
+        return [
+            (field.lstrip('-'), field.startswith('-'))
+            for field in self.ordering
+        ]
+
+    def _order_by(self, reverse):
+        """Return the ordering, flipped when paging backwards."""
+        if not reverse:
+            return self.ordering
+        return [
+            field if descending else '-' + field
+            for field, descending in self._fields()
+        ]
+
+    def _seek(self, position, reverse):
+        """Return the filter selecting rows past `position`."""
+        condition = Q()
+        fields = self._fields()
+        for index, (field, descending) in enumerate(fields):
+            lookup = 'lt' if descending != reverse else 'gt'
+            clause = Q(**{f'{field}__{lookup}': position[index]})
+            for (prior, _desc), value in zip(fields[:index], position):
+                clause &= Q(**{prior: value})
+            condition |= clause
+
+        return condition
+
+    def _position(self, item):
+        """Return the ordering key of a page item."""
+        if isinstance(item, dict):
+            return [item[field] for field, _desc in self._fields()]
+        return [getattr(item, field) for field, _desc in self._fields()]
+
+
+class RecipePagination(KeysetPagination):
+    """Pagination for recipes, newest first."""
+    ordering = ('-id',)
+
+
+class TagPagination(KeysetPagination):
+    """Pagination for tags, by name with id as the tie breaker."""
+    ordering = ('-name', 'id')
@@ -0,0 +1,55 @@
+"""
+Full text search over recipes.
+"""
+from django.contrib.postgres.search import (
+    SearchHeadline,
+    SearchQuery,
+    SearchRank,
+    TrigramSimilarity,
+)
+from django.db import connection
+from django.db.models import CharField, F, FloatField, Q, Value
+
+
+# Must match the configuration of the search_vector trigger.
+SEARCH_CONFIG = 'english'
+
+
+def search_recipes(queryset, text, limit):
+    """Return up to `limit` recipes matching `text`, best match first.
+
+    Each recipe is annotated with its `rank` and a highlighted `snippet`.
+    When the text search finds nothing, fall back to trigram similarity of
+    the title so misspelt queries still find something.
+    """
+    if connection.vendor != 'postgresql':
+        return _search_fallback(queryset, text, limit)
+
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+    results = list(queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query),
+        snippet=SearchHeadline(
+            'description',
+            query,
+            config=SEARCH_CONFIG,
+            start_sel='<mark>',
+            stop_sel='</mark>',
+        ),
+    ).order_by('-rank', '-id')[:limit])
+    if results:
+        return results
+
+    return list(queryset.filter(title__trigram_similar=text).annotate(
+        rank=TrigramSimilarity('title', text),
+        snippet=Value(None, output_field=CharField()),
+    ).order_by('-rank', '-id')[:limit])
+
+
+def _search_fallback(queryset, text, limit):
+    """Unranked substring search for databases without text search."""
+    return list(queryset.filter(
+        Q(title__icontains=text) | Q(description__icontains=text)
+    ).annotate(
+        rank=Value(None, output_field=FloatField()),
+        snippet=Value(None, output_field=CharField()),
+    ).order_by('-id')[:limit])
@@ -2,28 +2,228 @@
 Serializers for Recipe api.
 """
 
+from django.conf import settings
+from django.db import transaction
+from django.utils.translation import gettext as _
+
 from rest_framework import serializers
 
 from core.models import Recipe, Tag
 
 
+class TagSerializer(serializers.ModelSerializer):
+    """Serializer class for tag."""
+    class Meta:
+        model = Tag
+        fields = ['id', 'name']
+        read_only_fields = ['id']
+
+    def validate_name(self, value):
+        """Reject renaming a tag to a name the user already has."""
+        if self.instance is not None and Tag.objects.filter(
+            user=self.instance.user, name=value
+        ).exclude(pk=self.instance.pk).exists():
+            raise serializers.ValidationError(
+                _('A tag with this name already exists.')
+            )
+
+        return value
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     """Serializer class for recipe."""
+    tags = TagSerializer(many=True, required=False)
+
     class Meta:
         model = Recipe
-        fields = ['id', 'title', 'time_minutes', 'price', 'link']
+        fields = ['id', 'title', 'time_minutes', 'price', 'link', 'tags']
         read_only_fields = ['id']
-        
-        
+
+    def _get_or_create_tags(self, tags, user):
+        """Return the user's tags for the nested tag data."""
+        return Tag.objects.get_or_create_many(
+            user, [tag['name'] for tag in tags]
+        ).values()
+
+    @transaction.atomic
+    def create(self, validated_data):
+        """Create a recipe with its tags."""
+        tags = validated_data.pop('tags', [])
+        recipe = Recipe.objects.create(**validated_data)
+        if tags:
+            recipe.tags.add(*self._get_or_create_tags(tags, recipe.user))
+
+        return recipe
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        """Update a recipe, replacing its tags when given."""
+        tags = validated_data.pop('tags', None)
+        instance = super().update(instance, validated_data)
+        if tags is not None:
+            instance.tags.set(self._get_or_create_tags(tags, instance.user))
+
+        return instance
+
+
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for recipe detail."""
     class Meta(RecipeSerializer.Meta):
         fields = RecipeSerializer.Meta.fields + ['description']
-        
-        
-class TagSerializer(serializers.ModelSerializer):
-    """Serializer class for tag."""
+
+
+class RecipeSearchSerializer(RecipeSerializer):
+    """Serializer for recipe search results."""
+    rank = serializers.FloatField(read_only=True, allow_null=True)
+    snippet = serializers.CharField(read_only=True, allow_null=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ['rank', 'snippet']
+
+
+class RecipeChangesSerializer(serializers.ModelSerializer):
+    """Serializer for the fields a batch update sets on every recipe."""
     class Meta:
-        model = Tag
-        fields = ['id', 'name']
-        read_only_fields = ['id']
+        model = Recipe
+        fields = ['title', 'time_minutes', 'price', 'link', 'description']
+        extra_kwargs = {field: {'required': False} for field in fields}
+
+
+class RecipeBatchSerializer(serializers.Serializer):
+    """Select the recipes of a batch by ids or by list filters."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        allow_empty=False,
+    )
+    filter = serializers.DictField(
+        child=serializers.CharField(), required=False
+    )
+
+    def validate_ids(self, value):
+        """Drop duplicates and cap the size of the batch."""
+        value = list(dict.fromkeys(value))
+        if len(value) > settings.RECIPE_BATCH_MAX_SIZE:
+            raise serializers.ValidationError(
+                _('Ensure this field has no more than %(max)d elements.')
+                % {'max': settings.RECIPE_BATCH_MAX_SIZE}
+            )
+
+        return value
+
+    def validate(self, attrs):
+        """Require exactly one way of selecting recipes."""
+        if ('ids' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError(
+                _('Provide either ids or filter.')
+            )
+
+        return attrs
+
+
+class RecipeBatchUpdateSerializer(RecipeBatchSerializer):
+    """Validate a batch update of recipes."""
+    changes = RecipeChangesSerializer(required=False)
+    tags = TagSerializer(many=True, required=False)
+    add_tags = TagSerializer(many=True, required=False)
+    remove_tags = TagSerializer(many=True, required=False)
+
+    def validate(self, attrs):
+        """Require a change, and tags to be either replaced or edited."""
+        attrs = super().validate(attrs)
+        if not attrs.get('changes') and not any(
+            field in attrs for field in ('tags', 'add_tags', 'remove_tags')
+        ):
+            raise serializers.ValidationError(_('Nothing to change.'))
+        if 'tags' in attrs and ('add_tags' in attrs or 'remove_tags' in attrs):
+            raise serializers.ValidationError(
+                _('Replace tags or add and remove them, not both.')
+            )
+
+        return attrs
+
+
+class RecipeBatchItemSerializer(serializers.Serializer):
+    """Serializer for the outcome of a batch for one recipe."""
+    id = serializers.IntegerField()
+    status = serializers.ChoiceField(
+        choices=['updated', 'deleted', 'not_found']
+    )
+
+
+class RecipeBatchResultSerializer(serializers.Serializer):
+    """Serializer for the summary of a batch update or delete."""
+    matched = serializers.IntegerField()
+    results = RecipeBatchItemSerializer(many=True)
+
+
+class TagCountSerializer(serializers.Serializer):
+    """Serializer for the number of recipes of a tag."""
+    id = serializers.IntegerField(source='tag_id')
+    name = serializers.CharField(source='tag__name')
+    recipe_count = serializers.IntegerField()
+
+
+class RecipeStatsSerializer(serializers.Serializer):
+    """Serializer for the recipe stats of a user."""
+    recipe_count = serializers.IntegerField()
+    average_price = serializers.DecimalField(
+        max_digits=None, decimal_places=2, allow_null=True
+    )
+    average_time_minutes = serializers.FloatField(allow_null=True)
+    tags = TagCountSerializer(many=True)
+
+
+class RecipeSearchQuerySerializer(serializers.Serializer):
+    """Validate the query parameters of a recipe search."""
+    q = serializers.CharField(max_length=255)
+    limit = serializers.IntegerField(min_value=1, required=False)
+
+
+class RecipeFilterSerializer(serializers.Serializer):
+    """Validate the query parameters filtering the recipe list."""
+    tags = serializers.CharField(required=False)
+    tags_match = serializers.ChoiceField(
+        choices=['any', 'all'], default='any'
+    )
+    price_min = serializers.DecimalField(
+        max_digits=5, decimal_places=2, required=False
+    )
+    price_max = serializers.DecimalField(
+        max_digits=5, decimal_places=2, required=False
+    )
+    time_minutes_max = serializers.IntegerField(required=False)
+    title_prefix = serializers.CharField(required=False, max_length=255)
+
+    def validate_tags(self, value):
+        """Convert a comma separated string of ids to a list of ints."""
+        try:
+            return list(dict.fromkeys(
+                int(tag_id) for tag_id in value.split(',') if tag_id
+            ))
+        except ValueError:
+            raise serializers.ValidationError(
+                _('Tags must be a comma separated list of ids.')
+            )
+
+
+class SyncQuerySerializer(serializers.Serializer):
+    """Validate the query parameters of a sync."""
+    since = serializers.CharField(required=False)
+    limit = serializers.IntegerField(min_value=1, required=False)
+
+
+class SyncDeletedSerializer(serializers.Serializer):
+    """Serializer for the ids of deleted recipes and tags."""
+    recipes = serializers.ListField(child=serializers.IntegerField())
+    tags = serializers.ListField(child=serializers.IntegerField())
+
+
+class SyncSerializer(serializers.Serializer):
+    """Serializer for the changes since a sync token."""
+    since = serializers.CharField()
+    more = serializers.BooleanField()
+    reset = serializers.BooleanField()
+    recipes = RecipeDetailSerializer(many=True)
+    tags = TagSerializer(many=True)
+    deleted = SyncDeletedSerializer()
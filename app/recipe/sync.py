@@ -0,0 +1,100 @@
+"""
+Incremental sync of recipes and tags from the per-user change log.
+"""
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.db.models import Q
+from django.utils.translation import gettext as _
+
+from rest_framework.exceptions import ValidationError
+
+from core.models import Change, ChangeLog
+from recipe.fast import row_serializer
+
+
+START = (0, 0)
+
+
+def encode_token(position):
+    """Return the sync token of a `(seq, id)` position in the log."""
+    payload = json.dumps(list(position))
+    return urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_token(token):
+    """Return the `(seq, id)` position of a sync token."""
+    try:
+        seq, entry_id = json.loads(urlsafe_b64decode(token.encode()))
+        if not all(isinstance(value, int) and value >= 0
+                   for value in (seq, entry_id)):
+            raise ValueError(token)
+    except (TypeError, ValueError, binascii.Error):
+        raise ValidationError({'since': _('Invalid sync token.')})
+
+    return seq, entry_id
+
+
+def changes_since(user, token, limit, serializers):
+    """Return up to `limit` changes to the user's recipes and tags made
+    after the position of `token`, or all recipes and tags without one.
+
+    `serializers` maps the collections to the serializer classes of their
+    objects. Objects are read as they are now, so an object changed
+    several times is sent once. Clients whose token is older than the
+    compacted tombstones get `reset` and everything, as without a token.
+    """
+    position = decode_token(token) if token else START
+    horizon = ChangeLog.objects.filter(user=user).values_list(
+        'horizon', flat=True
+    ).first() or 0
+    reset = position != START and position[0] < horizon
+    if reset:
+        position = START
+
+    seq, entry_id = position
+    entries = Change.objects.filter(user=user).filter(
+        Q(seq__gt=seq) | Q(seq=seq, id__gt=entry_id)
+    )
+    if position == START:
+        # Nothing to delete on the client yet.
+        entries = entries.filter(deleted=False)
+    entries = list(entries.order_by('seq', 'id').values_list(
+        'seq', 'id', 'collection', 'object_id', 'deleted'
+    )[:limit + 1])
+    more = len(entries) > limit
+    entries = entries[:limit]
+
+    changed = {collection: [] for collection in serializers}
+    deleted = {collection: [] for collection in serializers}
+    for _seq, _id, collection, object_id, is_deleted in entries:
+        if collection in changed:
+            (deleted if is_deleted else changed)[collection].append(object_id)
+
+    data = {
+        'since': encode_token(entries[-1][:2] if entries else position),
+        'more': more,
+        'reset': reset,
+    }
+    for collection, serializer_class in serializers.items():
+        items = {}
+        if changed[collection]:
+            serializer = row_serializer(serializer_class)
+            rows = serializer.values(serializer.model.objects.filter(
+                user=user, id__in=changed[collection]
+            ))
+            items = {
+                item['id']: item for item in serializer.serialize(list(rows))
+            }
+        data[collection] = [
+            items[object_id] for object_id in changed[collection]
+            if object_id in items
+        ]
+        # Objects gone since, or moved to another user, count as deleted.
+        deleted[collection] += [
+            object_id for object_id in changed[collection]
+            if object_id not in items
+        ]
+    data['deleted'] = deleted
+    return data
@@ -2,12 +2,20 @@ from decimal import Decimal
 
 from django.urls import reverse 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+import json
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Recipe
+from core.models import Recipe, Tag
+from core.tests.utils import QueryBudgetMixin, seed_recipes, seed_tags
 
 from recipe.serializers import (
     RecipeSerializer,
@@ -16,6 +24,10 @@ from recipe.serializers import (
 
 
 RECIPE_URL = reverse('recipe:recipe-list')
+SEARCH_URL = reverse('recipe:recipe-search')
+IMPORT_URL = reverse('recipe:recipe-bulk-import')
+EXPORT_URL = reverse('recipe:recipe-export')
+BATCH_URL = reverse('recipe:recipe-batch')
 
 
 def detail_url(recipe_id):
@@ -75,7 +87,7 @@ class PrivateRecipeAPITests(TestCase):
         recipes = Recipe.objects.all().order_by('-id')
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
         
     def test_recipe_list_limited_authenticated_user(self):
         """Test recipe list limited to the authenticated user."""
@@ -90,7 +102,7 @@ class PrivateRecipeAPITests(TestCase):
         recipe = Recipe.objects.filter(user=self.user).order_by('-id')
         serializer = RecipeSerializer(recipe, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
         
     def test_get_recipe_detail(self):
         """Test get recipe detail."""
@@ -193,3 +205,987 @@ class PrivateRecipeAPITests(TestCase):
         
         self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
         self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
+
+    def test_recipe_list_paginated_by_cursor(self):
+        """Test walking the recipe list one page at a time."""
+        recipes = [create_recipe(user=self.user) for _ in range(5)]
+        expected = [recipe.id for recipe in reversed(recipes)]
+
+        seen = []
+        url = RECIPE_URL + '?page_size=2'
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            seen += [item['id'] for item in res.data['results']]
+            url = res.data['next']
+
+        self.assertEqual(seen, expected)
+
+    def test_recipe_list_previous_page(self):
+        """Test the previous link returns to the prior page."""
+        for _ in range(4):
+            create_recipe(user=self.user)
+
+        first = self.client.get(RECIPE_URL, {'page_size': 2})
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+
+        self.assertIsNone(first.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+
+    def test_recipe_list_page_size_capped(self):
+        """Test the requested page size is capped."""
+        for _ in range(3):
+            create_recipe(user=self.user)
+
+        with self.settings(API_MAX_PAGE_SIZE=2):
+            res = self.client.get(RECIPE_URL, {'page_size': 50})
+
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
+
+    def test_recipe_list_skips_offset_and_count(self):
+        """Test deep pages are fetched without OFFSET or COUNT."""
+        for _ in range(3):
+            create_recipe(user=self.user)
+        first = self.client.get(RECIPE_URL, {'page_size': 1})
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first.data['next'])
+
+        sql = ' '.join(query['sql'] for query in queries).upper()
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT(', sql)
+
+    def test_recipe_list_invalid_cursor(self):
+        """Test a malformed cursor returns not found."""
+        res = self.client.get(RECIPE_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_create_recipe_with_new_tags(self):
+        """Test creating a recipe creates its new tags."""
+        payload = {
+            'title': 'Thai Prawn Curry',
+            'time_minutes': 30,
+            'price': Decimal('2.50'),
+            'tags': [{'name': 'Thai'}, {'name': 'Dinner'}],
+        }
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(
+            sorted(tag.name for tag in recipe.tags.all()),
+            ['Dinner', 'Thai'],
+        )
+        self.assertFalse(recipe.tags.exclude(user=self.user).exists())
+
+    def test_create_recipe_with_existing_tag(self):
+        """Test creating a recipe reuses the user's existing tag."""
+        tag_indian = Tag.objects.create(user=self.user, name='Indian')
+        payload = {
+            'title': 'Pongal',
+            'time_minutes': 60,
+            'price': Decimal('4.50'),
+            'tags': [{'name': 'Indian'}, {'name': 'Breakfast'}],
+        }
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertIn(tag_indian, recipe.tags.all())
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_update_recipe_assigns_tags(self):
+        """Test updating a recipe replaces its tags."""
+        tag_breakfast = Tag.objects.create(user=self.user, name='Breakfast')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag_breakfast)
+
+        payload = {'tags': [{'name': 'Lunch'}]}
+        res = self.client.patch(detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [tag.name for tag in recipe.tags.all()], ['Lunch']
+        )
+
+    def test_clear_recipe_tags(self):
+        """Test an empty tag list clears the recipe tags."""
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Dessert'))
+
+        payload = {'tags': []}
+        res = self.client.patch(detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(recipe.tags.count(), 0)
+
+    def test_recipe_list_tag_queries_constant(self):
+        """Test listing tagged recipes runs one query for all tags."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        create_recipe(user=self.user).tags.add(tag)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(RECIPE_URL)
+
+        for _ in range(5):
+            create_recipe(user=self.user).tags.add(tag)
+        with CaptureQueriesContext(connection) as many:
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(res.data['results'][0]['tags'][0]['name'], 'Vegan')
+
+    def test_filter_by_tags_any(self):
+        """Test filtering recipes having any of the tags."""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        spicy = Tag.objects.create(user=self.user, name='Spicy')
+        r1 = create_recipe(user=self.user, title='Thai Vegetable Curry')
+        r1.tags.add(vegan, spicy)
+        r2 = create_recipe(user=self.user, title='Aubergine with Tahini')
+        r2.tags.add(vegan)
+        r3 = create_recipe(user=self.user, title='Fish and chips')
+
+        res = self.client.get(RECIPE_URL, {'tags': f'{vegan.id},{spicy.id}'})
+
+        ids = [item['id'] for item in res.data['results']]
+        self.assertEqual(ids, [r2.id, r1.id])
+        self.assertNotIn(r3.id, ids)
+
+    def test_filter_by_tags_all(self):
+        """Test filtering recipes having all of the tags."""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        spicy = Tag.objects.create(user=self.user, name='Spicy')
+        r1 = create_recipe(user=self.user)
+        r1.tags.add(vegan, spicy)
+        create_recipe(user=self.user).tags.add(vegan)
+
+        params = {'tags': f'{vegan.id},{spicy.id}', 'tags_match': 'all'}
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPE_URL, params)
+
+        self.assertEqual([item['id'] for item in res.data['results']],
+                         [r1.id])
+        sql = next(
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT "core_recipe"')
+        ).upper()
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn('DISTINCT', sql)
+
+    def test_filter_by_price_and_time(self):
+        """Test filtering recipes by price range and time."""
+        cheap = create_recipe(user=self.user, price=Decimal('2.00'))
+        create_recipe(user=self.user, price=Decimal('9.00'))
+        create_recipe(
+            user=self.user, price=Decimal('3.00'), time_minutes=90
+        )
+
+        params = {
+            'price_min': '1.00',
+            'price_max': '5.00',
+            'time_minutes_max': 30,
+        }
+        res = self.client.get(RECIPE_URL, params)
+
+        self.assertEqual([item['id'] for item in res.data['results']],
+                         [cheap.id])
+
+    def test_filter_by_title_prefix(self):
+        """Test filtering recipes by title prefix."""
+        soup = create_recipe(user=self.user, title='Tomato soup')
+        create_recipe(user=self.user, title='Soup of tomato')
+
+        res = self.client.get(RECIPE_URL, {'title_prefix': 'Tomato'})
+
+        self.assertEqual([item['id'] for item in res.data['results']],
+                         [soup.id])
+
+    def test_filter_invalid_params_error(self):
+        """Test malformed filter parameters return an error."""
+        res = self.client.get(RECIPE_URL, {'tags': 'a,b', 'price_min': 'x'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', res.data)
+        self.assertIn('price_min', res.data)
+
+    def test_search_matches_title_and_description(self):
+        """Test searching finds recipes by title or description."""
+        by_title = create_recipe(user=self.user, title='Lemon tart')
+        by_text = create_recipe(
+            user=self.user, title='Fish', description='Served with lemon.'
+        )
+        create_recipe(user=self.user, title='Steak', description='Grilled.')
+
+        res = self.client.get(SEARCH_URL, {'q': 'lemon'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(item['id'] for item in res.data),
+            [by_title.id, by_text.id],
+        )
+        self.assertIn('rank', res.data[0])
+        self.assertIn('snippet', res.data[0])
+
+    def test_search_limited_to_user(self):
+        """Test searching never returns other users' recipes."""
+        other_user = create_user(email='other@example.com', password='pw1234')
+        create_recipe(user=other_user, title='Lemon tart')
+
+        res = self.client.get(SEARCH_URL, {'q': 'lemon'})
+
+        self.assertEqual(res.data, [])
+
+    def test_search_requires_query(self):
+        """Test searching without a query returns an error."""
+        res = self.client.get(SEARCH_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @skipUnless(connection.vendor == 'postgresql', 'PostgreSQL search.')
+    def test_search_ranks_title_matches_first(self):
+        """Test title matches rank above description matches."""
+        by_text = create_recipe(
+            user=self.user, title='Fish', description='Served with lemon.'
+        )
+        by_title = create_recipe(
+            user=self.user, title='Lemon tart', description=''
+        )
+
+        res = self.client.get(SEARCH_URL, {'q': 'lemon'})
+
+        self.assertEqual([item['id'] for item in res.data],
+                         [by_title.id, by_text.id])
+        self.assertIn('<mark>', res.data[1]['snippet'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'PostgreSQL search.')
+    def test_search_tolerates_typos(self):
+        """Test a misspelt query falls back to similar titles."""
+        recipe = create_recipe(user=self.user, title='Spaghetti bolognese')
+
+        res = self.client.get(SEARCH_URL, {'q': 'spagetti bolognase'})
+
+        self.assertEqual([item['id'] for item in res.data], [recipe.id])
+
+    def test_import_ndjson_reports_row_errors(self):
+        """Test importing NDJSON creates valid rows and reports others."""
+        lines = [
+            {'title': 'Soup', 'time_minutes': 10, 'price': '2.50',
+             'tags': [{'name': 'Vegan'}]},
+            {'title': 'Missing price', 'time_minutes': 10},
+            {'title': 'Stew', 'time_minutes': 90, 'price': '4.00',
+             'tags': [{'name': 'Vegan'}, {'name': 'Winter'}]},
+        ]
+        body = '\n'.join(json.dumps(line) for line in lines) + '\n{oops\n'
+
+        with self.settings(RECIPE_BULK_CHUNK_SIZE=2):
+            res = self.client.generic(
+                'POST', IMPORT_URL, body, content_type='application/x-ndjson'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(res.data['failed'], 2)
+        self.assertEqual([error['line'] for error in res.data['errors']],
+                         [2, 4])
+        self.assertIn('price', res.data['errors'][0]['errors'])
+        stew = Recipe.objects.get(user=self.user, title='Stew')
+        self.assertEqual(
+            sorted(tag.name for tag in stew.tags.all()), ['Vegan', 'Winter']
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_import_csv(self):
+        """Test importing recipes from CSV."""
+        body = (
+            'title,time_minutes,price,link,description,tags\n'
+            'Pancakes,15,1.20,,Fluffy,"Breakfast,Sweet"\n'
+        )
+
+        res = self.client.generic(
+            'POST', IMPORT_URL, body, content_type='text/csv'
+        )
+
+        self.assertEqual(res.data['created'], 1)
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(recipe.price, Decimal('1.20'))
+        self.assertEqual(recipe.tags.count(), 2)
+
+    def test_import_invalid_utf8_reports_row_errors(self):
+        """Test lines that are not UTF-8 are reported as row errors."""
+        record = json.dumps(
+            {'title': 'Soup', 'time_minutes': 10, 'price': '2.50'}
+        ).encode()
+        uploads = [
+            (b'\xff\xfe\n' + record + b'\n', 'application/x-ndjson'),
+            (b'title,time_minutes,price\n\xff\xfe,1,1.00\nSoup,10,2.50\n',
+             'text/csv'),
+        ]
+        for body, content_type in uploads:
+            with self.subTest(content_type=content_type):
+                res = self.client.generic(
+                    'POST', IMPORT_URL, body, content_type=content_type
+                )
+
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                self.assertEqual(res.data['created'], 1)
+                self.assertGreaterEqual(res.data['failed'], 1)
+                self.assertEqual(
+                    res.data['errors'][0]['errors'],
+                    {'non_field_errors': ['Malformed record.']},
+                )
+
+    def test_import_unsupported_media_type(self):
+        """Test importing an unknown format is rejected."""
+        res = self.client.generic(
+            'POST', IMPORT_URL, '<xml/>', content_type='application/xml'
+        )
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    def test_export_ndjson_matches_detail(self):
+        """Test exporting streams each recipe as a detail record."""
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        create_recipe(user=create_user(email='o@example.com', password='pw'))
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [json.loads(json.dumps(RecipeDetailSerializer(recipe).data))],
+        )
+
+    def test_export_csv_round_trips(self):
+        """Test an exported CSV can be imported again."""
+        recipe = create_recipe(user=self.user, title='Curry')
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Spicy'))
+
+        res = self.client.get(EXPORT_URL, {'file_format': 'csv'})
+        body = b''.join(res.streaming_content)
+        Recipe.objects.all().delete()
+        self.client.generic('POST', IMPORT_URL, body, content_type='text/csv')
+
+        imported = Recipe.objects.get(user=self.user)
+        self.assertEqual(imported.title, 'Curry')
+        self.assertEqual([tag.name for tag in imported.tags.all()],
+                         ['Spicy'])
+
+    def test_list_not_modified(self):
+        """Test the list answers a matching If-None-Match with 304."""
+        create_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL)
+        etag = res['ETag']
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(cached['ETag'], etag)
+
+    def test_list_etag_changes_on_write(self):
+        """Test creating a recipe invalidates the list ETag."""
+        create_recipe(user=self.user)
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        create_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_list_etag_depends_on_query(self):
+        """Test filtered lists get their own ETag."""
+        create_recipe(user=self.user)
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        res = self.client.get(
+            RECIPE_URL, {'time_minutes_max': 1}, HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_detail_not_modified(self):
+        """Test the detail answers a matching If-None-Match with 304."""
+        recipe = create_recipe(user=self.user)
+        etag = self.client.get(detail_url(recipe.id))['ETag']
+
+        res = self.client.get(detail_url(recipe.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_etag_changes_with_tags(self):
+        """Test tagging or renaming a tag invalidates the detail ETag."""
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        url = detail_url(recipe.id)
+        etag = self.client.get(url)['ETag']
+
+        recipe.tags.add(tag)
+        tagged = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        tag.name = 'Vegetarian'
+        tag.save()
+        renamed = self.client.get(url, HTTP_IF_NONE_MATCH=tagged['ETag'])
+
+        self.assertEqual(tagged.status_code, status.HTTP_200_OK)
+        self.assertEqual(renamed.status_code, status.HTTP_200_OK)
+        self.assertEqual(renamed.data['tags'][0]['name'], 'Vegetarian')
+
+    def test_list_served_from_cache(self):
+        """Test a repeated list request is served from the cache."""
+        create_recipe(user=self.user)
+        first = self.client.get(RECIPE_URL)
+
+        second = self.client.get(RECIPE_URL)
+
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+
+    def test_cache_invalidated_by_writes(self):
+        """Test viewset writes and tag changes bump the cached list."""
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(RECIPE_URL)
+
+        self.client.patch(detail_url(recipe.id), {'title': 'New title'})
+        after_update = self.client.get(RECIPE_URL)
+        recipe.tags.add(tag)
+        after_tagging = self.client.get(RECIPE_URL)
+
+        self.assertEqual(after_update['X-Cache'], 'MISS')
+        self.assertEqual(after_update.data['results'][0]['title'],
+                         'New title')
+        self.assertEqual(after_tagging['X-Cache'], 'MISS')
+        self.assertEqual(after_tagging.data['results'][0]['tags'][0]['name'],
+                         'Vegan')
+
+    def test_cache_invalidated_by_admin(self):
+        """Test a change through the admin bumps the cached detail."""
+        recipe = create_recipe(user=self.user)
+        url = detail_url(recipe.id)
+        admin = get_user_model().objects.create_superuser(
+            'admin@example.com', 'adminpass123'
+        )
+        admin_client = Client()
+        admin_client.force_login(admin)
+
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(url)
+
+        admin_res = admin_client.post(
+            reverse('admin:core_recipe_change', args=[recipe.id]),
+            {
+                'user': self.user.id,
+                'title': 'Renamed by admin',
+                'description': '',
+                'price': '5.30',
+                'time_minutes': 5,
+                'link': '',
+                'tags': [tag.id],
+            },
+        )
+        res = self.client.get(url)
+
+        self.assertEqual(admin_res.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['title'], 'Renamed by admin')
+
+    def test_cache_disabled(self):
+        """Test responses bypass the cache when it is disabled."""
+        create_recipe(user=self.user)
+        options = {'ENABLED': False, 'CACHE': 'api'}
+
+        with self.settings(API_RESPONSE_CACHE=options):
+            self.client.get(RECIPE_URL)
+            res = self.client.get(RECIPE_URL)
+
+        self.assertNotIn('X-Cache', res)
+
+
+class BatchRecipeAPITests(TestCase):
+    """Test updating and deleting recipes in batches."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='test@example.com', password='pass1234')
+        self.client.force_authenticate(self.user)
+        self.recipes = [
+            create_recipe(user=self.user, title=f'Recipe {n}', price=n + 1)
+            for n in range(3)
+        ]
+        other = create_user(email='other@example.com', password='pass1234')
+        self.other_recipe = create_recipe(user=other)
+
+    def assertStatsUpToDate(self):
+        """Assert the recipe stats still match the recipes."""
+        call_command('rebuild_recipe_stats', verify=True, stdout=StringIO())
+
+    def test_batch_update_by_ids(self):
+        """Test updating fields of the listed recipes of the user."""
+        ids = [self.recipes[0].id, self.other_recipe.id, 999999,
+               self.recipes[2].id]
+
+        res = self.client.patch(BATCH_URL, {
+            'ids': ids,
+            'changes': {'price': '9.50', 'time_minutes': 45},
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['matched'], 2)
+        self.assertEqual(res.data['results'], [
+            {'id': ids[0], 'status': 'updated'},
+            {'id': ids[1], 'status': 'not_found'},
+            {'id': ids[2], 'status': 'not_found'},
+            {'id': ids[3], 'status': 'updated'},
+        ])
+        prices = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(
+            [(r.price, r.time_minutes) for r in prices],
+            [(Decimal('9.50'), 45), (Decimal('2.00'), 5),
+             (Decimal('9.50'), 45)],
+        )
+        self.other_recipe.refresh_from_db()
+        self.assertEqual(self.other_recipe.price, Decimal('5.30'))
+        self.assertStatsUpToDate()
+
+    def test_batch_update_by_filter(self):
+        """Test updating the recipes matching list filters."""
+        res = self.client.patch(BATCH_URL, {
+            'filter': {'price_min': '2.00'},
+            'changes': {'link': 'https://example.com/new.pdf'},
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in res.data['results']],
+            [self.recipes[2].id, self.recipes[1].id],
+        )
+        links = dict(Recipe.objects.values_list('id', 'link'))
+        self.assertEqual(links[self.recipes[1].id],
+                         'https://example.com/new.pdf')
+        self.assertNotEqual(links[self.recipes[0].id],
+                            'https://example.com/new.pdf')
+
+    def test_batch_add_and_remove_tags(self):
+        """Test adding and removing tags by name on many recipes."""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipes[0].tags.add(vegan)
+        ids = [recipe.id for recipe in self.recipes[:2]]
+
+        res = self.client.patch(BATCH_URL, {
+            'ids': ids,
+            'add_tags': [{'name': 'Quick'}],
+            'remove_tags': [{'name': 'Vegan'}],
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for recipe in self.recipes[:2]:
+            self.assertEqual(
+                [tag.name for tag in recipe.tags.all()], ['Quick']
+            )
+        self.assertFalse(self.recipes[2].tags.exists())
+        self.assertStatsUpToDate()
+
+    def test_batch_replace_tags(self):
+        """Test replacing the tags of many recipes."""
+        self.recipes[0].tags.add(
+            Tag.objects.create(user=self.user, name='Vegan'),
+            Tag.objects.create(user=self.user, name='Quick'),
+        )
+        ids = [recipe.id for recipe in self.recipes]
+
+        self.client.patch(BATCH_URL, {
+            'ids': ids,
+            'tags': [{'name': 'Quick'}, {'name': 'Winter'}],
+        }, format='json')
+
+        for recipe in self.recipes:
+            self.assertEqual(
+                sorted(tag.name for tag in recipe.tags.all()),
+                ['Quick', 'Winter'],
+            )
+        self.assertStatsUpToDate()
+
+    def test_batch_update_visible_in_list(self):
+        """Test the cached list shows the changes of a batch."""
+        self.client.get(RECIPE_URL)
+
+        self.client.patch(BATCH_URL, {
+            'ids': [self.recipes[0].id],
+            'changes': {'title': 'Renamed'},
+            'add_tags': [{'name': 'Quick'}],
+        }, format='json')
+
+        res = self.client.get(RECIPE_URL)
+        first = res.data['results'][-1]
+        self.assertEqual(first['title'], 'Renamed')
+        self.assertEqual([tag['name'] for tag in first['tags']], ['Quick'])
+
+    def test_batch_delete(self):
+        """Test deleting recipes with their tag links."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipes[0].tags.add(tag)
+        ids = [self.recipes[0].id, self.recipes[1].id, self.other_recipe.id]
+
+        res = self.client.delete(BATCH_URL, {'ids': ids}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['status'] for item in res.data['results']],
+            ['deleted', 'deleted', 'not_found'],
+        )
+        self.assertEqual(
+            list(Recipe.objects.values_list('id', flat=True).order_by('id')),
+            [self.recipes[2].id, self.other_recipe.id],
+        )
+        self.assertFalse(Recipe.tags.through.objects.exists())
+        self.assertTrue(Tag.objects.filter(id=tag.id).exists())
+        self.assertStatsUpToDate()
+
+    def test_batch_delete_unlinks_every_relation(self):
+        """Test only the tag links reference recipes.
+
+        Batch deletes unlink the tags and skip the collector, a new model
+        pointing at recipes must be cleared by `delete_recipes` too.
+        """
+        relations = [
+            field.related_model
+            for field in Recipe._meta.get_fields(include_hidden=True)
+            if field.auto_created and not field.concrete
+        ]
+
+        self.assertEqual(relations, [Recipe.tags.through])
+
+    def test_batch_requires_ids_or_filter(self):
+        """Test a batch selects recipes by ids or filter, not both."""
+        for payload in [{}, {'ids': [1], 'filter': {'price_min': '1'}}]:
+            res = self.client.delete(BATCH_URL, payload, format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_batch_update_requires_change(self):
+        """Test a batch update without changes is rejected."""
+        res = self.client.patch(
+            BATCH_URL, {'ids': [self.recipes[0].id]}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_batch_size_limited(self):
+        """Test batches larger than RECIPE_BATCH_MAX_SIZE are rejected."""
+        with self.settings(RECIPE_BATCH_MAX_SIZE=2):
+            by_ids = self.client.delete(
+                BATCH_URL, {'ids': [1, 2, 3]}, format='json'
+            )
+            by_filter = self.client.delete(
+                BATCH_URL, {'filter': {}}, format='json'
+            )
+
+        self.assertEqual(by_ids.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ids', by_ids.data)
+        self.assertEqual(by_filter.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('filter', by_filter.data)
+        self.assertEqual(Recipe.objects.count(), 4)
+
+    def test_invalid_filter_rejected(self):
+        """Test invalid filter values are reported under filter."""
+        res = self.client.delete(
+            BATCH_URL, {'filter': {'price_min': 'cheap'}}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('price_min', res.data['filter'])
+
+
+class RecipeQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test recipe endpoints run as many queries whatever the data size."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='test@example.com', password='pass1234')
+        self.client.force_authenticate(self.user)
+
+    def seed(self, count):
+        """Give the user `count` recipes and tags."""
+        self.recipes = seed_recipes(self.user, count, tags_per_recipe=3)
+
+    def seed_tagged_recipe(self, count):
+        """Give the first recipe `count` tags."""
+        self.seed(1)
+        self.recipes[0].tags.add(*seed_tags(self.user, count).values())
+
+    def test_list(self):
+        """Test listing recipes."""
+        self.assertConstantQueries(
+            lambda: self.client.get(RECIPE_URL), self.seed, budget=3
+        )
+
+    def test_list_filtered(self):
+        """Test listing recipes filtered by tags and price."""
+        self.assertConstantQueries(
+            lambda: self.client.get(RECIPE_URL, {
+                'tags': ','.join(
+                    str(tag.id) for tag in Tag.objects.filter(user=self.user)
+                ),
+                'price_max': '100',
+            }),
+            self.seed,
+            budget=4,
+        )
+
+    def test_search(self):
+        """Test searching recipes."""
+        self.assertConstantQueries(
+            lambda: self.client.get(SEARCH_URL, {'q': 'recipe'}),
+            self.seed,
+            budget=2,
+        )
+
+    def test_detail(self):
+        """Test retrieving a recipe with many tags."""
+        self.assertConstantQueries(
+            lambda: self.client.get(detail_url(self.recipes[0].id)),
+            self.seed_tagged_recipe,
+            budget=6,
+        )
+
+    def test_create_with_tags(self):
+        """Test creating a recipe with new and existing tags."""
+        def seed(count):
+            self.seed(count)
+            self.payload = {
+                'title': 'New recipe',
+                'time_minutes': 10,
+                'price': '2.50',
+                'tags': [{'name': 'Tag 0'}] + [
+                    {'name': f'New tag {count} {n}'} for n in range(count)
+                ],
+            }
+
+        self.assertConstantQueries(
+            lambda: self.client.post(RECIPE_URL, self.payload, format='json'),
+            seed,
+            budget=26,
+        )
+
+    def test_update_tags(self):
+        """Test replacing the tags of a recipe."""
+        def seed(count):
+            self.seed_tagged_recipe(count)
+            self.payload = {
+                'title': 'Updated recipe',
+                'tags': [{'name': f'Other tag {n}'} for n in range(count)],
+            }
+
+        self.assertConstantQueries(
+            lambda: self.client.patch(
+                detail_url(self.recipes[0].id), self.payload, format='json'
+            ),
+            seed,
+            budget=36,
+        )
+
+    def test_batch_update(self):
+        """Test updating fields and tags of many recipes at once."""
+        def seed(count):
+            self.seed(count)
+            self.payload = {
+                'ids': [recipe.id for recipe in self.recipes],
+                'changes': {'price': '3.00'},
+                'add_tags': [{'name': f'New tag {count}'}],
+                'remove_tags': [{'name': 'Tag 0'}],
+            }
+
+        self.assertConstantQueries(
+            lambda: self.client.patch(BATCH_URL, self.payload, format='json'),
+            seed,
+            budget=26,
+        )
+
+    def test_batch_delete(self):
+        """Test deleting many recipes at once."""
+        def seed(count):
+            self.seed(count)
+            self.payload = {'ids': [recipe.id for recipe in self.recipes]}
+
+        self.assertConstantQueries(
+            lambda: self.client.delete(BATCH_URL, self.payload, format='json'),
+            seed,
+            budget=12,
+        )
+
+
+class FastListTests(TestCase):
+    """Test the fast list path renders the same bytes."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='test@example.com', password='pass1234')
+        self.client.force_authenticate(self.user)
+        vegan = Tag.objects.create(
+            user=self.user, name='Vegan \u2028 caf\u00e9'
+        )
+        dessert = Tag.objects.create(user=self.user, name='Dessert "sweet"')
+        for number, price in enumerate(['0.10', '5.30', '999.99']):
+            recipe = create_recipe(
+                user=self.user,
+                title=f'R\u00e9cipe {number}\n',
+                price=Decimal(price),
+                link='' if number else 'https://example.com/\u2029',
+            )
+            recipe.tags.add(dessert, vegan)
+        create_recipe(user=self.user, title='No tags')
+
+    def assertSameContent(self, url, params=None):
+        """Assert the fast and the regular list render the same bytes."""
+        options = {'ENABLED': False, 'CACHE': 'api'}
+        with self.settings(API_RESPONSE_CACHE=options):
+            fast = self.client.get(url, params)
+            with self.settings(API_FAST_SERIALIZERS=False):
+                regular = self.client.get(url, params)
+
+        self.assertEqual(fast.status_code, status.HTTP_200_OK)
+        self.assertEqual(fast.content, regular.content)
+        return fast
+
+    def test_recipe_list(self):
+        """Test recipe pages are unchanged, nested tags included."""
+        res = self.assertSameContent(RECIPE_URL)
+
+        self.assertEqual(len(res.data['results']), 4)
+        self.assertEqual(res.data['results'][0]['tags'], [])
+
+    def test_recipe_list_filtered_and_paginated(self):
+        """Test filtered pages and their cursors are unchanged."""
+        params = {'price_max': '100', 'page_size': 1}
+        res = self.assertSameContent(RECIPE_URL, params)
+
+        cursor = res.data['next'].split('cursor=')[1].split('&')[0]
+        self.assertSameContent(RECIPE_URL, dict(params, cursor=cursor))
+
+    def test_tag_list(self):
+        """Test tag pages are unchanged."""
+        self.assertSameContent(reverse('recipe:tag-list'))
+
+    def test_recipe_detail(self):
+        """Test the detail rendered with orjson is unchanged."""
+        recipe = Recipe.objects.filter(user=self.user).first()
+
+        self.assertSameContent(detail_url(recipe.id))
+
+    def test_indented_response(self):
+        """Test indented JSON is left to the regular renderer."""
+        res = self.client.get(
+            RECIPE_URL, HTTP_ACCEPT='application/json; indent=2'
+        )
+
+        self.assertIn(b'\n  "next"', res.content)
+
+
+class SparseFieldsTests(TestCase):
+    """Test limiting recipe fields with the fields and omit parameters."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='test@example.com', password='pass1234')
+        self.client.force_authenticate(self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        for number in range(3):
+            create_recipe(
+                user=self.user, title=f'Recipe {number}'
+            ).tags.add(tag)
+
+    def get(self, url, params):
+        """Return the response and the SQL of the queries it ran."""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res, ' '.join(query['sql'] for query in queries)
+
+    def test_list_fields(self):
+        """Test the list only selects and returns the chosen fields."""
+        for fast in [True, False]:
+            with self.settings(API_FAST_SERIALIZERS=fast):
+                res, sql = self.get(RECIPE_URL, {'fields': 'title, id'})
+
+            item = res.data['results'][0]
+            self.assertEqual(list(item), ['id', 'title'])
+            self.assertEqual(item['title'], 'Recipe 2')
+            self.assertNotIn('"link"', sql)
+            self.assertNotIn('core_recipe_tags', sql)
+
+    def test_list_omit(self):
+        """Test omitted fields are left out of the list."""
+        res, sql = self.get(RECIPE_URL, {'omit': 'tags,link'})
+
+        self.assertEqual(
+            list(res.data['results'][0]),
+            ['id', 'title', 'time_minutes', 'price'],
+        )
+        self.assertNotIn('core_recipe_tags', sql)
+
+    def test_list_paginated_without_ordering_field(self):
+        """Test cursors work when the id is not returned."""
+        params = {'fields': 'title', 'page_size': 2}
+        res = self.client.get(RECIPE_URL, params)
+        cursor = res.data['next'].split('cursor=')[1].split('&')[0]
+
+        res = self.client.get(RECIPE_URL, dict(params, cursor=cursor))
+
+        self.assertEqual(res.data['results'], [{'title': 'Recipe 0'}])
+
+    def test_detail_fields(self):
+        """Test the detail only loads the chosen fields."""
+        recipe = Recipe.objects.filter(user=self.user).first()
+
+        res, sql = self.get(
+            detail_url(recipe.id), {'fields': 'description,tags'}
+        )
+
+        self.assertEqual(res.data['description'], recipe.description)
+        self.assertEqual(res.data['tags'], [{'id': recipe.tags.get().id,
+                                             'name': 'Vegan'}])
+        self.assertEqual(len(res.data), 2)
+        self.assertNotIn('"link"', sql)
+
+    def test_detail_etag_depends_on_fields(self):
+        """Test each selection of fields gets its own detail ETag."""
+        url = detail_url(Recipe.objects.filter(user=self.user).first().id)
+        etag = self.client.get(url)['ETag']
+
+        res = self.client.get(url, {'fields': 'id'}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(res.data), ['id'])
+
+    def test_search_fields(self):
+        """Test search results can be limited too."""
+        res = self.client.get(SEARCH_URL, {'q': 'Recipe', 'fields': 'title'})
+
+        self.assertEqual(res.data[0], {'title': 'Recipe 2'})
+
+    def test_invalid_fields(self):
+        """Test unknown or no fields are rejected."""
+        for params in [{'fields': 'id,secret'}, {'omit': 'user'},
+                       {'fields': 'id', 'omit': 'id'}]:
+            res = self.client.get(RECIPE_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ignored_on_writes(self):
+        """Test updates return the full recipe whatever the parameters."""
+        recipe = Recipe.objects.filter(user=self.user).first()
+
+        res = self.client.patch(
+            f'{detail_url(recipe.id)}?fields=id', {'title': 'New'}
+        )
+
+        self.assertEqual(res.data['title'], 'New')
+        self.assertIn('description', res.data)
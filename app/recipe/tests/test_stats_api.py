@@ -0,0 +1,229 @@
+"""
+Tests for the recipe stats API.
+"""
+import json
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, RecipeStats, Tag, TagStats
+from core.tests.utils import QueryBudgetMixin, seed_recipes
+
+
+STATS_URL = reverse('recipe:recipe-stats')
+RECIPE_URL = reverse('recipe:recipe-list')
+IMPORT_URL = reverse('recipe:recipe-bulk-import')
+
+
+def detail_url(recipe_id):
+    """Return url for recipe detail."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """Create and return a user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+def tag_counts(data):
+    """Return the recipe count of each tag in a stats response by name."""
+    return {tag['name']: tag['recipe_count'] for tag in data['tags']}
+
+
+class PublicStatsAPITests(TestCase):
+    """Test unauthenticated stats requests."""
+
+    def test_auth_required(self):
+        """Test authentication is required for the stats."""
+        res = APIClient().get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateStatsAPITests(TestCase):
+    """Test the stats follow changes to recipes and tags."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def create(self, **payload):
+        """Create a recipe through the API and return its id."""
+        payload = {'title': 'Recipe', 'time_minutes': 10, 'price': '5.00',
+                   **payload}
+        res = self.client.post(RECIPE_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data['id']
+
+    def assertStatsUpToDate(self):
+        """Assert the stored stats match the recipes."""
+        call_command('rebuild_recipe_stats', verify=True, stdout=StringIO())
+
+    def test_no_recipes(self):
+        """Test the stats of a user without recipes."""
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {
+            'recipe_count': 0,
+            'average_price': None,
+            'average_time_minutes': None,
+            'tags': [],
+        })
+
+    def test_created_recipes_counted(self):
+        """Test the count, averages and tags of created recipes."""
+        self.create(price='4.00', time_minutes=10,
+                    tags=[{'name': 'Vegan'}, {'name': 'Quick'}])
+        self.create(price='5.25', time_minutes=25, tags=[{'name': 'Vegan'}])
+        self.create(price='1.00', time_minutes=5)
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipe_count'], 3)
+        self.assertEqual(res.data['average_price'], '3.42')
+        self.assertEqual(res.data['average_time_minutes'], 13.33)
+        self.assertEqual(
+            [(tag['name'], tag['recipe_count']) for tag in res.data['tags']],
+            [('Vegan', 2), ('Quick', 1)],
+        )
+        self.assertStatsUpToDate()
+
+    def test_updated_recipe_counted(self):
+        """Test updating a recipe replaces its values and tags."""
+        recipe_id = self.create(price='4.00', tags=[{'name': 'Vegan'}])
+
+        self.client.patch(detail_url(recipe_id), {
+            'price': '6.00',
+            'time_minutes': 30,
+            'tags': [{'name': 'Winter'}],
+        }, format='json')
+
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res.data['recipe_count'], 1)
+        self.assertEqual(res.data['average_price'], '6.00')
+        self.assertEqual(res.data['average_time_minutes'], 30)
+        self.assertEqual(tag_counts(res.data), {'Winter': 1})
+        self.assertStatsUpToDate()
+
+    def test_deleted_recipe_uncounted(self):
+        """Test deleting a recipe removes it from the stats."""
+        recipe_id = self.create(price='4.00', tags=[{'name': 'Vegan'}])
+        self.create(price='2.00', time_minutes=20, tags=[{'name': 'Vegan'}])
+
+        self.client.delete(detail_url(recipe_id))
+
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res.data['recipe_count'], 1)
+        self.assertEqual(res.data['average_price'], '2.00')
+        self.assertEqual(tag_counts(res.data), {'Vegan': 1})
+        self.assertStatsUpToDate()
+
+    def test_tag_links_changed_from_tag(self):
+        """Test changing the recipes of a tag from the tag side."""
+        first = self.create(tags=[{'name': 'Vegan'}])
+        second = self.create()
+        tag = Tag.objects.get(user=self.user, name='Vegan')
+
+        tag.recipe_set.add(first, second)
+        tag.recipe_set.remove(first)
+        self.assertEqual(tag_counts(self.client.get(STATS_URL).data),
+                         {'Vegan': 1})
+
+        tag.recipe_set.clear()
+        self.assertEqual(self.client.get(STATS_URL).data['tags'], [])
+        self.assertStatsUpToDate()
+
+    def test_removing_unlinked_tag_ignored(self):
+        """Test removing a tag a recipe does not have changes nothing."""
+        recipe = Recipe.objects.get(id=self.create(tags=[{'name': 'Vegan'}]))
+        other = Tag.objects.create(user=self.user, name='Winter')
+
+        recipe.tags.remove(other)
+        recipe.tags.clear()
+        recipe.tags.clear()
+
+        self.assertEqual(self.client.get(STATS_URL).data['tags'], [])
+        self.assertStatsUpToDate()
+
+    def test_deleted_tag_dropped(self):
+        """Test a deleted tag leaves the stats."""
+        self.create(tags=[{'name': 'Vegan'}, {'name': 'Quick'}])
+
+        Tag.objects.filter(name='Quick').delete()
+
+        self.assertEqual(tag_counts(self.client.get(STATS_URL).data),
+                         {'Vegan': 1})
+        self.assertStatsUpToDate()
+
+    def test_imported_recipes_counted(self):
+        """Test recipes created by a bulk import are counted."""
+        self.create(price='3.00', tags=[{'name': 'Vegan'}])
+        body = '\n'.join(json.dumps(record) for record in [
+            {'title': 'Soup', 'time_minutes': 10, 'price': '2.00',
+             'tags': [{'name': 'Vegan'}, {'name': 'Winter'}]},
+            {'title': 'Stew', 'time_minutes': 40, 'price': '7.00',
+             'tags': [{'name': 'Winter'}]},
+        ])
+
+        self.client.generic(
+            'POST', IMPORT_URL, body, content_type='application/x-ndjson'
+        )
+
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res.data['recipe_count'], 3)
+        self.assertEqual(res.data['average_price'], '4.00')
+        self.assertEqual(tag_counts(res.data), {'Vegan': 2, 'Winter': 2})
+        self.assertStatsUpToDate()
+
+    def test_missing_stats_computed(self):
+        """Test a change computes stats which were never stored."""
+        self.create(price='3.00', tags=[{'name': 'Vegan'}])
+        RecipeStats.objects.all().delete()
+        TagStats.objects.all().delete()
+
+        self.create(price='5.00', tags=[{'name': 'Vegan'}])
+
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res.data['recipe_count'], 2)
+        self.assertEqual(res.data['average_price'], '4.00')
+        self.assertEqual(tag_counts(res.data), {'Vegan': 2})
+
+    def test_stats_limited_to_user(self):
+        """Test the stats only count the user's own recipes."""
+        self.create(tags=[{'name': 'Vegan'}])
+        other = create_user('other@example.com')
+        Recipe.objects.create(
+            user=other, title='Other', time_minutes=5, price=Decimal('9.00')
+        )
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipe_count'], 1)
+        self.assertEqual(res.data['average_price'], '5.00')
+
+
+class StatsQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test the stats take as many queries whatever the number of recipes."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def test_stats(self):
+        """Test reading the stats."""
+        self.assertConstantQueries(
+            lambda: self.client.get(STATS_URL),
+            lambda count: seed_recipes(self.user, count, tags_per_recipe=2),
+            sizes=(1, 100),
+            budget=2,
+        )
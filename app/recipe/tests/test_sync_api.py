@@ -0,0 +1,313 @@
+"""
+Tests for the incremental sync API.
+"""
+import json
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Change, ChangeLog, Recipe, Tag
+from core.renderers import FastJSONRenderer
+from core.tests.utils import QueryBudgetMixin, seed_recipes
+
+
+SYNC_URL = reverse('recipe:sync')
+RECIPE_URL = reverse('recipe:recipe-list')
+IMPORT_URL = reverse('recipe:recipe-bulk-import')
+BATCH_URL = reverse('recipe:recipe-batch')
+
+
+def detail_url(recipe_id):
+    """Return url for recipe detail."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def tag_url(tag_id):
+    """Return url for tag detail."""
+    return reverse('recipe:tag-detail', args=[tag_id])
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """Create and return a user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+class PublicSyncAPITests(TestCase):
+    """Test unauthenticated sync requests."""
+
+    def test_auth_required(self):
+        """Test authentication is required to sync."""
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateSyncAPITests(TestCase):
+    """Test syncing changes to recipes and tags."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def create(self, title='Recipe', tags=()):
+        """Create a recipe through the API and return its id."""
+        res = self.client.post(RECIPE_URL, {
+            'title': title,
+            'time_minutes': 10,
+            'price': '5.00',
+            'tags': [{'name': name} for name in tags],
+        }, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data['id']
+
+    def sync(self, since=None, **params):
+        """Return the data of a sync since the token `since`."""
+        if since is not None:
+            params['since'] = since
+        res = self.client.get(SYNC_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK, res.data)
+        return res.data
+
+    def test_initial_sync(self):
+        """Test a sync without a token returns everything."""
+        recipe_id = self.create(tags=['Vegan'])
+        other = create_user('other@example.com')
+        Recipe.objects.create(
+            user=other, title='Other', time_minutes=1, price='1.00'
+        )
+
+        data = self.sync()
+
+        self.assertEqual(
+            [recipe['id'] for recipe in data['recipes']], [recipe_id]
+        )
+        self.assertEqual(
+            data['recipes'][0],
+            self.client.get(detail_url(recipe_id)).data,
+        )
+        self.assertEqual([tag['name'] for tag in data['tags']], ['Vegan'])
+        self.assertEqual(data['deleted'], {'recipes': [], 'tags': []})
+        self.assertFalse(data['more'])
+        self.assertFalse(data['reset'])
+
+    def test_recipes_match_detail(self):
+        """Test synced recipes render as the detail, key order included."""
+        recipe_id = self.create(tags=['Vegan', 'Dessert'])
+        Recipe.objects.filter(id=recipe_id).update(description='Sweet')
+
+        data = self.sync()
+        res = self.client.get(detail_url(recipe_id))
+
+        self.assertEqual(
+            FastJSONRenderer().render(data['recipes'][0]), res.content
+        )
+
+    def test_nothing_changed(self):
+        """Test a sync with the last token returns no changes."""
+        self.create(tags=['Vegan'])
+        since = self.sync()['since']
+
+        data = self.sync(since)
+
+        self.assertEqual(data['recipes'], [])
+        self.assertEqual(data['tags'], [])
+        self.assertEqual(data['since'], since)
+
+    def test_changes_since_token(self):
+        """Test only objects changed after the token are returned."""
+        first = self.create(title='First')
+        second = self.create(title='Second')
+        since = self.sync()['since']
+
+        self.client.patch(detail_url(first), {'title': 'Changed'})
+        self.client.patch(detail_url(first), {'title': 'Changed again'})
+        data = self.sync(since)
+
+        self.assertEqual(
+            [(recipe['id'], recipe['title']) for recipe in data['recipes']],
+            [(first, 'Changed again')],
+        )
+        self.assertNotEqual(first, second)
+
+    def test_tombstones(self):
+        """Test deleted recipes and tags are reported by id."""
+        recipe_id = self.create(tags=['Vegan'])
+        tag = Tag.objects.get(user=self.user)
+        tag_id = tag.id
+        since = self.sync()['since']
+
+        self.client.delete(detail_url(recipe_id))
+        tag.delete()
+        data = self.sync(since)
+
+        self.assertEqual(
+            data['deleted'], {'recipes': [recipe_id], 'tags': [tag_id]}
+        )
+        self.assertEqual(data['recipes'], [])
+        self.assertEqual(self.sync()['deleted'], {'recipes': [], 'tags': []})
+
+    def test_tag_changes_log_recipes(self):
+        """Test recipes are sent again when their tags change."""
+        recipe_id = self.create(tags=['Vegan'])
+        tag = Tag.objects.get(user=self.user)
+        since = self.sync()['since']
+
+        self.client.patch(tag_url(tag.id), {'name': 'Vegetarian'})
+        data = self.sync(since)
+
+        self.assertEqual([item['name'] for item in data['tags']],
+                         ['Vegetarian'])
+        self.assertEqual(data['recipes'][0]['id'], recipe_id)
+        self.assertEqual(data['recipes'][0]['tags'][0]['name'], 'Vegetarian')
+
+        since = data['since']
+        Tag.objects.create(user=self.user, name='Dessert').recipe_set.add(
+            recipe_id
+        )
+        data = self.sync(since)
+
+        self.assertEqual(data['recipes'][0]['id'], recipe_id)
+        self.assertEqual(len(data['recipes'][0]['tags']), 2)
+
+    def test_paged(self):
+        """Test changes are paged by `limit` with the returned tokens."""
+        ids = {self.create(title=f'Recipe {number}') for number in range(5)}
+
+        seen = set()
+        data = {'since': None, 'more': True}
+        while data['more']:
+            data = self.sync(data['since'], limit=2)
+            self.assertLessEqual(len(data['recipes']), 2)
+            seen.update(recipe['id'] for recipe in data['recipes'])
+
+        self.assertEqual(seen, ids)
+
+    def test_bulk_changes_logged(self):
+        """Test imports and batch changes are logged."""
+        self.client.post(
+            IMPORT_URL,
+            '\n'.join(json.dumps({
+                'title': f'Imported {number}',
+                'time_minutes': 5,
+                'price': '1.00',
+                'tags': [{'name': 'Bulk'}],
+            }) for number in range(3)),
+            content_type='application/x-ndjson',
+        )
+        data = self.sync()
+        ids = sorted(recipe['id'] for recipe in data['recipes'])
+        self.assertEqual(len(ids), 3)
+        self.assertEqual([tag['name'] for tag in data['tags']], ['Bulk'])
+
+        self.client.patch(BATCH_URL, {
+            'ids': ids[:2], 'changes': {'time_minutes': 9},
+        }, format='json')
+        self.client.delete(BATCH_URL, {'ids': ids[2:]}, format='json')
+        data = self.sync(data['since'])
+
+        self.assertEqual(
+            sorted(recipe['id'] for recipe in data['recipes']), ids[:2]
+        )
+        self.assertEqual(data['deleted']['recipes'], ids[2:])
+
+    def test_reset_after_compaction(self):
+        """Test clients older than compacted tombstones start over."""
+        kept = self.create(title='Kept')
+        deleted = [self.create(title=f'Gone {number}') for number in range(2)]
+        since = self.sync()['since']
+        for recipe_id in deleted:
+            self.client.delete(detail_url(recipe_id))
+
+        dropped = ChangeLog.objects.compact(
+            timezone.now() + timedelta(seconds=1)
+        )
+        data = self.sync(since)
+
+        self.assertEqual(dropped, 1)
+        self.assertTrue(data['reset'])
+        self.assertEqual([recipe['id'] for recipe in data['recipes']], [kept])
+        self.assertEqual(data['deleted']['recipes'], [])
+
+    def test_invalid_token(self):
+        """Test a malformed token is rejected."""
+        res = self.client.get(SYNC_URL, {'since': 'not a token'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ChangeLogTests(TestCase):
+    """Test the change log keeps one entry per object."""
+
+    def test_compacted_by_object(self):
+        """Test repeated changes move the entry of the object."""
+        user = create_user()
+        recipe = Recipe.objects.create(
+            user=user, title='Recipe', time_minutes=1, price='1.00'
+        )
+        for number in range(3):
+            recipe.title = f'Title {number}'
+            recipe.save()
+
+        entry = Change.objects.get(user=user)
+        self.assertEqual(entry.seq, 4)
+        self.assertEqual(ChangeLog.objects.get(user=user).seq, 4)
+
+    def test_delete_user(self):
+        """Test deleting a user with a change log."""
+        user = create_user()
+        seed_recipes(user, 3)
+
+        user.delete()
+
+        self.assertFalse(Change.objects.exists())
+
+    def test_compact_command(self):
+        """Test the command drops the tombstones older than --days."""
+        user = create_user()
+        recipes = list(seed_recipes(user, 3))
+        ids = [recipe.id for recipe in recipes]
+        for recipe in recipes:
+            recipe.delete()
+        tombstones = Change.objects.filter(collection='recipes')
+        tombstones.filter(object_id__in=ids[:2]).update(
+            changed_at=timezone.now() - timedelta(days=40)
+        )
+        out = StringIO()
+
+        call_command('compact_change_log', days=30, stdout=out)
+
+        # The last old tombstone is kept as the horizon.
+        self.assertIn('Dropped 1 tombstones.', out.getvalue())
+        self.assertEqual(
+            sorted(tombstones.values_list('object_id', flat=True)), ids[1:]
+        )
+        self.assertEqual(
+            ChangeLog.objects.get(user=user).horizon,
+            tombstones.get(object_id=ids[1]).seq,
+        )
+
+
+class SyncQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test syncing runs as many queries whatever the number of changes."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def test_sync(self):
+        """Test a sync of recipes and tags."""
+        self.assertConstantQueries(
+            lambda: self.client.get(SYNC_URL),
+            lambda count: seed_recipes(self.user, count, count),
+            budget=5,
+        )
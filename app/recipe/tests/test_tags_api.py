@@ -8,11 +8,13 @@ from rest_framework.test import APIClient
 from rest_framework import status 
 
 from core.models import Tag
+from core.tests.utils import QueryBudgetMixin, seed_recipes, seed_tags
 
 from recipe.serializers import TagSerializer
 
 
 TAG_URL = reverse('recipe:tag-list')
+RECIPE_URL = reverse('recipe:recipe-list')
 
 
 def detail_url(tag_id):
@@ -54,7 +56,7 @@ class PrivateTagAPITests(TestCase):
         tags = Tag.objects.all().order_by('-name')
         serializer = TagSerializer(tags, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
         
     def test_tag_access_limited_to_user(self):
         """Test tag for only limited to the user who created."""
@@ -66,9 +68,9 @@ class PrivateTagAPITests(TestCase):
         res = self.client.get(TAG_URL)
         
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
-        self.assertEqual(res.data[0]['id'], tag.id)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
+        self.assertEqual(res.data['results'][0]['id'], tag.id)
         
     def test_update_tag(self):
         """Test tag on updating with tag id."""
@@ -81,3 +83,118 @@ class PrivateTagAPITests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         tag.refresh_from_db()
         self.assertEqual(tag.name, payload['name'])
+
+    def test_tags_paginated_by_name(self):
+        """Test walking the tag list one page at a time."""
+        for name in ['Vegan', 'Dessert', 'Breakfast', 'Spicy']:
+            Tag.objects.create(user=self.user, name=name)
+
+        names = []
+        url = TAG_URL + '?page_size=3'
+        while url:
+            res = self.client.get(url)
+            names += [item['name'] for item in res.data['results']]
+            url = res.data['next']
+
+        self.assertEqual(names, ['Vegan', 'Spicy', 'Dessert', 'Breakfast'])
+
+    def test_tags_sparse_fields(self):
+        """Test the tag list can be limited to the names."""
+        Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name='Dessert')
+
+        res = self.client.get(TAG_URL, {'fields': 'name', 'page_size': 1})
+        following = self.client.get(res.data['next'])
+
+        self.assertEqual(res.data['results'], [{'name': 'Vegan'}])
+        self.assertEqual(following.data['results'], [{'name': 'Dessert'}])
+
+    def test_update_tag_duplicate_name_error(self):
+        """Test renaming a tag to an existing name returns an error."""
+        Tag.objects.create(user=self.user, name='Dessert')
+        tag = Tag.objects.create(user=self.user, name='After Dinner')
+
+        res = self.client.patch(detail_url(tag.id), {'name': 'Dessert'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_tags_not_modified_until_changed(self):
+        """Test the tag list ETag holds until a tag changes."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        etag = self.client.get(TAG_URL)['ETag']
+
+        cached = self.client.get(TAG_URL, HTTP_IF_NONE_MATCH=etag)
+        self.client.patch(detail_url(tag.id), {'name': 'Vegetarian'})
+        changed = self.client.get(TAG_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+
+    def test_tags_etag_changes_with_nested_tags(self):
+        """Test tags created through a recipe invalidate the list ETag."""
+        Tag.objects.create(user=self.user, name='Vegan')
+        etag = self.client.get(TAG_URL)['ETag']
+
+        self.client.post(RECIPE_URL, {
+            'title': 'Soup',
+            'time_minutes': 10,
+            'price': '2.50',
+            'tags': [{'name': 'Winter'}],
+        }, format='json')
+        res = self.client.get(TAG_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(tag['name'] for tag in res.data['results']),
+            ['Vegan', 'Winter'],
+        )
+
+    def test_tags_cache_invalidated_by_nested_tags(self):
+        """Test tags created through a recipe are not served from cache."""
+        Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(TAG_URL)
+
+        self.client.post(RECIPE_URL, {
+            'title': 'Soup',
+            'time_minutes': 10,
+            'price': '2.50',
+            'tags': [{'name': 'Winter'}],
+        }, format='json')
+        res = self.client.get(TAG_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(
+            sorted(tag['name'] for tag in res.data['results']),
+            ['Vegan', 'Winter'],
+        )
+
+
+class TagQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test tag endpoints run as many queries whatever the data size."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def seed(self, count):
+        """Give the user `count` recipes and tags."""
+        self.tags = list(seed_tags(self.user, count).values())
+        seed_recipes(self.user, count, tags_per_recipe=count)
+
+    def test_list(self):
+        """Test listing tags."""
+        self.assertConstantQueries(
+            lambda: self.client.get(TAG_URL), self.seed, budget=2
+        )
+
+    def test_update(self):
+        """Test renaming a tag."""
+        self.assertConstantQueries(
+            lambda: self.client.patch(
+                detail_url(self.tags[0].id),
+                {'name': f'Renamed {len(self.tags)}'},
+            ),
+            self.seed,
+            budget=10,
+        )
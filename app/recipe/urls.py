@@ -1,6 +1,7 @@
 """
 URL mappings for the recipe app.
 """
+from django.conf import settings
 from django.urls import (
     path,
     include,
@@ -8,10 +9,11 @@ from django.urls import (
 
 from rest_framework.routers import DefaultRouter
 
+from core.asynchronous import AsyncRouter
 from recipe import views
 
 
-router = DefaultRouter()
+router = AsyncRouter() if settings.API_ASYNC_VIEWS else DefaultRouter()
 router.register('recipes', views.RecipeViewSet)
 router.register('tags', views.TagViewSet)
 
@@ -19,6 +21,7 @@ app_name = 'recipe'
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('sync/', views.SyncView.as_view(), name='sync'),
 ]
 
 
@@ -1,46 +1,423 @@
 """
 Views for the recipe APIs
 """
-from rest_framework import viewsets, mixins
-from rest_framework.authentication import TokenAuthentication
+from django.db.models import Exists, OuterRef, Prefetch
+
+from drf_spectacular.utils import (
+    extend_schema_view,
+    extend_schema,
+    OpenApiParameter,
+    OpenApiTypes,
+)
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+from rest_framework import generics, mixins, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import UnsupportedMediaType, ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from core.db.routers import replica_reads
+from core.models import CollectionVersion, Recipe, RecipeStats, Tag, TagStats
+from recipe import bulk, serializers, sync
+from recipe.mixins import (
+    CachedListMixin,
+    CachedRetrieveMixin,
+    ConditionalListMixin,
+    ConditionalRetrieveMixin,
+    FastListMixin,
+    ReplicaReadMixin,
+    SparseFieldsMixin,
+)
+from recipe.pagination import RecipePagination, TagPagination
+from recipe.search import search_recipes
+from user.authentication import CachedTokenAuthentication
 
-from core.models import Recipe, Tag
-from recipe import serializers
 
+SPARSE_FIELDS_PARAMETERS = [
+    OpenApiParameter(
+        'fields',
+        OpenApiTypes.STR,
+        description='Comma separated list of the fields to return.',
+    ),
+    OpenApiParameter(
+        'omit',
+        OpenApiTypes.STR,
+        description='Comma separated list of the fields to leave out.',
+    ),
+]
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+@extend_schema_view(
+    list=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'tags',
+                OpenApiTypes.STR,
+                description='Comma separated list of tag IDs to filter.',
+            ),
+            OpenApiParameter(
+                'tags_match',
+                OpenApiTypes.STR,
+                enum=['any', 'all'],
+                description='Match recipes with any (default) or all tags.',
+            ),
+            OpenApiParameter(
+                'price_min',
+                OpenApiTypes.DECIMAL,
+                description='Lowest price to include.',
+            ),
+            OpenApiParameter(
+                'price_max',
+                OpenApiTypes.DECIMAL,
+                description='Highest price to include.',
+            ),
+            OpenApiParameter(
+                'time_minutes_max',
+                OpenApiTypes.INT,
+                description='Longest preparation time to include.',
+            ),
+            OpenApiParameter(
+                'title_prefix',
+                OpenApiTypes.STR,
+                description='Case sensitive prefix of the title.',
+            ),
+            *SPARSE_FIELDS_PARAMETERS,
+        ]
+    ),
+    retrieve=extend_schema(parameters=SPARSE_FIELDS_PARAMETERS),
+    export=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'file_format',
+                OpenApiTypes.STR,
+                enum=list(bulk.FORMATS),
+                description='Encoding of the export, ndjson by default.',
+            ),
+        ],
+        responses={(200, mime): OpenApiTypes.STR
+                   for mime in bulk.FORMATS.values()},
+    ),
+    search=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'q',
+                OpenApiTypes.STR,
+                required=True,
+                description='Web search style query over title and '
+                            'description.',
+            ),
+            OpenApiParameter(
+                'limit',
+                OpenApiTypes.INT,
+                description='Maximum number of results to return.',
+            ),
+            *SPARSE_FIELDS_PARAMETERS,
+        ]
+    ),
+)
+class RecipeViewSet(ReplicaReadMixin,
+                    ConditionalListMixin,
+                    ConditionalRetrieveMixin,
+                    CachedListMixin,
+                    CachedRetrieveMixin,
+                    SparseFieldsMixin,
+                    FastListMixin,
+                    viewsets.ModelViewSet):
     """View for manage recipe APIs."""
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipePagination
+    collection = CollectionVersion.RECIPES
+    detail_collections = [CollectionVersion.TAGS]
+    fast_render_actions = ('list', 'retrieve')
+    sparse_fields_actions = ('list', 'retrieve', 'search')
 
     def get_queryset(self):
         """Retrieve recipes for authenticated user."""
-        return self.queryset.filter(user=self.request.user).order_by('-id')
+        queryset = self.queryset.filter(user=self.request.user)
+        if self.action in ('list', 'search', 'export'):
+            queryset = self._filter_queryset(
+                queryset, self.request.query_params
+            )
+
+        return queryset.order_by('-id').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.only('id', 'name'))
+        )
+
+    def _filter_queryset(self, queryset, params):
+        """Apply the recipe filters in `params` to the queryset."""
+        filters = serializers.RecipeFilterSerializer(data=params)
+        filters.is_valid(raise_exception=True)
+        filters = filters.validated_data
+
+        tag_ids = filters.get('tags')
+        if tag_ids:
+            # EXISTS keeps one row per recipe without a join and DISTINCT.
+            recipe_tags = Recipe.tags.through.objects.filter(
+                recipe_id=OuterRef('pk')
+            )
+            if filters['tags_match'] == 'all':
+                for tag_id in tag_ids:
+                    queryset = queryset.filter(
+                        Exists(recipe_tags.filter(tag_id=tag_id))
+                    )
+            else:
+                queryset = queryset.filter(
+                    Exists(recipe_tags.filter(tag_id__in=tag_ids))
+                )
+        if 'price_min' in filters:
+            queryset = queryset.filter(price__gte=filters['price_min'])
+        if 'price_max' in filters:
+            queryset = queryset.filter(price__lte=filters['price_max'])
+        if 'time_minutes_max' in filters:
+            queryset = queryset.filter(
+                time_minutes__lte=filters['time_minutes_max']
+            )
+        if 'title_prefix' in filters:
+            queryset = queryset.filter(
+                title__startswith=filters['title_prefix']
+            )
+
+        return queryset
     
     def get_serializer_class(self):
         """Return the serializer class for the request."""
         if self.action == 'list':
             return serializers.RecipeSerializer
+        elif self.action == 'search':
+            return serializers.RecipeSearchSerializer
         
         return self.serializer_class
 
     def perform_create(self, serializer):
         """create new recipe."""
         serializer.save(user=self.request.user)
+
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def search(self, request):
+        """Search the user's recipes, ranked by relevance."""
+        params = serializers.RecipeSearchQuerySerializer(
+            data=request.query_params
+        )
+        params.is_valid(raise_exception=True)
+        limit = min(
+            params.validated_data.get('limit', api_settings.PAGE_SIZE),
+            settings.API_MAX_PAGE_SIZE,
+        )
+
+        with replica_reads(request.user):
+            recipes = search_recipes(
+                self.filter_queryset(self.get_queryset()),
+                params.validated_data['q'],
+                limit,
+            )
+            serializer = self.get_serializer(recipes, many=True)
+            return Response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        pagination_class=None,
+        serializer_class=serializers.RecipeStatsSerializer,
+    )
+    def stats(self, request):
+        """Return the recipe count and averages of the user and the number
+        of recipes of each tag, read from the maintained stats."""
+        with replica_reads(request.user):
+            stats = RecipeStats.objects.filter(user=request.user).first()
+            if stats is None:
+                stats = RecipeStats(user=request.user)
+            stats.tags = TagStats.objects.filter(
+                user=request.user, recipe_count__gt=0
+            ).order_by('-recipe_count', 'tag__name').values(
+                'tag_id', 'tag__name', 'recipe_count'
+            )
+            serializer = self.get_serializer(stats)
+            return Response(serializer.data)
+
+    @extend_schema(
+        methods=['PATCH'],
+        request=serializers.RecipeBatchUpdateSerializer,
+        responses=serializers.RecipeBatchResultSerializer,
+    )
+    @extend_schema(
+        methods=['DELETE'],
+        request=serializers.RecipeBatchSerializer,
+        responses=serializers.RecipeBatchResultSerializer,
+    )
+    @action(detail=False, methods=['patch', 'delete'], pagination_class=None)
+    def batch(self, request):
+        """Update or delete the recipes selected by ids or list filters in
+        one transaction, reporting the outcome for each id."""
+        if request.method == 'DELETE':
+            params = serializers.RecipeBatchSerializer(data=request.data)
+        else:
+            params = serializers.RecipeBatchUpdateSerializer(
+                data=request.data
+            )
+        params.is_valid(raise_exception=True)
+        params = dict(params.validated_data)
+        ids = params.pop('ids', None)
+        if ids is None:
+            ids = self._batch_filter(params.pop('filter'))
+            owned = set(ids)
+        else:
+            # Ids of other users are reported as not found.
+            owned = set(Recipe.objects.filter(
+                user=request.user, id__in=ids
+            ).values_list('id', flat=True))
+
+        owned_ids = [recipe_id for recipe_id in ids if recipe_id in owned]
+        if request.method == 'DELETE':
+            outcome = 'deleted'
+            if owned_ids:
+                bulk.delete_recipes(request.user, owned_ids)
+        else:
+            outcome = 'updated'
+            if owned_ids:
+                bulk.update_recipes(request.user, owned_ids, **params)
+
+        return Response({
+            'matched': len(owned_ids),
+            'results': [
+                {
+                    'id': recipe_id,
+                    'status': outcome if recipe_id in owned else 'not_found',
+                }
+                for recipe_id in ids
+            ],
+        })
+
+    def _batch_filter(self, filters):
+        """Return the ids of the user's recipes matching list filters."""
+        try:
+            queryset = self._filter_queryset(
+                Recipe.objects.filter(user=self.request.user), filters
+            )
+        except ValidationError as error:
+            raise ValidationError({'filter': error.detail})
+
+        limit = settings.RECIPE_BATCH_MAX_SIZE
+        ids = list(
+            queryset.order_by('-id').values_list('id', flat=True)[:limit + 1]
+        )
+        if len(ids) > limit:
+            raise ValidationError(
+                {'filter': f'Matches more than {limit} recipes.'}
+            )
+        return ids
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """Create recipes from a streamed NDJSON or CSV upload."""
+        media_type = request.content_type.split(';')[0].strip()
+        formats = {mime: name for name, mime in bulk.FORMATS.items()}
+        if media_type not in formats:
+            raise UnsupportedMediaType(media_type)
+
+        rows = bulk.read_rows(request.stream or [], formats[media_type])
+        summary = bulk.import_recipes(
+            request.user,
+            rows,
+            serializers.RecipeDetailSerializer,
+            settings.RECIPE_BULK_CHUNK_SIZE,
+        )
+        return Response(summary)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the user's recipes as NDJSON or CSV."""
+        file_format = request.query_params.get('file_format', 'ndjson')
+        if file_format not in bulk.FORMATS:
+            raise ValidationError({'file_format': 'Unsupported format.'})
+
+        response = StreamingHttpResponse(
+            bulk.export_recipes(
+                self.get_queryset(),
+                file_format,
+                settings.RECIPE_BULK_CHUNK_SIZE,
+            ),
+            content_type=bulk.FORMATS[file_format],
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{file_format}"'
+        )
+        return response
         
         
-class TagViewSet(mixins.UpdateModelMixin,
+@extend_schema_view(
+    list=extend_schema(parameters=SPARSE_FIELDS_PARAMETERS),
+)
+class TagViewSet(ReplicaReadMixin,
+                 ConditionalListMixin,
+                 CachedListMixin,
+                 SparseFieldsMixin,
+                 FastListMixin,
+                 mixins.UpdateModelMixin,
                  mixins.ListModelMixin, 
                  viewsets.GenericViewSet):
     """Manage tags in database."""
     serializer_class = serializers.TagSerializer
     queryset = Tag.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
-    
+    pagination_class = TagPagination
+    collection = CollectionVersion.TAGS
+
     def get_queryset(self):
         """Retrieve tags for authenticated user."""
-        return self.queryset.filter(user=self.request.user).order_by('-name')
+        return self.queryset.filter(
+            user=self.request.user
+        ).order_by('-name', 'id')
+
+
+class SyncView(generics.GenericAPIView):
+    """Sync the user's recipes and tags by changes since a token."""
+    serializer_class = serializers.SyncSerializer
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    pagination_class = None
+    sync_serializers = {
+        CollectionVersion.RECIPES: serializers.RecipeDetailSerializer,
+        CollectionVersion.TAGS: serializers.TagSerializer,
+    }
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'since',
+                OpenApiTypes.STR,
+                description='Token of the previous sync, omit for all '
+                            'recipes and tags.',
+            ),
+            OpenApiParameter(
+                'limit',
+                OpenApiTypes.INT,
+                description='Maximum number of changes to return.',
+            ),
+        ]
+    )
+    def get(self, request):
+        """Return the recipes and tags changed and the ids of those
+        deleted since the `since` token, with the token to pass next."""
+        params = serializers.SyncQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        limit = min(
+            params.validated_data.get('limit', api_settings.PAGE_SIZE),
+            settings.API_MAX_PAGE_SIZE,
+        )
+
+        with replica_reads(request.user):
+            data = sync.changes_since(
+                request.user,
+                params.validated_data.get('since'),
+                limit,
+                self.sync_serializers,
+            )
+        return Response(data)
@@ -0,0 +1,221 @@
+"""
+Authentication classes for the API.
+"""
+import copy
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.authentication import (
+    TokenAuthentication,
+    get_authorization_header,
+)
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.asynchronous import database_sync_to_async
+
+
+class TokenCache:
+    """Two tier cache of token key to `(user, token)`.
+
+    The first tier is a process-local LRU with a TTL, the optional second
+    tier is a shared Django cache so that other workers can be warmed too.
+    Invalidating a token replaces its generation in the revocation cache,
+    entries of an older generation are dropped on their next hit in every
+    worker sharing that cache.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def options(self):
+        return settings.TOKEN_AUTH_CACHE
+
+    @property
+    def shared(self):
+        alias = self.options.get('SHARED_CACHE')
+        return caches[alias] if alias else None
+
+    @property
+    def revocations(self):
+        return caches[self.options['REVOCATION_CACHE']]
+
+    def get(self, key):
+        """Return the cached `(user, token)` for a key or None."""
+        credentials = self.get_local(key)
+        if credentials is not None or self.shared is None:
+            return credentials
+        entry = self.shared.get(self._hashed_key('auth-token', key))
+        if entry is None:
+            return None
+        generation, credentials = entry
+        if not self._valid(key, generation, credentials):
+            return None
+        self._store(key, generation, credentials)
+        return credentials
+
+    def get_local(self, key):
+        """Return the `(user, token)` for a key from the local tier only."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires, generation, credentials = entry
+        if expires > now and self._valid(key, generation, credentials):
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+            return credentials
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        return None
+
+    def set(self, key, credentials, generation):
+        """Cache the `(user, token)` for a key in both tiers.
+
+        `generation` must be read before looking the token up, so that a
+        revocation in between makes the entry stale.
+        """
+        self._store(key, generation, credentials)
+        if self.shared is not None:
+            self.shared.set(
+                self._hashed_key('auth-token', key),
+                (generation, credentials),
+                self.options['TTL'],
+            )
+
+    def generation(self, key):
+        """Return the current generation of a token key."""
+        return self.revocations.get(self._hashed_key('auth-generation', key))
+
+    def revoke(self, *keys):
+        """Start a new generation of token keys in every worker."""
+        self.revocations.set_many({
+            self._hashed_key('auth-generation', key): uuid.uuid4().hex
+            for key in keys
+        }, None)
+
+    def delete(self, *keys):
+        """Drop token keys from both tiers and revoke them."""
+        if not keys:
+            return
+        self.revoke(*keys)
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete_many(
+                [self._hashed_key('auth-token', key) for key in keys]
+            )
+
+    def delete_user(self, user_id):
+        """Drop every cached token of a user from both tiers."""
+        with self._lock:
+            keys = {
+                key for key, (_expires, _generation, (user, _token)) in
+                self._entries.items() if user.pk == user_id
+            }
+        keys.update(Token.objects.filter(
+            user_id=user_id
+        ).values_list('key', flat=True))
+        self.delete(*keys)
+
+    def clear(self):
+        """Empty the process-local tier."""
+        with self._lock:
+            self._entries.clear()
+
+    def _valid(self, key, generation, credentials):
+        """Return whether an entry is of the token's current generation."""
+        user = credentials[0]
+        return user.is_active and generation == self.generation(key)
+
+    def _store(self, key, generation, credentials):
+        expires = time.monotonic() + self.options['TTL']
+        with self._lock:
+            self._entries[key] = (expires, generation, credentials)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.options['MAX_SIZE']:
+                self._entries.popitem(last=False)
+
+    def _hashed_key(self, prefix, key):
+        """Return a shared cache key, never the raw token."""
+        return f'{prefix}:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that caches the token to user lookup."""
+
+    def authenticate(self, request):
+        key = self.get_key(request)
+        if key is None:
+            return None
+
+        return self.authenticate_credentials(key)
+
+    async def authenticate_async(self, request):
+        """Authenticate on the event loop, leaving it only on a cache miss."""
+        key = self.get_key(request)
+        if key is None:
+            return None
+
+        credentials = token_cache.get_local(key)
+        if credentials is None:
+            return await database_sync_to_async(
+                self.authenticate_credentials
+            )(key)
+
+        return self._copy(credentials)
+
+    def get_key(self, request):
+        """Return the token key sent with the request or None."""
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) == 1:
+            raise AuthenticationFailed(
+                _('Invalid token header. No credentials provided.')
+            )
+        elif len(auth) > 2:
+            raise AuthenticationFailed(_(
+                'Invalid token header. '
+                'Token string should not contain spaces.'
+            ))
+
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed(_(
+                'Invalid token header. '
+                'Token string should not contain invalid characters.'
+            ))
+
+    def authenticate_credentials(self, key):
+        credentials = token_cache.get(key)
+        if credentials is None:
+            generation = token_cache.generation(key)
+            credentials = super().authenticate_credentials(key)
+            token_cache.set(key, credentials, generation)
+
+        return self._copy(credentials)
+
+    def _copy(self, credentials):
+        """Views may mutate request.user, never hand out the cached copy."""
+        user, token = credentials
+        return (copy.copy(user), copy.copy(token))
@@ -0,0 +1,23 @@
+"""
+Signal handlers keeping the token cache consistent.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from user.authentication import token_cache
+
+
+@receiver([post_save, post_delete], sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    """Drop a token from the cache when it is issued, rotated or revoked."""
+    token_cache.delete(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """Drop a user's cached tokens on deactivation or a password change."""
+    if not created:
+        token_cache.delete_user(instance.pk)
@@ -0,0 +1,145 @@
+"""
+Tests for the cached token authentication.
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from user.authentication import (
+    CachedTokenAuthentication,
+    TokenCache,
+    token_cache,
+)
+
+
+ME_URL = reverse('user:me')
+
+
+def create_user(**params):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(**params)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test token lookups are cached and invalidated."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test Name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def test_repeat_lookup_served_from_cache(self):
+        """Test a second lookup of the same token runs no queries."""
+        self.auth.authenticate_credentials(self.token.key)
+
+        with self.assertNumQueries(0):
+            user, token = self.auth.authenticate_credentials(self.token.key)
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(token.key, self.token.key)
+
+    def test_revoked_token_rejected(self):
+        """Test deleting a token drops it from the cache."""
+        key = self.token.key
+        self.auth.authenticate_credentials(key)
+        self.token.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(key)
+
+    def test_deactivated_user_rejected(self):
+        """Test deactivating a user drops the user's tokens."""
+        self.auth.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_password_change_invalidates_cache(self):
+        """Test updating the password through the API drops the token."""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        client.get(ME_URL)
+
+        res = client.patch(ME_URL, {'password': 'newpassword123'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNone(token_cache.get(self.token.key))
+
+    def test_token_header_authenticates(self):
+        """Test the me endpoint accepts the cached token."""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        client.get(ME_URL)
+
+        res = client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_shared_tier_warms_local_cache(self):
+        """Test a lookup cached by another worker runs no queries."""
+        options = {
+            'MAX_SIZE': 10,
+            'TTL': 60,
+            'SHARED_CACHE': 'default',
+            'REVOCATION_CACHE': 'default',
+        }
+        with self.settings(TOKEN_AUTH_CACHE=options):
+            self.auth.authenticate_credentials(self.token.key)
+            token_cache.clear()
+
+            with self.assertNumQueries(0):
+                user, _token = self.auth.authenticate_credentials(
+                    self.token.key
+                )
+
+        self.assertEqual(user, self.user)
+
+    def test_invalidation_reaches_other_workers(self):
+        """Test deactivating a user in one worker drops the token in all."""
+        self.auth.authenticate_credentials(self.token.key)
+        other_worker = TokenCache()
+
+        other_worker.delete_user(self.user.pk)
+
+        self.assertIsNone(token_cache.get_local(self.token.key))
+
+    def test_rotated_token_dropped_in_other_workers(self):
+        """Test rotating a token drops the user's tokens in all workers."""
+        self.auth.authenticate_credentials(self.token.key)
+        other_worker = TokenCache()
+
+        other_worker.revoke(self.token.key)
+
+        with self.assertNumQueries(1):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_revoked_during_lookup_not_cached(self):
+        """Test a revocation racing a lookup leaves no usable entry."""
+        generation = token_cache.generation(self.token.key)
+        credentials = (self.user, self.token)
+        TokenCache().revoke(self.token.key)
+
+        token_cache.set(self.token.key, credentials, generation)
+
+        self.assertIsNone(token_cache.get_local(self.token.key))
+
+    def test_inactive_user_not_served_from_cache(self):
+        """Test a cached inactive user is not authenticated."""
+        self.auth.authenticate_credentials(self.token.key)
+        user, _token = token_cache.get_local(self.token.key)
+        user.is_active = False
+
+        self.assertIsNone(token_cache.get_local(self.token.key))
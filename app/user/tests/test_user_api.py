@@ -1,13 +1,17 @@
 """
 Tests for the user API.
 """
-from django.test import TestCase
+from django.conf import settings
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.tests.utils import QueryBudgetMixin, seed_recipes
+
 
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
@@ -117,6 +121,34 @@ class PublicUserApiTests(TestCase):
         self.assertNotIn('token', res.data)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
         
+    def test_create_token_hashing_busy(self):
+        """Test logins are rejected with 429 when hashing is saturated."""
+        create_user(email='test@example.com', password='userpassword')
+        options = dict(settings.PASSWORD_HASHING, MAX_PENDING=0)
+
+        with override_settings(PASSWORD_HASHING=options):
+            res = self.client.post(TOKEN_URL, {
+                'email': 'test@example.com',
+                'password': 'userpassword',
+            })
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+
+    def test_create_user_hashing_busy(self):
+        """Test sign ups are rejected with 429 when hashing is saturated."""
+        options = dict(settings.PASSWORD_HASHING, MAX_PENDING=0)
+
+        with override_settings(PASSWORD_HASHING=options):
+            res = self.client.post(CREATE_USER_URL, {
+                'email': 'test@example.com',
+                'password': 'userpassword',
+                'name': 'Test Name',
+            })
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], str(options['RETRY_AFTER']))
+
     def test_retrieve_user_unauthorized(self):
         """Test authentication required for retrieve"""
         res = self.client.get(ME_URL)
@@ -160,3 +192,58 @@ class PublicUserApiTests(TestCase):
             self.assertEqual(res.status_code,
                              status.HTTP_200_OK)
             
+
+class UserQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test user endpoints run as many queries whatever the data size."""
+
+    def setUp(self):
+        self.user = create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test Name',
+        )
+        self.client = APIClient()
+
+    def seed(self, count):
+        """Give the user `count` recipes."""
+        seed_recipes(self.user, count)
+
+    def test_create(self):
+        """Test creating a user."""
+        def create():
+            email = f'new{get_user_model().objects.count()}@example.com'
+            return self.client.post(CREATE_USER_URL, {
+                'email': email,
+                'password': 'testpass123',
+                'name': 'New Name',
+            })
+
+        self.assertConstantQueries(create, self.seed, budget=3)
+
+    def test_token(self):
+        """Test fetching the token of a user."""
+        Token.objects.create(user=self.user)
+        self.assertConstantQueries(
+            lambda: self.client.post(TOKEN_URL, {
+                'email': 'test@example.com',
+                'password': 'testpass123',
+            }),
+            self.seed,
+            budget=2,
+        )
+
+    def test_retrieve_me(self):
+        """Test retrieving the profile."""
+        self.client.force_authenticate(self.user)
+        self.assertConstantQueries(
+            lambda: self.client.get(ME_URL), self.seed, budget=0
+        )
+
+    def test_update_me(self):
+        """Test updating the profile."""
+        self.client.force_authenticate(self.user)
+        self.assertConstantQueries(
+            lambda: self.client.patch(ME_URL, {'name': 'Other Name'}),
+            self.seed,
+            budget=2,
+        )
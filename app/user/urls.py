@@ -1,14 +1,21 @@
 """
 Urls for user app.
 """
+from django.conf import settings
 from django.urls import path
 
+from core.asynchronous import async_api_view
+
 from . import views
 
 app_name = 'user'
 
+manage_user_view = views.ManageUserView.as_view()
+if settings.API_ASYNC_VIEWS:
+    manage_user_view = async_api_view(manage_user_view)
+
 urlpatterns = [
     path('create/', views.CreateUserAPIView.as_view(), name='create'),
     path('token/', views.CreateTokenAPIView.as_view(), name='token'),
-    path('me/', views.ManageUserView.as_view(), name='me'),
+    path('me/', manage_user_view, name='me'),
 ]
@@ -1,29 +1,55 @@
 """Views for API"""
 
-from rest_framework import generics, permissions, authentication
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.exceptions import Throttled
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from core.hashing import HashingBusy
+
+from .authentication import CachedTokenAuthentication
 from .serializers import UserSerializer, AuthTokenSerializer
 
 
-class CreateUserAPIView(generics.CreateAPIView):
+class PasswordHashingThrottled(Throttled):
+    """Too many password hashes are queued, the client should retry."""
+    default_detail = _('Too many password checks in progress.')
+    default_code = 'hashing_busy'
+
+
+class PasswordHashingMixin:
+    """Answer 429 when the password hashing pool is saturated."""
+
+    def handle_exception(self, exc):
+        if isinstance(exc, HashingBusy):
+            exc = PasswordHashingThrottled(wait=exc.wait)
+        return super().handle_exception(exc)
+
+
+class CreateUserAPIView(PasswordHashingMixin, generics.CreateAPIView):
     """API view class to create new user"""
     serializer_class = UserSerializer
     
      
-class CreateTokenAPIView(ObtainAuthToken):
+class CreateTokenAPIView(PasswordHashingMixin, ObtainAuthToken):
     """API view class to create token for authenticated users."""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
     
     
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(PasswordHashingMixin, generics.RetrieveUpdateAPIView):
     """Manages the authenticated users."""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self):
         """Retrieve and return the authenticated user."""
-        return self.request.user
\ No newline at end of file
+        return self.request.user
+
+    async def async_get(self, request, *args, **kwargs):
+        """Return the authenticated user without leaving the event loop."""
+        return Response(self.get_serializer(request.user).data)